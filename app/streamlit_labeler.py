@@ -14,6 +14,7 @@ if str(_root) not in sys.path:
 
 from pipelines.features.load_from_pg import load_candles, get_candle_date_range
 from pipelines.features.indicators import add_indicators
+from pipelines.backtest.sltp import SL_ATR_MULT, TP_ATR_MULT, sl_tp_levels
 from pipelines.common.settings import require, POSTGRES_DSN
 
 st.set_page_config(layout="wide")
@@ -253,11 +254,8 @@ note = st.text_input("Note (optional)", "")
 if clicked_row and label in ("BUY", "SELL"):
     entry = float(clicked_row["close"])
     atr = float(clicked_row["atr_14"])
-    if label == "BUY":
-        sl, tp = entry - 1.0 * atr, entry + 1.5 * atr
-    else:
-        sl, tp = entry + 1.0 * atr, entry - 1.5 * atr
-    st.info(f"**Entry** {entry:.2f} · **SL** {sl:.2f} (1×ATR) · **TP** {tp:.2f} (1.5×ATR)")
+    sl, tp = sl_tp_levels(entry, atr, label_to_int(label))
+    st.info(f"**Entry** {entry:.2f} · **SL** {sl:.2f} ({SL_ATR_MULT:g}×ATR) · **TP** {tp:.2f} ({TP_ATR_MULT:g}×ATR)")
 
 if clicked_row and st.button("Save label to Postgres"):
     open_time_val = clicked_row["open_time"]
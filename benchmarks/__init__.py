@@ -0,0 +1 @@
+# Reproducible benchmarks of the pipeline hot paths (python -m benchmarks.run)
@@ -0,0 +1,245 @@
+"""
+Hot-path benchmarks: archive decoding, futures upserts, REST backfill, candle loading,
+indicator computation and trade-to-bar aggregation. DB benchmarks write to the throwaway database only.
+"""
+from __future__ import annotations
+
+import os
+
+import numpy as np
+import pandas as pd
+import psycopg
+
+from benchmarks.fake_binance import FakeKlinesServer
+from benchmarks.harness import Context, benchmark
+from pipelines.features.bars import dollar_bars, time_bars
+from pipelines.features.compact import compact_frame, memory_report
+from pipelines.features.cross_asset import cross_asset_features
+from pipelines.features.indicators import add_indicators
+from pipelines.features.load_from_pg import load_candles
+from pipelines.features.multi_timeframe import attach_higher_timeframe
+from pipelines.features.subscriber import CandleSubscriber
+from pipelines.ingestion import binance_rest
+from pipelines.ingestion.agg_trades import read_agg_trades_zip
+from pipelines.ingestion.binance_archive import _normalize_timestamps_to_ms, _read_zip_csv, upsert_klines
+from pipelines.ingestion.synthetic import (
+    agg_trades_zip,
+    archive_zip,
+    synthetic_agg_trades,
+    synthetic_klines,
+    ws_kline_message,
+)
+from pipelines.trading.paper import PaperEngine
+from pipelines.trading.strategies import load_strategy
+
+
+def _truncate(dsn: str, *tables: str):
+    if any(t in ("market.futures_candles", "market.candles_raw") for t in tables):
+        # Keep the coverage catalog in step with the candle tables
+        tables += ("market.candle_coverage_days", "market.candle_coverage")
+
+    def run():
+        with psycopg.connect(dsn) as conn:
+            conn.execute(f"TRUNCATE {', '.join(tables)}")
+            conn.commit()
+    return run
+
+
+@benchmark("archive.read_zip_normalize")
+def read_zip_normalize(ctx: Context, n: int):
+    blob = archive_zip(synthetic_klines(n=n), "BTCUSDT-1m-2024-01-01.csv")
+    return lambda: _normalize_timestamps_to_ms(_read_zip_csv(blob))
+
+
+@benchmark("archive.upsert_klines.insert", needs_db=True)
+def upsert_klines_insert(ctx: Context, n: int):
+    df = synthetic_klines(n=n)
+
+    def run():
+        with psycopg.connect(ctx.dsn) as conn:
+            upsert_klines(conn, "um", "BTCUSDT", "1m", df.copy())
+
+    return _truncate(ctx.dsn, "market.futures_candles", "market.futures_ingestion_metadata"), run
+
+
+@benchmark("archive.upsert_klines.reupsert", needs_db=True)
+def upsert_klines_reupsert(ctx: Context, n: int):
+    """Re-ingesting history that is already stored (every row conflicts)."""
+    df = synthetic_klines(n=n)
+    _truncate(ctx.dsn, "market.futures_candles")()
+    with psycopg.connect(ctx.dsn) as conn:
+        upsert_klines(conn, "um", "BTCUSDT", "1m", df.copy())
+
+    def run():
+        with psycopg.connect(ctx.dsn) as conn:
+            upsert_klines(conn, "um", "BTCUSDT", "1m", df.copy())
+
+    return run
+
+
+def _reingest(ctx: Context, n: int, skip_unchanged: bool):
+    """Re-ingest n stored rows (--sizes 1M: a month of 1m bars); reports WAL bytes and row outcomes."""
+    df = synthetic_klines(n=n)
+    _truncate(ctx.dsn, "market.futures_candles")()
+    with psycopg.connect(ctx.dsn) as conn:
+        upsert_klines(conn, "um", "BTCUSDT", "1m", df.copy())
+
+    def run():
+        with psycopg.connect(ctx.dsn) as conn:
+            lsn = conn.execute("SELECT pg_current_wal_lsn()").fetchone()[0]
+            stats = upsert_klines(conn, "um", "BTCUSDT", "1m", df.copy(), skip_unchanged=skip_unchanged)
+            wal = conn.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)::bigint", (lsn,)).fetchone()[0]
+        return {"wal_bytes": int(wal), "updated": stats.updated, "skipped": stats.skipped}
+
+    return run
+
+
+@benchmark("archive.reingest.skip_unchanged", needs_db=True)
+def reingest_skip_unchanged(ctx: Context, n: int):
+    return _reingest(ctx, n, skip_unchanged=True)
+
+
+@benchmark("archive.reingest.rewrite_all", needs_db=True)
+def reingest_rewrite_all(ctx: Context, n: int):
+    return _reingest(ctx, n, skip_unchanged=False)
+
+
+@benchmark("rest.backfill_symbol_interval", needs_db=True)
+def rest_backfill(ctx: Context, n: int):
+    candles = synthetic_klines(n=n)
+    server = ctx.scratch.get(("fake_rest", n))
+    if server is None:
+        server = ctx.scratch[("fake_rest", n)] = FakeKlinesServer(candles).__enter__()
+    start_ms = int(candles["open_time"].iloc[0])
+    end_ms = int(candles["close_time"].iloc[-1])
+
+    def run():
+        binance_rest.BINANCE_BASE_URL = server.url
+        os.environ["POSTGRES_DSN"] = ctx.dsn
+        binance_rest.backfill_symbol_interval("BTCUSDT", "1m", start_ms, end_ms, throttle_s=0)
+
+    return _truncate(ctx.dsn, "market.candles_raw", "market.api_metadata"), run
+
+
+@benchmark("features.load_candles", needs_db=True)
+def features_load_candles(ctx: Context, n: int):
+    _truncate(ctx.dsn, "market.futures_candles")()
+    with psycopg.connect(ctx.dsn) as conn:
+        upsert_klines(conn, "um", "BTCUSDT", "1m", synthetic_klines(n=n))
+    return lambda: load_candles(ctx.dsn, "um", "BTCUSDT", "1m", limit=n)
+
+
+@benchmark("features.add_indicators")
+def features_add_indicators(ctx: Context, n: int):
+    df = synthetic_klines(n=n)[["open_time", "open", "high", "low", "close", "volume"]]
+    df["open_time"] = pd.to_datetime(df["open_time"], unit="ms", utc=True)
+    return lambda: add_indicators(df)
+
+
+@benchmark("features.add_indicators.compact")
+def features_add_indicators_compact(ctx: Context, n: int):
+    """float32 features added in place to a compact frame; reports bytes per row."""
+    df = synthetic_klines(n=n)[["open_time", "open", "high", "low", "close", "volume"]]
+
+    def run():
+        feat = add_indicators(compact_frame(df.copy()), inplace=True, dtype="float32")
+        return {"bytes_per_row": round(memory_report(feat)["bytes_per_row"], 1)}
+
+    return run
+
+
+@benchmark("features.multi_timeframe.align")
+def features_multi_timeframe_align(ctx: Context, n: int):
+    """1h and 15m columns attached to n 1m rows spread over 20 symbols (one as-of search)."""
+    per = max(n // 20, 1)
+    one = synthetic_klines(n=per)[["open_time", "open", "high", "low", "close", "volume"]]
+    base = pd.concat([one.assign(symbol=f"S{i:03d}USDT") for i in range(20)], ignore_index=True)
+    base["open_time"] = pd.to_datetime(base["open_time"], unit="ms", utc=True)
+    higher = {itv: add_indicators(one.iloc[::step].reset_index(drop=True))
+              for itv, step in (("1h", 60), ("15m", 15))}
+    higher = {itv: pd.concat([h.assign(symbol=f"S{i:03d}USDT") for i in range(20)], ignore_index=True)
+              for itv, h in higher.items()}
+    for h in higher.values():
+        h["open_time"] = pd.to_datetime(h["open_time"], unit="ms", utc=True)
+
+    def run():
+        df = base.copy()
+        attach_higher_timeframe(df, higher["1h"], "1m", "1h", ["rsi_14", "bb_width"])
+        attach_higher_timeframe(df, higher["15m"], "1m", "15m", ["rsi_14"])
+
+    return run
+
+
+@benchmark("features.cross_asset")
+def features_cross_asset(ctx: Context, n: int):
+    """Rolling beta/corr to S000USDT and cross-sectional z/rank over a 100-symbol panel of n bars."""
+    rng = np.random.default_rng(0)
+    market = rng.normal(0, 1e-3, n)
+    rets = market[:, None] * rng.uniform(0.5, 2.0, 100) + rng.normal(0, 1e-3, (n, 100))
+    panel = pd.DataFrame(100 * np.exp(np.cumsum(rets, axis=0)), columns=[f"S{i:03d}USDT" for i in range(100)])
+
+    def run():
+        cross_asset_features(panel, 1440, benchmark="S000USDT")
+
+    return run
+
+
+@benchmark("agg_trades.read_zip")
+def agg_trades_read_zip(ctx: Context, n: int):
+    blob = agg_trades_zip(synthetic_agg_trades(n=n), "BTCUSDT-aggTrades-2024-01-01.csv")
+    return lambda: read_agg_trades_zip(blob)
+
+
+@benchmark("bars.time_1m")
+def bars_time_1m(ctx: Context, n: int):
+    trades = read_agg_trades_zip(agg_trades_zip(synthetic_agg_trades(n=n), "t.csv"))
+    return lambda: time_bars(trades, "1m")
+
+
+@benchmark("bars.dollar")
+def bars_dollar(ctx: Context, n: int):
+    trades = read_agg_trades_zip(agg_trades_zip(synthetic_agg_trades(n=n), "t.csv"))
+    return lambda: dollar_bars(trades, 2_000_000.0)
+
+
+@benchmark("paper.on_kline")
+def paper_on_kline(ctx: Context, n: int):
+    """n closed klines spread over 100 streams through the paper engine (no persistence)."""
+    pairs = [(f"S{i:03d}USDT", "1m") for i in range(100)]
+    per = max(n // len(pairs), 1)
+    msgs = []
+    for symbol, interval in pairs:
+        df = synthetic_klines(symbol, interval, n=per)
+        msgs.append([ws_kline_message(r, symbol, interval, is_final=True)["k"] for r in df.itertuples(index=False)])
+    stream = [(pairs[j][0], "1m", msgs[j][i]) for i in range(per) for j in range(len(pairs))]
+
+    def run():
+        engine = PaperEngine(load_strategy("ema_cross"), pairs)
+        for symbol, interval, k in stream:
+            engine.on_kline(symbol, interval, k)
+
+    return run
+
+
+@benchmark("notify.write_to_consumer", needs_db=True)
+def notify_write_to_consumer(ctx: Context, n: int):
+    """
+    Write-to-consumer delay: upsert + commit of one new candle on a series holding n rows,
+    until a CandleSubscriber (LISTEN/NOTIFY) has fetched it. rows_per_s is not meaningful here.
+    """
+    candles = synthetic_klines(n=n + 1000)
+    _truncate(ctx.dsn, "market.futures_candles")()
+    writer = psycopg.connect(ctx.dsn)
+    upsert_klines(writer, "um", "BTCUSDT", "1m", candles.iloc[:n].copy())
+    sub = CandleSubscriber(ctx.dsn, "um", "BTCUSDT", "1m", history=1000)
+    ctx.scratch.setdefault("close", []).extend([writer, sub])
+    pos = [n]
+
+    def run():
+        i = pos[0]
+        pos[0] += 1
+        upsert_klines(writer, "um", "BTCUSDT", "1m", candles.iloc[i:i + 1].copy())
+        if sub.poll(timeout=10) is None:
+            raise RuntimeError("no notification within 10s")
+
+    return run
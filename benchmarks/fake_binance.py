@@ -0,0 +1,58 @@
+"""
+Minimal in-process stand-in for GET /api/v3/klines, serving synthetic candles so the
+REST backfill can be benchmarked without the network.
+"""
+from __future__ import annotations
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from pipelines.ingestion.synthetic import rest_rows
+
+
+class FakeKlinesServer:
+    def __init__(self, candles: pd.DataFrame):
+        self.candles = candles
+        self._open_ms = candles["open_time"].to_numpy()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != "/api/v3/klines":
+                    self.send_error(404)
+                    return
+                q = {k: v[0] for k, v in parse_qs(url.query).items()}
+                body = json.dumps(server.page(q)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def page(self, q: dict) -> list:
+        limit = min(int(q.get("limit", 500)), 1000)
+        lo = np.searchsorted(self._open_ms, int(q.get("startTime", 0)), side="left")
+        hi = len(self._open_ms)
+        if "endTime" in q:
+            hi = np.searchsorted(self._open_ms, int(q["endTime"]), side="right")
+        return rest_rows(self.candles.iloc[lo:min(hi, lo + limit)])
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,124 @@
+"""
+Tiny asv-style benchmark harness: benchmarks register themselves with @benchmark and
+return the callable to time; the runner times it `repeat` times per size and saves the
+results as JSON keyed by git commit.
+"""
+from __future__ import annotations
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+@dataclass
+class Context:
+    """What a benchmark setup gets: the throwaway database DSN (None = no DB available)."""
+
+    dsn: str | None = None
+    scratch: dict = field(default_factory=dict)
+
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Callable[[Context, int], Callable[[], object]]
+    needs_db: bool = False
+
+
+BENCHMARKS: dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, *, needs_db: bool = False):
+    """
+    Register a benchmark. The decorated function receives (ctx, n_rows), does any
+    untimed preparation and returns either the zero-argument callable to time, or a
+    (before, fn) pair where before() runs untimed ahead of every repetition. If the
+    timed callable returns a dict, the last one is saved as the result's "extra".
+    """
+    def wrap(fn):
+        BENCHMARKS[name] = Benchmark(name, fn, needs_db)
+        return fn
+    return wrap
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def run_one(bench: Benchmark, ctx: Context, n: int, repeat: int) -> dict:
+    fn = bench.setup(ctx, n)
+    before = None
+    if isinstance(fn, tuple):
+        before, fn = fn
+    if before:
+        before()
+    fn()  # warm-up (imports, caches, first DB connection)
+    times = []
+    extra = None
+    for _ in range(repeat):
+        if before:
+            before()
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+        if isinstance(out, dict):
+            extra = out
+    best = min(times)
+    result = {
+        "rows": n,
+        "repeat": repeat,
+        "min_s": best,
+        "median_s": statistics.median(times),
+        "mean_s": statistics.fmean(times),
+        "rows_per_s": n / best if best > 0 else None,
+    }
+    if extra is not None:
+        result["extra"] = extra
+    return result
+
+
+def save(results: dict, path: Path | None = None) -> Path:
+    commit = git_commit()
+    payload = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    if path is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{commit}.json"
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    return path
+
+
+def compare(old_path: str, new_path: str, threshold: float = 1.1) -> list[str]:
+    """Lines describing min_s ratios new/old; entries slower than threshold are flagged."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    lines = [f"{old['commit']} -> {new['commit']}"]
+    for key, res in sorted(new["results"].items()):
+        if key not in old["results"]:
+            lines.append(f"  {key:<45} new")
+            continue
+        ratio = res["min_s"] / old["results"][key]["min_s"]
+        flag = "  SLOWER" if ratio > threshold else ("  faster" if ratio < 1 / threshold else "")
+        lines.append(f"  {key:<45} {old['results'][key]['min_s']:9.4f}s -> {res['min_s']:9.4f}s  x{ratio:5.2f}{flag}")
+    return lines
@@ -0,0 +1,82 @@
+"""
+Startup-cost check for the `python -m pipelines` CLI; exits 1 when over budget, so it
+can gate CI next to the benchmarks; tests/test_import_budget.py runs the same checks.
+
+    python -m benchmarks.import_budget [--budget-ms 30] [--repeat 5]
+
+Checks, each in a fresh interpreter:
+  * `import pipelines.cli` + build_parser() stays under --budget-ms (cumulative
+    `-X importtime` of pipelines.cli, best of --repeat runs)
+  * neither that nor `import pipelines.common.settings` imports a heavy module
+and reports how long each command's module takes to import, for reference.
+"""
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Must not be imported just to parse a command line
+HEAVY = ("pandas", "numpy", "psycopg", "requests", "websockets", "dotenv", "pyarrow")
+
+BUDGET_MS = 30.0
+# What the CLI does before dispatching a command
+CLI_CODE = "import pipelines.cli; pipelines.cli.build_parser()"
+
+
+def _run(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+
+def import_ms(module: str, code: str | None = None, repeat: int = 5) -> float:
+    """Best-of-repeat cumulative import time of module in ms (python -X importtime)."""
+    best = float("inf")
+    for _ in range(repeat):
+        err = _run(code or f"import {module}", "-X", "importtime").stderr
+        for line in err.splitlines():
+            # "import time:  self [us] | cumulative | imported package"
+            parts = [p.strip() for p in line.removeprefix("import time:").split("|")]
+            if len(parts) == 3 and parts[2] == module:
+                best = min(best, int(parts[1]) / 1000)
+    return best
+
+
+def heavy_imports(code: str) -> list[str]:
+    out = _run(f"import sys\n{code}\nprint(','.join(sorted({{m.split('.')[0] for m in sys.modules}})))").stdout
+    loaded = set(out.strip().split(","))
+    return [m for m in HEAVY if m in loaded]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI import-time budget")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from pipelines.cli import COMMANDS, FEATURES
+
+    failures = []
+    for code in (CLI_CODE, "import pipelines.common.settings"):
+        heavy = heavy_imports(code)
+        if heavy:
+            failures.append(f"`{code}` imports {', '.join(heavy)}")
+    cli_ms = import_ms("pipelines.cli", CLI_CODE, args.repeat)
+    print(f"pipelines.cli: {cli_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if cli_ms > args.budget_ms:
+        failures.append(f"pipelines.cli imports in {cli_ms:.1f} ms > {args.budget_ms:.0f} ms")
+
+    for module in sorted({m for m, _ in COMMANDS.values()} | set(FEATURES.values())):
+        print(f"  {module:<40} {import_ms(module, repeat=1):8.1f} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
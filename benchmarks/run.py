@@ -0,0 +1,70 @@
+"""
+Run the benchmark suite and save results as JSON (benchmarks/results/<time>-<commit>.json).
+
+    python -m benchmarks.run --sizes 1d,1w
+    python -m benchmarks.run --only upsert --sizes 1M --repeat 3
+    python -m benchmarks.run --compare benchmarks/results/a.json benchmarks/results/b.json
+
+DB benchmarks run only when BENCH_POSTGRES_DSN (or --dsn) points at a throwaway
+database: the schema in sql/ is applied and the market tables are TRUNCATEd.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+
+import psycopg
+
+from benchmarks import bench_pipelines  # noqa: F401  (registers benchmarks)
+from benchmarks.harness import BENCHMARKS, Context, compare, run_one, save
+from pipelines.ingestion.synthetic import SIZES
+
+SQL_DIR = Path(__file__).resolve().parents[1] / "sql"
+
+
+def apply_schema(dsn: str) -> None:
+    with psycopg.connect(dsn) as conn:
+        for path in sorted(SQL_DIR.glob("*.sql")):
+            conn.execute(path.read_text())
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline benchmark suite")
+    parser.add_argument("--sizes", default="1d,1w", help=f"comma list of {', '.join(SIZES)} or row counts")
+    parser.add_argument("--only", default=None, help="substring filter on benchmark names")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dsn", default=os.getenv("BENCH_POSTGRES_DSN"))
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        print("\n".join(compare(*args.compare)))
+        return
+
+    sizes = [SIZES[s] if s in SIZES else int(s) for s in args.sizes.split(",")]
+    ctx = Context(dsn=args.dsn)
+    if ctx.dsn:
+        apply_schema(ctx.dsn)
+
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if args.only and args.only not in name:
+            continue
+        if bench.needs_db and not ctx.dsn:
+            print(f"skip {name} (no BENCH_POSTGRES_DSN)")
+            continue
+        for n in sizes:
+            res = run_one(bench, ctx, n, args.repeat)
+            results[f"{name}[{n}]"] = res
+            extra = "".join(f"  {k}={v:,}" for k, v in res.get("extra", {}).items())
+            print(f"{name:<40} n={n:<9} min {res['min_s']:8.4f}s  {res['rows_per_s']:12,.0f} rows/s{extra}")
+
+    path = save(results, Path(args.out) if args.out else None)
+    print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
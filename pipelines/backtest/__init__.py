@@ -0,0 +1 @@
+# Backtesting: SL/TP simulation, parameter sweeps
@@ -0,0 +1,84 @@
+"""
+ATR-based stop-loss / take-profit rules shared by the labeler and the backtests.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+# Defaults used by the Streamlit labeler: SL = 1×ATR, TP = 1.5×ATR from the entry close.
+SL_ATR_MULT = 1.0
+TP_ATR_MULT = 1.5
+
+
+def sl_tp_levels(
+    entry: float,
+    atr: float,
+    side: int,
+    sl_mult: float = SL_ATR_MULT,
+    tp_mult: float = TP_ATR_MULT,
+) -> tuple[float, float]:
+    """Return (stop_loss, take_profit) for a long (side=1) or short (side=-1) entry."""
+    if side == 1:
+        return entry - sl_mult * atr, entry + tp_mult * atr
+    return entry + sl_mult * atr, entry - tp_mult * atr
+
+
+def simulate_exits(
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    entry_idx: np.ndarray,
+    side: np.ndarray,
+    atr: np.ndarray,
+    sl_mult: float = SL_ATR_MULT,
+    tp_mult: float = TP_ATR_MULT,
+    max_bars: int = 100,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Simulate SL/TP exits for entries at the close of bars `entry_idx`.
+
+    Looks at up to `max_bars` following bars. If SL and TP are both touched inside the
+    same bar the SL is assumed to fill first (conservative). Trades that hit neither are
+    closed at the last bar's close.
+
+    Returns (r_multiple, bars_held) per entry, where r_multiple is PnL in units of the
+    initial risk (sl_mult × ATR): +tp_mult/sl_mult for a TP, -1 for an SL.
+    """
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    side = np.asarray(side, dtype=np.float64)
+    n = len(close)
+    if len(entry_idx) == 0:
+        return np.empty(0), np.empty(0, dtype=np.int64)
+
+    # (n_entries, max_bars) index matrix of the forward bars, clipped to the series end
+    offsets = np.arange(1, max_bars + 1)
+    fwd = entry_idx[:, None] + offsets[None, :]
+    valid = fwd < n
+    fwd = np.minimum(fwd, n - 1)
+
+    entry = close[entry_idx]
+    risk = sl_mult * atr[entry_idx]
+    sl = entry - side * risk
+    tp = entry + side * tp_mult * atr[entry_idx]
+
+    hi = high[fwd]
+    lo = low[fwd]
+    long_ = (side == 1)[:, None]
+    sl_hit = valid & np.where(long_, lo <= sl[:, None], hi >= sl[:, None])
+    tp_hit = valid & np.where(long_, hi >= tp[:, None], lo <= tp[:, None])
+
+    never = max_bars
+    first_sl = np.where(sl_hit.any(axis=1), sl_hit.argmax(axis=1), never)
+    first_tp = np.where(tp_hit.any(axis=1), tp_hit.argmax(axis=1), never)
+
+    last_valid = valid.sum(axis=1) - 1
+    exit_close = close[fwd[np.arange(len(entry_idx)), np.maximum(last_valid, 0)]]
+    timeout_r = np.where(last_valid >= 0, side * (exit_close - entry) / risk, 0.0)
+
+    r = np.where(
+        first_sl <= first_tp,
+        np.where(first_sl < never, -1.0, timeout_r),
+        tp_mult / sl_mult,
+    )
+    bars_held = np.minimum(np.minimum(first_sl, first_tp), np.maximum(last_valid, 0)) + 1
+    return r, bars_held
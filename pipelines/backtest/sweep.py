@@ -0,0 +1,206 @@
+"""
+Parallel parameter sweep over indicator periods and ATR SL/TP multipliers.
+
+Candles and labels are loaded once, copied into a single shared-memory block and
+attached (zero-copy) by every worker process, so each task only pickles its small
+config dict instead of a DataFrame.
+
+Per config the sweep reports:
+  - SL/TP outcome of every labeled BUY/SELL candle (win rate, average R, expectancy)
+  - agreement of a simple EMA-trend + RSI rule with the human labels
+
+Run: python -m pipelines.backtest.sweep --symbol BTCUSDT --interval 1h \
+        --start 2024-01-01 --end 2024-12-31 --out sweep_results.csv
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from pipelines.backtest.sltp import SL_ATR_MULT, TP_ATR_MULT, simulate_exits
+from pipelines.common.logging import get_logger
+from pipelines.common.settings import POSTGRES_DSN, require
+from pipelines.features.indicators import atr, bollinger, ema, rsi
+from pipelines.features.load_from_pg import load_candles, load_labels
+
+log = get_logger(__name__)
+
+# Rows of the shared block; labels are NaN where a candle has no label.
+_FIELDS = ("open_time_ms", "open", "high", "low", "close", "volume", "label")
+
+DEFAULT_GRID = {
+    "rsi_period": [7, 14, 21],
+    "atr_period": [14],
+    "ema_fast": [20],
+    "ema_slow": [50, 200],
+    "bb_window": [20],
+    "sl_mult": [0.75, SL_ATR_MULT, 1.5],
+    "tp_mult": [1.0, TP_ATR_MULT, 2.0, 3.0],
+    "max_bars": [100],
+}
+
+# Worker-side view of the shared block (set by _init_worker)
+_SHM: shared_memory.SharedMemory | None = None
+_DATA: np.ndarray | None = None
+
+
+def expand_grid(grid: dict[str, list]) -> list[dict]:
+    """Cartesian product of a {param: [values]} grid as a list of config dicts."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def _candles_to_block(candles: pd.DataFrame, labels: pd.DataFrame) -> np.ndarray:
+    open_ms = candles["open_time"].dt.as_unit("ms").astype("int64").to_numpy()
+    label = np.full(len(candles), np.nan)
+    if not labels.empty:
+        label_ms = labels["open_time"].dt.as_unit("ms").astype("int64").to_numpy()
+        pos = np.searchsorted(open_ms, label_ms)
+        pos_ok = pos < len(open_ms)
+        hit = np.zeros(len(label_ms), dtype=bool)
+        hit[pos_ok] = open_ms[pos[pos_ok]] == label_ms[pos_ok]
+        label[pos[hit]] = labels["label"].to_numpy()[hit]
+    cols = [open_ms] + [candles[c].to_numpy(dtype=np.float64) for c in _FIELDS[1:6]] + [label]
+    return np.vstack(cols).astype(np.float64)
+
+
+def _init_worker(shm_name: str, shape: tuple[int, int]) -> None:
+    global _SHM, _DATA
+    _SHM = shared_memory.SharedMemory(name=shm_name)
+    _DATA = np.ndarray(shape, dtype=np.float64, buffer=_SHM.buf)
+
+
+def evaluate_config(cfg: dict, data: np.ndarray | None = None) -> dict:
+    """Evaluate one config against the candle block (defaults to the worker's shared block)."""
+    data = _DATA if data is None else data
+    _, _, high, low, close, _, label = data
+    close_s = pd.Series(close, copy=False)
+
+    rsi_v = rsi(close_s, cfg["rsi_period"]).to_numpy()
+    atr_v = atr(pd.Series(high, copy=False), pd.Series(low, copy=False), close_s, cfg["atr_period"]).to_numpy()
+    fast = ema(close_s, cfg["ema_fast"]).to_numpy()
+    slow = ema(close_s, cfg["ema_slow"]).to_numpy()
+    _, bb_up, bb_low, _ = bollinger(close_s, window=cfg["bb_window"])
+
+    # Skip warm-up bars where the slowest indicator is not yet meaningful
+    warmup = max(cfg["ema_slow"], cfg["bb_window"], cfg["rsi_period"], cfg["atr_period"])
+    idx = np.flatnonzero((label == 1) | (label == -1))
+    idx = idx[(idx >= warmup) & np.isfinite(atr_v[idx]) & (atr_v[idx] > 0)]
+    side = label[idx]
+
+    r, held = simulate_exits(
+        high, low, close, idx, side, atr_v,
+        sl_mult=cfg["sl_mult"], tp_mult=cfg["tp_mult"], max_bars=cfg["max_bars"],
+    )
+
+    # Rule: long in an up-trend unless overbought / above the upper band, short mirrored
+    bb_up = bb_up.to_numpy()
+    bb_low = bb_low.to_numpy()
+    rule = np.where(
+        (fast > slow) & (rsi_v < 70) & (close < bb_up), 1,
+        np.where((fast < slow) & (rsi_v > 30) & (close > bb_low), -1, 0),
+    )
+    rule_at = rule[idx]
+
+    n = len(idx)
+    return {
+        **cfg,
+        "n_trades": n,
+        "win_rate": float((r > 0).mean()) if n else np.nan,
+        "avg_r": float(r.mean()) if n else np.nan,
+        "total_r": float(r.sum()),
+        "avg_bars_held": float(held.mean()) if n else np.nan,
+        "rule_agreement": float((rule_at == side).mean()) if n else np.nan,
+        "rule_coverage": float((rule_at != 0).mean()) if n else np.nan,
+    }
+
+
+def run_sweep(
+    candles: pd.DataFrame,
+    labels: pd.DataFrame,
+    configs: list[dict],
+    workers: int | None = None,
+    chunksize: int | None = None,
+) -> pd.DataFrame:
+    """Evaluate every config in a process pool sharing one copy of the candle arrays."""
+    block = _candles_to_block(candles, labels)
+    workers = workers or os.cpu_count() or 1
+    chunksize = chunksize or max(1, len(configs) // (workers * 4))
+
+    shm = shared_memory.SharedMemory(create=True, size=block.nbytes)
+    try:
+        shared = np.ndarray(block.shape, dtype=np.float64, buffer=shm.buf)
+        shared[:] = block
+        del block
+
+        t0 = time.perf_counter()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(shm.name, shared.shape),
+        ) as pool:
+            results = list(pool.map(evaluate_config, configs, chunksize=chunksize))
+        log.info(
+            "Evaluated %d configs on %d candles with %d workers in %.1fs",
+            len(configs), shared.shape[1], workers, time.perf_counter() - t0,
+        )
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return pd.DataFrame(results).sort_values("total_r", ascending=False).reset_index(drop=True)
+
+
+def write_results(df: pd.DataFrame, path: str) -> None:
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel indicator / SL-TP parameter sweep")
+    parser.add_argument("--market-type", default=os.getenv("MARKET_TYPE", "um"))
+    parser.add_argument("--symbol", default=os.getenv("SYMBOL", "BTCUSDT"))
+    parser.add_argument("--interval", default="1h")
+    parser.add_argument("--start", type=date.fromisoformat, required=True)
+    parser.add_argument("--end", type=date.fromisoformat, required=True)
+    parser.add_argument("--grid", help="JSON file with {param: [values]}; defaults to DEFAULT_GRID")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    dsn = POSTGRES_DSN or require("POSTGRES_DSN")
+    grid = dict(DEFAULT_GRID)
+    if args.grid:
+        with open(args.grid) as f:
+            grid.update(json.load(f))
+
+    candles = load_candles(
+        dsn, args.market_type, args.symbol, args.interval,
+        start_date=args.start, end_date=args.end, max_candles=10_000_000,
+    )
+    labels = load_labels(dsn, args.market_type, args.symbol, args.interval, start_date=args.start, end_date=args.end)
+    if candles.empty:
+        log.warning("No candles for %s %s in range", args.symbol, args.interval)
+        return
+
+    configs = expand_grid(grid)
+    log.info("Sweeping %d configs over %d candles / %d labels", len(configs), len(candles), len(labels))
+    results = run_sweep(candles, labels, configs, workers=args.workers)
+    write_results(results, args.out)
+    log.info("Wrote %s", args.out)
+
+
+if __name__ == "__main__":
+    main()
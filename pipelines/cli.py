@@ -0,0 +1,86 @@
+"""
+Single entry point for the pipelines:
+
+    python -m pipelines download   [--symbols BTCUSDT] [--intervals 1m,1h] [--start 2019-01-01]
+    python -m pipelines backfill   [--days 90]
+    python -m pipelines stream     [--symbols BTCUSDT,ETHUSDT] [--intervals 1m] [--sharded [--local 4]]
+    python -m pipelines features   [dataset|multi-timeframe|cross-asset|bars] ...
+    python -m pipelines scan       [--table futures_candles] [--full]
+
+Everything after the command goes to that module's own parser (`python -m pipelines
+download --help`). Only argparse is imported here: pandas, psycopg, requests and the
+settings/.env are loaded when a command runs, and only what that command needs
+(`python -m benchmarks.import_budget` checks this stays cheap).
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import sys
+
+# command -> (module whose main() runs it, help)
+COMMANDS = {
+    "download": ("pipelines.ingestion.binance_archive", "futures kline archives -> market.futures_candles (missing days only)"),
+    "backfill": ("pipelines.ingestion.binance_rest", "Spot REST backfill -> market.candles_raw"),
+    "stream": ("pipelines.ingestion.binance_ws", "live Spot klines over WebSocket (--sharded: shared worker pool)"),
+    "features": ("pipelines.features.dataset", "training datasets and feature frames"),
+    "scan": ("pipelines.quality.scanner", "data-quality scan -> market.data_quality_issues"),
+}
+
+# `features <kind>`; dataset when no kind is given
+FEATURES = {
+    "dataset": "pipelines.features.dataset",
+    "multi-timeframe": "pipelines.features.multi_timeframe",
+    "cross-asset": "pipelines.features.cross_asset",
+    "bars": "pipelines.features.bars",
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="pipelines",
+        description="Market data pipelines",
+        epilog="\n".join(
+            [f"  {name:<10} {help_}" for name, (_, help_) in COMMANDS.items()]
+            + [f"\nfeatures kinds: {', '.join(FEATURES)} (default dataset)"]
+        ),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=list(COMMANDS), metavar="command")
+    return parser
+
+
+def resolve(command: str, args: list[str]) -> tuple[str, str, list[str]]:
+    """(module, prog, args for its main()) of a command line."""
+    module = COMMANDS[command][0]
+    prog = f"pipelines {command}"
+    if command == "features" and args and args[0] in FEATURES:
+        module, prog, args = FEATURES[args[0]], f"{prog} {args[0]}", args[1:]
+    elif command == "stream" and "--sharded" in args:
+        module, args = "pipelines.ingestion.sharded_ws", [a for a in args if a != "--sharded"]
+    return module, prog, args
+
+
+def main(argv: list[str] | None = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    parser = build_parser()
+    if not argv or argv[0] in ("-h", "--help"):
+        parser.print_help()
+        return
+    command = parser.parse_args(argv[:1]).command
+    module, prog, args = resolve(command, argv[1:])
+
+    from pipelines.common.settings import load_env
+
+    # .env before the command's imports, as when settings loaded it at import time
+    load_env()
+    sys.argv = [prog, *args]
+    result = importlib.import_module(module).main()
+    if hasattr(result, "__await__"):
+        import asyncio
+
+        asyncio.run(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,10 +12,18 @@ def setup_logging(level: Optional[str] = None) -> None:
 
     lvl = (level or os.getenv("LOGGING_LEVEL", "INFO") or os.getenv("AIRFLOW__CORE__LOGGING_LEVEL") or "INFO").upper()
 
-    logging.basicConfig(
-        level=getattr(logging, lvl, logging.INFO),
-        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-    )
+    if (os.getenv("LOG_FORMAT") or "").lower() == "json":
+        # Structured logs: one JSON object per line, extra={...} fields included
+        from pythonjsonlogger import jsonlogger
+
+        handler = logging.StreamHandler()
+        handler.setFormatter(jsonlogger.JsonFormatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        logging.basicConfig(level=getattr(logging, lvl, logging.INFO), handlers=[handler])
+    else:
+        logging.basicConfig(
+            level=getattr(logging, lvl, logging.INFO),
+            format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+        )
 
     logging.getLogger("websockets").setLevel(logging.WARNING)
     logging.getLogger("asyncio").setLevel(logging.WARNING)
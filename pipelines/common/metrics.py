@@ -0,0 +1,257 @@
+"""
+Minimal in-process metrics (counters, gauges, histograms) with Prometheus text
+exposition on a local HTTP port.
+
+    from pipelines.common import metrics
+    ROWS = metrics.counter("db_rows_written_total", "Rows upserted", ["table"])
+    ROWS.inc(500, table="futures_candles")
+    with metrics.HTTP_SECONDS.time(endpoint="klines"):
+        ...
+    metrics.start_http_server()   # serves /metrics on METRICS_PORT (no-op when unset)
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pipelines.common.logging import get_logger
+from pipelines.common.settings import METRICS_PORT
+from pipelines.ingestion.intervals import interval_to_ms
+
+log = get_logger(__name__)
+
+# Latency buckets in seconds: 1ms .. 60s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return repr(float(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, doc, labelnames=()):
+        super().__init__(name, doc, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self._values: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        les = [f'le="{b}"' for b in self.buckets] + ['le="+Inf"']
+        out = []
+        for key, state in items:
+            for le, n in zip(les, state[:-2] + [state[-1]]):
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {_fmt_value(n)}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_value(state[-2])}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {_fmt_value(state[-1])}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Metric {metric.name} already registered as {existing.kind}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, doc: str, labelnames=()) -> Counter:
+    return REGISTRY.register(Counter(name, doc, labelnames))
+
+
+def gauge(name: str, doc: str, labelnames=()) -> Gauge:
+    return REGISTRY.register(Gauge(name, doc, labelnames))
+
+
+def histogram(name: str, doc: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, doc, labelnames, buckets))
+
+
+# ---------------------------------------------------------------------------
+# Pipeline metrics shared by the ingestion modules
+# ---------------------------------------------------------------------------
+HTTP_SECONDS = histogram("binance_http_request_seconds", "Binance HTTP request latency", ["endpoint"])
+HTTP_REQUESTS = counter("binance_http_requests_total", "Binance HTTP requests by status code", ["endpoint", "status"])
+HTTP_BYTES = counter("binance_http_response_bytes_total", "Bytes downloaded from Binance", ["endpoint"])
+KLINES_FETCHED = counter("binance_klines_fetched_total", "Klines returned by the REST API", ["symbol", "interval"])
+
+DB_UPSERT_SECONDS = histogram("db_upsert_seconds", "Latency of one upsert call (incl. commit where applicable)", ["table"])
+DB_ROWS = counter("db_rows_written_total", "Rows sent to Postgres upserts", ["table"])
+DB_UPSERT_OUTCOMES = counter(
+    "db_upsert_rows_total", "Upserted rows by outcome (inserted / updated / skipped as unchanged)", ["table", "outcome"]
+)
+
+WS_MESSAGES = counter("ws_messages_total", "Kline messages received", ["symbol", "interval", "final"])
+WS_RECONNECTS = counter("ws_reconnects_total", "WebSocket (re)connect attempts after an error", ["symbol", "interval"])
+WS_COMMIT_SECONDS = histogram(
+    "ws_event_to_commit_seconds",
+    "Binance event time to Postgres commit of a closed candle",
+    ["symbol", "interval"],
+)
+STREAM_LAG_SECONDS = gauge(
+    "stream_lag_seconds",
+    "Seconds since the latest stored final candle closed (from market.api_metadata)",
+    ["exchange", "symbol", "interval"],
+)
+
+
+def update_stream_freshness(conn) -> None:
+    """Refresh STREAM_LAG_SECONDS from market.api_metadata."""
+    rows = conn.execute(
+        """
+        SELECT exchange, symbol, interval,
+               extract(epoch FROM last_final_candle_open_time) * 1000
+        FROM market.api_metadata
+        WHERE last_final_candle_open_time IS NOT NULL
+        """
+    ).fetchall()
+    now_ms = time.time() * 1000
+    for exchange, symbol, interval, open_ms in rows:
+        try:
+            close_ms = float(open_ms) + interval_to_ms(interval)
+        except ValueError:
+            continue
+        STREAM_LAG_SECONDS.set(max(0.0, (now_ms - close_ms) / 1000), exchange=exchange, symbol=symbol, interval=interval)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+_SERVER: ThreadingHTTPServer | None = None
+
+
+def start_http_server(port: int | None = None, host: str = "127.0.0.1") -> ThreadingHTTPServer | None:
+    """Serve /metrics in a daemon thread. Uses METRICS_PORT when port is None; no-op if unset/0."""
+    global _SERVER
+    if _SERVER is not None:
+        return _SERVER
+    if port is None:
+        port = METRICS_PORT
+    if not port:
+        return None
+    _SERVER = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=_SERVER.serve_forever, name="metrics-http", daemon=True).start()
+    log.info("Metrics on http://%s:%d/metrics", host, port)
+    return _SERVER
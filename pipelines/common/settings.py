@@ -1,5 +1,16 @@
+"""
+Environment settings, parsed once into a typed Settings object on first use.
+
+    from pipelines.common.settings import get_settings
+    get_settings().postgres_dsn
+
+The module-level names (POSTGRES_DSN, SYMBOLS, ...) still work and read the same cached
+object, so importing this module costs nothing until a value is needed; `.env` is loaded
+at that point too.
+"""
+import functools
 import os
-from dotenv import load_dotenv
+from dataclasses import dataclass
 from pathlib import Path
 
 from pipelines.common.exceptions import ConfigError
@@ -7,11 +18,18 @@ from pipelines.common.exceptions import ConfigError
 BASE_DIR = Path(__file__).resolve().parents[2]
 ENV_PATH = BASE_DIR / ".env"
 
-if ENV_PATH.exists():
-    load_dotenv(str(ENV_PATH))
+
+@functools.cache
+def load_env() -> None:
+    """Load .env into os.environ (once; existing variables win)."""
+    if ENV_PATH.exists():
+        from dotenv import load_dotenv
+
+        load_dotenv(str(ENV_PATH))
 
 
 def _get(name: str, default: str | None = None) -> str | None:
+    load_env()
     val = os.getenv(name, default)
     if val is None or val == "":
         return None
@@ -63,24 +81,84 @@ def as_list(var_name: str, default=None, sep=",") -> list[str]:
     return [x.strip() for x in raw.split(sep) if x.strip()]
 
 
-# Exchange / mode
-EXCHANGE = _get("EXCHANGE", "binance")
-MODE = _get("MODE", "paper")
-
-SYMBOLS = as_list("SYMBOLS", default=["BTCUSDT", "ETHUSDT"])
-INTERVALS = as_list("INTERVALS", default=["1h"])
-
-# Binance
-BINANCE_USE_TESTNET = as_bool("BINANCE_USE_TESTNET", False)
-BINANCE_API_KEY = _get("BINANCE_API_KEY")
-BINANCE_API_SECRET = _get("BINANCE_API_SECRET")
-BINANCE_BASE_URL = _get(
-    "BINANCE_BASE_URL",
-    "https://testnet.binance.vision" if BINANCE_USE_TESTNET else "https://api.binance.com",
-)
-BINANCE_WS_URL = _get(
-    "BINANCE_WS_URL",
-    "wss://testnet.binance.vision/ws" if BINANCE_USE_TESTNET else "wss://stream.binance.com:9443/ws",
-)
-
-POSTGRES_DSN = _get("POSTGRES_DSN")
\ No newline at end of file
+@dataclass(frozen=True)
+class Settings:
+    # Exchange / mode
+    exchange: str
+    mode: str
+    symbols: list[str]
+    intervals: list[str]
+
+    # Binance
+    binance_use_testnet: bool
+    binance_api_key: str | None
+    binance_api_secret: str | None
+    binance_base_url: str
+    binance_ws_url: str
+    # Bulk kline archives (point at a replay server for offline load tests)
+    binance_archive_url: str
+    # Local store for aggTrades archives (pipelines.ingestion.agg_trades)
+    agg_trades_dir: str
+
+    postgres_dsn: str | None
+    # LISTEN/NOTIFY channel the candle writers announce new rows on
+    candle_notify_channel: str
+
+    # Observability
+    metrics_port: int  # 0 = no /metrics endpoint
+
+    # Tracing / profiling (pipelines.common.tracing); all off by default
+    trace_enabled: bool
+    trace_dir: str
+    trace_profile: str | None  # "cprofile" to also dump a .prof per run
+
+    # Live candle cache (pipelines.ingestion.live_cache) filled by the WS listener
+    live_cache_name: str | None  # shared-memory segment name; unset = in-process only
+    live_cache_bars: int  # closed bars kept per symbol/interval
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        testnet = as_bool("BINANCE_USE_TESTNET", False)
+        return cls(
+            exchange=_get("EXCHANGE", "binance"),
+            mode=_get("MODE", "paper"),
+            symbols=as_list("SYMBOLS", default=["BTCUSDT", "ETHUSDT"]),
+            intervals=as_list("INTERVALS", default=["1h"]),
+            binance_use_testnet=testnet,
+            binance_api_key=_get("BINANCE_API_KEY"),
+            binance_api_secret=_get("BINANCE_API_SECRET"),
+            binance_base_url=_get(
+                "BINANCE_BASE_URL",
+                "https://testnet.binance.vision" if testnet else "https://api.binance.com",
+            ),
+            binance_ws_url=_get(
+                "BINANCE_WS_URL",
+                "wss://testnet.binance.vision/ws" if testnet else "wss://stream.binance.com:9443/ws",
+            ),
+            binance_archive_url=_get("BINANCE_ARCHIVE_URL", "https://data.binance.vision"),
+            agg_trades_dir=_get("AGG_TRADES_DIR", "data/agg_trades"),
+            postgres_dsn=_get("POSTGRES_DSN"),
+            candle_notify_channel=_get("CANDLE_NOTIFY_CHANNEL", "market_candles"),
+            metrics_port=as_int("METRICS_PORT", 0),
+            trace_enabled=as_bool("PIPELINE_TRACE", False),
+            trace_dir=_get("PIPELINE_TRACE_DIR", "traces"),
+            trace_profile=_get("PIPELINE_PROFILE"),
+            live_cache_name=_get("LIVE_CACHE_NAME"),
+            live_cache_bars=as_int("LIVE_CACHE_BARS", 500),
+        )
+
+
+@functools.cache
+def get_settings() -> Settings:
+    return Settings.from_env()
+
+
+# Module-level names kept from before Settings: SYMBOLS -> symbols, TRACE_ENABLED -> trace_enabled, ...
+_ALIASES = {f.upper(): f for f in Settings.__dataclass_fields__}
+
+
+def __getattr__(name: str):
+    field = _ALIASES.get(name)
+    if field is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(get_settings(), field)
@@ -0,0 +1,174 @@
+"""
+Opt-in stage tracing: per-span wall time, thread CPU time and net allocated blocks,
+aggregated by call path and dumped at process exit.
+
+    from pipelines.common.tracing import span, traced
+
+    with span("zip.decode"):
+        ...
+
+    @traced("archive.download_day")
+    def download_day(...): ...
+
+Enable with PIPELINE_TRACE=1. Each process then writes to PIPELINE_TRACE_DIR (default
+./traces):
+    <run>.spans.json   count / wall / cpu / alloc_blocks per span path
+    <run>.collapsed    self wall time (µs) per path, for flamegraph.pl / speedscope
+    <run>.prof         cProfile stats when PIPELINE_PROFILE=cprofile
+
+When disabled, span() returns one shared no-op context manager and @traced returns
+the function unchanged, so instrumented code pays a single function call per span.
+"""
+from __future__ import annotations
+
+import atexit
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pipelines.common.logging import get_logger
+from pipelines.common.settings import TRACE_DIR, TRACE_ENABLED, TRACE_PROFILE
+
+log = get_logger(__name__)
+
+_NULL_SPAN = nullcontext()
+
+# Current span path; a ContextVar so each thread and each asyncio task nests its own spans
+_path: contextvars.ContextVar[tuple[str, ...]] = contextvars.ContextVar("trace_span_path", default=())
+_lock = threading.Lock()
+# path tuple -> [count, wall_s, cpu_s, alloc_blocks, child_wall_s]
+_stats: dict[tuple[str, ...], list[float]] = {}
+_installed = False
+_profiler = None
+
+
+def enabled() -> bool:
+    return TRACE_ENABLED
+
+
+class _Span:
+    __slots__ = ("name", "path", "token", "t0", "c0", "a0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        if not _installed:
+            install()
+        self.path = _path.get() + (self.name,)
+        self.token = _path.set(self.path)
+        self.a0 = sys.getallocatedblocks()
+        self.c0 = time.thread_time()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.t0
+        cpu = time.thread_time() - self.c0
+        alloc = sys.getallocatedblocks() - self.a0
+        _path.reset(self.token)
+        with _lock:
+            rec = _stats.get(self.path)
+            if rec is None:
+                rec = _stats[self.path] = [0, 0.0, 0.0, 0, 0.0]
+            rec[0] += 1
+            rec[1] += wall
+            rec[2] += cpu
+            rec[3] += alloc
+            if len(self.path) > 1:
+                parent = _stats.setdefault(self.path[:-1], [0, 0.0, 0.0, 0, 0.0])
+                parent[4] += wall
+        return False
+
+
+def span(name: str):
+    """Context manager timing the enclosed block as `name` (nested spans form a path)."""
+    if not TRACE_ENABLED:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def traced(name: str | None = None):
+    """Decorator form of span(); a no-op (returns fn itself) when tracing is disabled."""
+    def wrap(fn):
+        if not TRACE_ENABLED:
+            return fn
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with _Span(label):
+                return fn(*args, **kwargs)
+
+        return inner
+
+    return wrap
+
+
+def install() -> None:
+    """Start the optional profiler and register the exit-time dump (done lazily by the first span)."""
+    global _installed, _profiler
+    with _lock:
+        if _installed:
+            return
+        _installed = True
+    if TRACE_PROFILE == "cprofile":
+        import cProfile
+
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    atexit.register(dump)
+
+
+def snapshot() -> list[dict]:
+    """Aggregated span stats, slowest paths first."""
+    with _lock:
+        items = [(path, list(rec)) for path, rec in _stats.items()]
+    out = [
+        {
+            "path": ";".join(path),
+            "count": int(rec[0]),
+            "wall_s": rec[1],
+            "self_wall_s": max(0.0, rec[1] - rec[4]),
+            "cpu_s": rec[2],
+            "alloc_blocks": int(rec[3]),
+        }
+        for path, rec in items
+        if rec[0]
+    ]
+    return sorted(out, key=lambda r: r["wall_s"], reverse=True)
+
+
+def dump(directory: str | None = None) -> Path | None:
+    """Write spans JSON, collapsed stacks and (if enabled) the cProfile dump for this process."""
+    rows = snapshot()
+    if not rows and _profiler is None:
+        return None
+    out_dir = Path(directory or TRACE_DIR)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    run = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{os.getpid()}"
+    base = out_dir / run
+
+    with open(f"{base}.spans.json", "w") as f:
+        json.dump({"argv": sys.argv, "spans": rows}, f, indent=2)
+    with open(f"{base}.collapsed", "w") as f:
+        for r in rows:
+            f.write(f"{r['path']} {int(r['self_wall_s'] * 1e6)}\n")
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(f"{base}.prof")
+
+    log.info("Trace written to %s.*", base)
+    return base
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
@@ -0,0 +1,192 @@
+"""
+Vectorized trade-to-bar aggregation over aggTrades (pipelines.ingestion.agg_trades).
+
+    trades = load_agg_trades("um", "BTCUSDT", date(2024, 1, 1), date(2024, 1, 1))
+    time_bars(trades, "1m")            # same candles as the 1m klines
+    tick_bars(trades, 1_000)           # every 1000 exchange trades
+    volume_bars(trades, 100.0)         # every 100 BTC
+    dollar_bars(trades, 5_000_000.0)   # every $5M notional
+
+Every builder returns the market.futures_candles column set: open_time, open, high,
+low, close, volume, close_time (UTC timestamps), quote_volume, num_trades,
+taker_buy_base, taker_buy_quote. Bars are cut by computing a bar id per trade and
+reducing each run of equal ids with ufunc.reduceat, so there is no per-trade Python loop.
+
+Threshold (tick/volume/dollar) bars assign a trade to bar k when the cumulative measure
+before it lies in [k*size, (k+1)*size); a bar therefore closes with the trade that
+crosses the threshold and the overshoot counts towards the next bar.
+
+Run: python -m pipelines.features.bars --symbol BTCUSDT --start 2024-01-01 --kind dollar --size 5e6 --out bars.csv
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from pipelines.common.logging import get_logger
+from pipelines.common.settings import AGG_TRADES_DIR
+from pipelines.common.tracing import traced
+from pipelines.ingestion.agg_trades import AggTrades, load_agg_trades
+from pipelines.ingestion.intervals import interval_to_ms
+
+log = get_logger(__name__)
+
+BAR_COLUMNS = [
+    "open_time",
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "close_time",
+    "quote_volume",
+    "num_trades",
+    "taker_buy_base",
+    "taker_buy_quote",
+]
+
+
+def _run_starts(ids: np.ndarray) -> np.ndarray:
+    """Index of the first element of every run of equal (non-decreasing) ids."""
+    if not len(ids):
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+
+
+def _reduce(trades: AggTrades, starts: np.ndarray) -> dict[str, np.ndarray]:
+    """Per-bar OHLCV and flow sums for bars beginning at `starts`."""
+    price, qty = trades.price, trades.qty
+    quote = price * qty
+    taker_buy = ~trades.is_buyer_maker  # buyer is the taker when the maker sold
+    last = np.r_[starts[1:], len(price)] - 1
+    return {
+        "open": price[starts],
+        "high": np.maximum.reduceat(price, starts),
+        "low": np.minimum.reduceat(price, starts),
+        "close": price[last],
+        "volume": np.add.reduceat(qty, starts),
+        "quote_volume": np.add.reduceat(quote, starts),
+        "num_trades": np.add.reduceat(trades.n_trades.astype(np.int64), starts),
+        "taker_buy_base": np.add.reduceat(np.where(taker_buy, qty, 0.0), starts),
+        "taker_buy_quote": np.add.reduceat(np.where(taker_buy, quote, 0.0), starts),
+    }
+
+
+def _frame(cols: dict[str, np.ndarray], open_ms: np.ndarray, close_ms: np.ndarray) -> pd.DataFrame:
+    df = pd.DataFrame(cols)
+    df.insert(0, "open_time", pd.to_datetime(open_ms, unit="ms", utc=True))
+    df.insert(6, "close_time", pd.to_datetime(close_ms, unit="ms", utc=True))
+    return df[BAR_COLUMNS]
+
+
+def _empty() -> pd.DataFrame:
+    return pd.DataFrame({c: pd.Series(dtype="float64") for c in BAR_COLUMNS})
+
+
+@traced("numpy.time_bars")
+def time_bars(trades: AggTrades, interval: str, *, fill_empty: bool = True) -> pd.DataFrame:
+    """
+    Bars per fixed interval (open_time aligned to the interval like Binance klines).
+    With fill_empty, intervals without trades get a flat bar at the previous close and
+    zero volume, as the kline archives have.
+    """
+    if not len(trades):
+        return _empty()
+    step = interval_to_ms(interval)
+    bucket = trades.time_ms // step
+    starts = _run_starts(bucket)
+    cols = _reduce(trades, starts)
+    ids = bucket[starts]
+
+    if fill_empty and len(ids) and ids[-1] - ids[0] + 1 > len(ids):
+        full = np.arange(ids[0], ids[-1] + 1)
+        src = np.full(len(full), -1, dtype=np.int64)
+        src[ids - ids[0]] = np.arange(len(ids))
+        present = src >= 0
+        src = np.maximum.accumulate(src)  # the first bucket always has trades
+        prev_close = cols["close"][src]
+        for name in ("open", "high", "low", "close"):
+            cols[name] = np.where(present, cols[name][src], prev_close)
+        for name in ("volume", "quote_volume", "num_trades", "taker_buy_base", "taker_buy_quote"):
+            cols[name] = np.where(present, cols[name][src], 0)
+        ids = full
+
+    open_ms = ids * step
+    return _frame(cols, open_ms, open_ms + step - 1)
+
+
+def _threshold_bars(trades: AggTrades, measure: np.ndarray, size: float) -> pd.DataFrame:
+    if size <= 0:
+        raise ValueError("Bar size must be positive")
+    if not len(trades):
+        return _empty()
+    cum = np.cumsum(measure, dtype=np.float64)
+    ids = ((cum - measure) // size).astype(np.int64)
+    starts = _run_starts(ids)
+    last = np.r_[starts[1:], len(ids)] - 1
+    return _frame(_reduce(trades, starts), trades.time_ms[starts], trades.time_ms[last])
+
+
+@traced("numpy.tick_bars")
+def tick_bars(trades: AggTrades, n: int) -> pd.DataFrame:
+    """A bar every `n` exchange trades (an aggregated trade counts as all the trades it merges)."""
+    return _threshold_bars(trades, trades.n_trades, n)
+
+
+@traced("numpy.volume_bars")
+def volume_bars(trades: AggTrades, qty: float) -> pd.DataFrame:
+    """A bar every `qty` units of base asset traded."""
+    return _threshold_bars(trades, trades.qty, qty)
+
+
+@traced("numpy.dollar_bars")
+def dollar_bars(trades: AggTrades, notional: float) -> pd.DataFrame:
+    """A bar every `notional` of quote asset traded."""
+    return _threshold_bars(trades, trades.price * trades.qty, notional)
+
+
+def build_bars(trades: AggTrades, kind: str, size: str | float) -> pd.DataFrame:
+    """Dispatch on kind: time (size = interval such as "1m"), tick, volume or dollar."""
+    if kind == "time":
+        return time_bars(trades, str(size))
+    if kind == "tick":
+        return tick_bars(trades, int(float(size)))
+    if kind == "volume":
+        return volume_bars(trades, float(size))
+    if kind == "dollar":
+        return dollar_bars(trades, float(size))
+    raise ValueError(f"Unknown bar kind: {kind}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build time/tick/volume/dollar bars from stored aggTrades")
+    parser.add_argument("--market-type", default="um", choices=["um", "cm"])
+    parser.add_argument("--symbol", required=True)
+    parser.add_argument("--start", type=date.fromisoformat, required=True)
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="defaults to --start")
+    parser.add_argument("--kind", choices=["time", "tick", "volume", "dollar"], default="time")
+    parser.add_argument("--size", default="1m", help="interval for time bars, threshold otherwise")
+    parser.add_argument("--store", default=AGG_TRADES_DIR)
+    parser.add_argument("--out", required=True, help=".csv or .parquet")
+    args = parser.parse_args()
+
+    trades = load_agg_trades(args.market_type, args.symbol, args.start, args.end or args.start, args.store)
+    t0 = time.perf_counter()
+    bars = build_bars(trades, args.kind, args.size)
+    elapsed = time.perf_counter() - t0
+    log.info(
+        "%d trades -> %d %s bars in %.2fs (%.1fM trades/s)",
+        len(trades), len(bars), args.kind, elapsed, len(trades) / max(elapsed, 1e-9) / 1e6,
+    )
+    if args.out.endswith(".parquet"):
+        bars.to_parquet(args.out, index=False)
+    else:
+        bars.to_csv(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Compact in-memory layout for candle and feature frames.
+
+load_candles(..., compact=True) / iter_candles(..., compact=True) return
+    open_time   int64 epoch ms (or int32 seconds after df.attrs["time_base_ms"] with time="s32")
+    OHLCV       float32
+    symbol etc. categorical (any text key columns)
+and add_indicators(df, inplace=True, dtype="float32") adds float32 features without
+copying the frame: 28 bytes per candle and 92 per feature row instead of 48 / 176.
+
+float32 keeps ~7 significant digits. Indicators are computed in float64 from the float32
+prices and rounded once when stored; check_accuracy() bounds the resulting error
+(tests/test_compact_accuracy.py runs it on synthetic candles):
+
+    python -m pipelines.features.compact --check
+    python -m pipelines.features.compact --symbol BTCUSDT --interval 1m --limit 500000
+"""
+from __future__ import annotations
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from pipelines.common.logging import get_logger
+from pipelines.features.indicators import add_indicators
+
+log = get_logger(__name__)
+
+PRICE_COLUMNS = ("open", "high", "low", "close", "volume")
+KEY_COLUMNS = ("market_type", "exchange", "symbol", "interval")
+
+# Largest error vs the float64 pipeline that check_accuracy() accepts
+ACCURACY_BOUNDS = {
+    "rsi_14": ("abs", 1e-2),        # RSI points (0..100); float32 prices move deltas by ~1 ulp
+    "macd": ("rel_close", 1e-7),    # relative to the price level
+    "macd_signal": ("rel_close", 1e-7),
+    "macd_hist": ("rel_close", 1e-7),
+    "bb_ma20": ("rel", 1e-6),
+    "bb_upper": ("rel", 1e-6),
+    "bb_lower": ("rel", 1e-6),
+    "bb_width": ("abs", 1e-6),
+}
+
+
+def compact_frame(df: pd.DataFrame, *, time: str = "ms") -> pd.DataFrame:
+    """
+    Convert a candle frame to the compact layout in place and return it. time="ms" keeps
+    int64 epoch ms; time="s32" stores int32 seconds since df.attrs["time_base_ms"].
+    """
+    if "open_time" in df.columns:
+        t = df["open_time"]
+        if pd.api.types.is_datetime64_any_dtype(t):
+            t = t.dt.as_unit("ms").astype("int64")
+        if time == "s32":
+            base = int(t.iloc[0]) if len(t) else 0
+            df["open_time"] = ((t - base) // 1000).astype("int32")
+            df.attrs["time_base_ms"] = base
+        elif time == "ms":
+            df["open_time"] = t.astype("int64")
+        else:
+            raise ValueError(f"Unsupported time layout: {time}")
+    for col in PRICE_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("float32")
+    for col in KEY_COLUMNS:
+        if col in df.columns and df[col].dtype == object:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def open_time_ms(df: pd.DataFrame) -> np.ndarray:
+    """Epoch-ms open times of a compact (or datetime) frame, whichever layout it uses."""
+    t = df["open_time"]
+    if pd.api.types.is_datetime64_any_dtype(t):
+        return t.dt.as_unit("ms").astype("int64").to_numpy()
+    if t.dtype == np.int32:
+        return df.attrs.get("time_base_ms", 0) + t.to_numpy(dtype=np.int64) * 1000
+    return t.to_numpy(dtype=np.int64)
+
+
+def memory_report(df: pd.DataFrame) -> dict:
+    """Total bytes, bytes per row and per-column bytes per row (deep, so object columns count fully)."""
+    per_col = df.memory_usage(deep=True, index=True)
+    rows = max(len(df), 1)
+    return {
+        "rows": len(df),
+        "total_bytes": int(per_col.sum()),
+        "bytes_per_row": float(per_col.sum()) / rows,
+        "columns": {k: round(float(v) / rows, 2) for k, v in per_col.items()},
+    }
+
+
+def check_accuracy(df: pd.DataFrame, bounds: dict = ACCURACY_BOUNDS) -> dict[str, float]:
+    """
+    Compare compact indicators with the float64 pipeline on df (datetime candles) and
+    raise AssertionError if any bound is exceeded. Returns the observed error per column.
+    """
+    ref = add_indicators(df)
+    small = add_indicators(compact_frame(df.copy()), inplace=True, dtype="float32")
+    scale_close = ref["close"].abs()
+    errors = {}
+    for col, (kind, bound) in bounds.items():
+        a = ref[col].to_numpy(dtype=np.float64)
+        b = small[col].to_numpy(dtype=np.float64)
+        ok = ~np.isnan(a)
+        if (np.isnan(b) != np.isnan(a)).any():
+            raise AssertionError(f"{col}: NaN pattern differs from the float64 pipeline")
+        diff = np.abs(a[ok] - b[ok])
+        if kind == "rel":
+            diff = diff / np.maximum(np.abs(a[ok]), 1e-12)
+        elif kind == "rel_close":
+            diff = diff / scale_close.to_numpy()[ok]
+        err = float(diff.max()) if diff.size else 0.0
+        errors[col] = err
+        if err > bound:
+            raise AssertionError(f"{col}: float32 error {err:.3g} exceeds {bound:.3g}")
+    return errors
+
+
+def _synthetic_candles(n: int) -> pd.DataFrame:
+    from pipelines.ingestion.synthetic import synthetic_klines
+
+    df = synthetic_klines(n=n)[["open_time", *PRICE_COLUMNS]]
+    df["open_time"] = pd.to_datetime(df["open_time"], unit="ms", utc=True)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact frame memory / accuracy report")
+    parser.add_argument("--check", action="store_true", help="accuracy check on synthetic 1m candles")
+    parser.add_argument("--rows", type=int, default=525_600, help="synthetic rows for --check")
+    parser.add_argument("--market-type", default="um")
+    parser.add_argument("--symbol")
+    parser.add_argument("--interval", default="1m")
+    parser.add_argument("--limit", type=int, default=100_000)
+    args = parser.parse_args()
+
+    if args.check or not args.symbol:
+        df = _synthetic_candles(args.rows)
+    else:
+        from pipelines.common.settings import POSTGRES_DSN, require
+        from pipelines.features.load_from_pg import load_candles
+
+        df = load_candles(
+            POSTGRES_DSN or require("POSTGRES_DSN"), args.market_type, args.symbol, args.interval,
+            limit=args.limit, max_candles=args.limit,
+        )
+    default = memory_report(add_indicators(df))
+    compact = memory_report(add_indicators(compact_frame(df.copy()), inplace=True, dtype="float32"))
+    log.info(
+        "%d rows: %.1f bytes/row default, %.1f compact (candles: %.1f -> %.1f)",
+        len(df), default["bytes_per_row"], compact["bytes_per_row"],
+        memory_report(df)["bytes_per_row"], memory_report(compact_frame(df.copy()))["bytes_per_row"],
+    )
+    errors = check_accuracy(df)
+    log.info("float32 max error: %s", ", ".join(f"{k}={v:.2g}" for k, v in errors.items()))
+
+
+if __name__ == "__main__":
+    main()
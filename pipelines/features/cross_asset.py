@@ -0,0 +1,384 @@
+"""
+Cross-asset statistics over many symbols: an aligned price panel (open_time x symbol)
+from the candle tables, and on its log returns
+    beta_<w>, corr_<w>    rolling beta / correlation to a benchmark symbol (BTCUSDT)
+    ret_<w>               w-bar log return
+    ret_<w>_z, _rank      cross-sectional z-score / percentile rank of ret_<w> at each bar
+
+Rolling moments are running sums updated once per bar (add the entering row, subtract
+the leaving one), so cost is O(symbols) per bar whatever the window. iter_cross_asset()
+walks the price panel in row chunks carrying those sums, so besides the panel itself
+(rows x symbols floats) only one chunk of outputs is in memory; the CLI streams the
+chunks to its output file, while load_cross_asset() concatenates them into one frame.
+
+    df = load_cross_asset(dsn, "um", SYMBOLS, "1m", window=1440,
+                          start_date=date(2024, 1, 1), end_date=date(2024, 6, 30))
+    # long format: open_time, symbol, close, ret, ret_1440, ret_1440_z, ret_1440_rank, beta_1440, corr_1440
+    for chunk in iter_cross_asset(panel, 1440): ...    # same rows, chunk by chunk
+
+Run:
+    python -m pipelines.features.cross_asset --symbols BTCUSDT,ETHUSDT,SOLUSDT --interval 1m \
+        --window 1440 --start 2024-01-01 --out cross.parquet
+"""
+from __future__ import annotations
+
+import argparse
+import io
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+import psycopg
+
+from pipelines.common.logging import get_logger
+from pipelines.common.settings import POSTGRES_DSN, SYMBOLS, require
+from pipelines.common.tracing import traced
+from pipelines.features.load_from_pg import _series_filter
+from pipelines.ingestion.intervals import interval_to_ms
+
+log = get_logger(__name__)
+
+_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+def _read_series(
+    conn: psycopg.Connection, market_type: str, symbol: str, interval: str, field: str, table: str, start, end
+) -> tuple[np.ndarray, np.ndarray]:
+    """(epoch ms, values) of one series, streamed with COPY (no per-row Python objects)."""
+    qualified, where, params = _series_filter(market_type, symbol, interval, table, start, end)
+    buf = io.BytesIO()
+    with conn.cursor() as cur:
+        sql = f"""
+            COPY (
+              SELECT (extract(epoch FROM open_time) * 1000)::bigint, {field}::float8
+              FROM {qualified} WHERE {where} ORDER BY open_time
+            ) TO STDOUT
+        """
+        with cur.copy(sql, params) as copy:
+            for block in copy:
+                buf.write(block)
+    if not buf.tell():
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    buf.seek(0)
+    df = pd.read_csv(buf, sep="\t", header=None, names=["t", "v"], dtype={"t": np.int64, "v": np.float64})
+    return df["t"].to_numpy(), df["v"].to_numpy()
+
+
+@traced("postgres.load_panel")
+def load_panel(
+    dsn: str,
+    market_type: str,
+    symbols: list[str],
+    interval: str,
+    *,
+    table: str = "futures_candles",
+    start_date: date | datetime | None = None,
+    end_date: date | datetime | None = None,
+    field: str = "close",
+    compact: bool = False,
+) -> pd.DataFrame:
+    """
+    Wide frame of one candle field: index open_time (datetime, UTC; union of all
+    symbols' bars), one column per symbol, NaN where a symbol has no candle.
+    Symbols with no data are dropped. compact=True stores float32.
+    """
+    if field not in _FIELDS:
+        raise ValueError(f"Unsupported field: {field}")
+    series = {}
+    with psycopg.connect(dsn) as conn:
+        for symbol in symbols:
+            t, v = _read_series(conn, market_type, symbol, interval, field, table, start_date, end_date)
+            if len(t):
+                series[symbol] = (t, v)
+    if not series:
+        return pd.DataFrame()
+    times = np.unique(np.concatenate([t for t, _ in series.values()]))
+    values = np.full((len(times), len(series)), np.nan, dtype=np.float32 if compact else np.float64)
+    for j, (t, v) in enumerate(series.values()):
+        values[np.searchsorted(times, t), j] = v
+    index = pd.DatetimeIndex(pd.to_datetime(times, unit="ms", utc=True), name="open_time")
+    return pd.DataFrame(values, index=index, columns=pd.Index(list(series), name="symbol"))
+
+
+def log_returns(panel: pd.DataFrame, periods: int = 1) -> pd.DataFrame:
+    """log(p_t / p_{t-periods}); NaN where either end is missing."""
+    logp = np.log(panel.to_numpy(dtype=np.float64))
+    out = np.full_like(logp, np.nan)
+    out[periods:] = logp[periods:] - logp[:-periods]
+    return pd.DataFrame(out, index=panel.index, columns=panel.columns)
+
+
+def _moment_terms(x: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Per-row terms of the pairwise moments: stacked n, x, b, x*x, b*b, x*b (rows where both are set)."""
+    valid = ~np.isnan(x) & ~np.isnan(b)[:, None]
+    x = np.where(valid, x, 0.0)
+    b = np.where(valid, b[:, None], 0.0)
+    return np.stack([valid.astype(np.float64), x, b, x * x, b * b, x * b])
+
+
+class RollingMoments:
+    """
+    Running pairwise sums (n, x, b, x*x, b*b, x*b) of every column with a benchmark over
+    the last `window` rows, advanced chunk by chunk; the state is 6 x columns floats.
+    Windows with fewer than min_periods (default window) joint observations give NaN.
+    """
+
+    def __init__(self, columns: int, window: int, min_periods: int | None = None):
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self.sums = np.zeros((6, columns))
+
+    def update(
+        self, x: np.ndarray, b: np.ndarray, leaving_x: np.ndarray, leaving_b: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Advance over rows x (rows x columns) / b (rows) and return their beta and corr.
+        leaving_x / leaving_b are the rows dropping out of the window, aligned with the
+        last len(leaving_x) rows of x (row t drops row t - window).
+        """
+        delta = _moment_terms(x, b)
+        if len(leaving_x):
+            delta[:, len(x) - len(leaving_x):] -= _moment_terms(leaving_x, leaving_b)
+        s = np.cumsum(delta, axis=1) + self.sums[:, None, :]
+        self.sums = s[:, -1]
+        n, sx, sb, sxx, sbb, sxb = s
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = sxb / n - (sx / n) * (sb / n)
+            var_x = np.maximum(sxx / n - (sx / n) ** 2, 0.0)
+            var_b = np.maximum(sbb / n - (sb / n) ** 2, 0.0)
+            ok = (n >= self.min_periods) & (var_b > 0)
+            beta = np.where(ok, cov / var_b, np.nan)
+            corr = np.where(ok & (var_x > 0), np.clip(cov / np.sqrt(var_x * var_b), -1.0, 1.0), np.nan)
+        return beta, corr
+
+
+def rolling_beta_corr(
+    returns: pd.DataFrame,
+    benchmark: str | pd.Series,
+    window: int,
+    *,
+    min_periods: int | None = None,
+    chunk_rows: int = 1024,
+    dtype=np.float64,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Rolling beta and correlation of every column to the benchmark (a column name or a
+    Series on the same index) over the last `window` rows, pairwise-complete.
+    Windows with fewer than min_periods (default window) joint observations are NaN.
+    """
+    x = returns.to_numpy(dtype=np.float64)
+    b = (returns[benchmark] if isinstance(benchmark, str) else benchmark).to_numpy(dtype=np.float64)
+    rows, cols = x.shape
+    beta = np.full((rows, cols), np.nan, dtype=dtype)
+    corr = np.full((rows, cols), np.nan, dtype=dtype)
+    moments = RollingMoments(cols, window, min_periods)
+    for start in range(0, rows, chunk_rows):
+        end = min(start + chunk_rows, rows)
+        lo, hi = max(start - window, 0), max(end - window, 0)
+        beta[start:end], corr[start:end] = moments.update(x[start:end], b[start:end], x[lo:hi], b[lo:hi])
+    wrap = lambda a: pd.DataFrame(a, index=returns.index, columns=returns.columns)
+    return wrap(beta), wrap(corr)
+
+
+def cross_sectional(frame: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Per-row z-score (ddof=1) and percentile rank (0..1] across columns; NaN cells are left out."""
+    a = frame.to_numpy(dtype=np.float64)
+    valid = ~np.isnan(a)
+    n = valid.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(valid, a, 0.0).sum(axis=1, keepdims=True) / n
+        dev = np.where(valid, a - mean, 0.0)
+        std = np.sqrt((dev * dev).sum(axis=1, keepdims=True) / (n - 1))
+        z = np.where(valid & (n > 1) & (std > 0), dev / std, np.nan)
+    rank = frame.rank(axis=1, pct=True)
+    return pd.DataFrame(z, index=frame.index, columns=frame.columns), rank
+
+
+def corr_matrix(returns: pd.DataFrame, at, window: int, *, min_periods: int | None = None) -> pd.DataFrame:
+    """Symbol x symbol correlation of the `window` rows ending at `at` (one snapshot, O(window * N^2))."""
+    end = returns.index.searchsorted(at, side="right") - 1
+    if end < 0:
+        raise ValueError(f"{at} is before the first row")
+    block = returns.iloc[max(end + 1 - window, 0):end + 1]
+    return block.corr(min_periods=window if min_periods is None else min_periods)
+
+
+def cross_asset_features(
+    panel: pd.DataFrame, window: int, *, benchmark: str = "BTCUSDT", dtype=np.float64
+) -> dict[str, pd.DataFrame]:
+    """Wide frames keyed ret, ret_<w>, ret_<w>_z, ret_<w>_rank, beta_<w>, corr_<w> from a price panel."""
+    if benchmark not in panel.columns:
+        raise ValueError(f"Benchmark {benchmark} is not in the panel")
+    ret = log_returns(panel)
+    ret_w = log_returns(panel, window)
+    z, rank = cross_sectional(ret_w)
+    beta, corr = rolling_beta_corr(ret, benchmark, window, dtype=dtype)
+    return {
+        "ret": ret.astype(dtype),
+        f"ret_{window}": ret_w.astype(dtype),
+        f"ret_{window}_z": z.astype(dtype),
+        f"ret_{window}_rank": rank.astype(dtype),
+        f"beta_{window}": beta,
+        f"corr_{window}": corr,
+    }
+
+
+def _log_returns_rows(prices: np.ndarray, lo: int, hi: int, periods: int = 1) -> np.ndarray:
+    """log_returns() of rows [lo, hi) of a price array only."""
+    out = np.full((hi - lo, prices.shape[1]), np.nan)
+    first = max(lo, periods)
+    if hi > first:
+        p = prices[first - periods:hi].astype(np.float64)
+        out[first - lo:] = np.log(p[periods:]) - np.log(p[:-periods])
+    return out
+
+
+def iter_cross_asset(
+    panel: pd.DataFrame,
+    window: int,
+    *,
+    benchmark: str = "BTCUSDT",
+    start=None,
+    chunk_rows: int = 2048,
+    dtype=np.float64,
+    categorical: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """
+    Long frames (open_time, symbol, close, ret, ret_<w>, ret_<w>_z, ret_<w>_rank,
+    beta_<w>, corr_<w>) for the panel's rows from `start` on, chunk_rows panel rows at a
+    time; rows before `start` only warm up the running sums. Cells without a close are
+    left out. categorical=True yields a categorical symbol column.
+    """
+    if benchmark not in panel.columns:
+        raise ValueError(f"Benchmark {benchmark} is not in the panel")
+    prices = panel.to_numpy()
+    rows, cols = prices.shape
+    bench = panel.columns.get_loc(benchmark)
+    symbols = pd.Index(panel.columns.astype(str))
+    first = 0 if start is None else int(panel.index.searchsorted(start))
+    moments = RollingMoments(cols, window)
+    for lo in range(0, rows, chunk_rows):
+        hi = min(lo + chunk_rows, rows)
+        ret = _log_returns_rows(prices, lo, hi)
+        leaving = _log_returns_rows(prices, max(lo - window, 0), max(hi - window, 0))
+        beta, corr = moments.update(ret, ret[:, bench], leaving, leaving[:, bench])
+        if hi <= first:
+            continue
+        ret_w = _log_returns_rows(prices, lo, hi, window)
+        z, rank = cross_sectional(pd.DataFrame(ret_w))
+        k = max(first - lo, 0)
+        values = {
+            "close": prices[lo + k:hi],
+            "ret": ret[k:],
+            f"ret_{window}": ret_w[k:],
+            f"ret_{window}_z": z.to_numpy()[k:],
+            f"ret_{window}_rank": rank.to_numpy()[k:],
+            f"beta_{window}": beta[k:],
+            f"corr_{window}": corr[k:],
+        }
+        keep = ~np.isnan(values["close"].ravel())
+        symbol = pd.Categorical.from_codes(np.tile(np.arange(cols), hi - lo - k)[keep], categories=symbols)
+        out = pd.DataFrame({
+            "open_time": np.repeat(panel.index[lo + k:hi], cols)[keep],
+            "symbol": symbol if categorical else np.asarray(symbol, dtype=object),
+        })
+        for name, a in values.items():
+            out[name] = a.ravel()[keep].astype(dtype, copy=False)
+        yield out
+
+
+def _load_panel_for(
+    dsn: str, market_type: str, symbols: list[str], interval: str, window: int, benchmark: str,
+    table: str, start_date: date | None, end_date: date | None,
+) -> tuple[pd.DataFrame, datetime | None]:
+    """Panel including `window` warm-up bars before start_date, and the first row to emit."""
+    if benchmark not in symbols:
+        symbols = [benchmark, *symbols]
+    start = load_start = None
+    if start_date is not None:
+        start = datetime(start_date.year, start_date.month, start_date.day, tzinfo=timezone.utc)
+        load_start = start - timedelta(milliseconds=window * interval_to_ms(interval))
+    panel = load_panel(dsn, market_type, symbols, interval, table=table, start_date=load_start, end_date=end_date)
+    return panel, start
+
+
+@traced("features.load_cross_asset")
+def load_cross_asset(
+    dsn: str,
+    market_type: str,
+    symbols: list[str],
+    interval: str,
+    *,
+    window: int,
+    benchmark: str = "BTCUSDT",
+    table: str = "futures_candles",
+    start_date: date | None = None,
+    end_date: date | None = None,
+    compact: bool = False,
+) -> pd.DataFrame:
+    """
+    Long frame (open_time, symbol, close, <cross_asset_features columns>) for rows in
+    [start_date, end_date]; `window` extra bars before start_date are loaded so the first
+    rows have full windows. compact=True returns float32 values and a categorical symbol.
+    """
+    panel, start = _load_panel_for(dsn, market_type, symbols, interval, window, benchmark, table, start_date, end_date)
+    if panel.empty:
+        return pd.DataFrame()
+    chunks = list(iter_cross_asset(
+        panel, window, benchmark=benchmark, start=start,
+        dtype=np.float32 if compact else np.float64, categorical=compact,
+    ))
+    out = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+    log.info("Cross-asset features: %d symbols, %d rows, window %d", panel.shape[1], len(out), window)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolling cross-asset statistics for many symbols")
+    parser.add_argument("--market-type", default="um")
+    parser.add_argument("--table", choices=["futures_candles", "candles_raw"], default="futures_candles")
+    parser.add_argument("--symbols", type=lambda s: s.split(","), default=SYMBOLS)
+    parser.add_argument("--interval", default="1m")
+    parser.add_argument("--window", type=int, default=1440, help="bars")
+    parser.add_argument("--benchmark", default="BTCUSDT")
+    parser.add_argument("--start", type=date.fromisoformat, default=None)
+    parser.add_argument("--end", type=date.fromisoformat, default=None)
+    parser.add_argument("--compact", action="store_true", help="float32 values")
+    parser.add_argument("--out", required=True, help=".parquet or .csv")
+    args = parser.parse_args()
+
+    panel, start = _load_panel_for(
+        POSTGRES_DSN or require("POSTGRES_DSN"), args.market_type, args.symbols, args.interval,
+        args.window, args.benchmark, args.table, args.start, args.end,
+    )
+    if panel.empty:
+        log.warning("No candles for %s", ", ".join(args.symbols))
+        return
+    chunks = iter_cross_asset(
+        panel, args.window, benchmark=args.benchmark, start=start,
+        dtype=np.float32 if args.compact else np.float64,
+    )
+    # One chunk at a time: a CSV is appended to, a Parquet file gets one row group per chunk
+    rows, writer = 0, None
+    try:
+        for i, df in enumerate(chunks):
+            if args.out.endswith(".csv"):
+                df.to_csv(args.out, index=False, mode="w" if i == 0 else "a", header=i == 0)
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(args.out, table.schema)
+                writer.write_table(table)
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    log.info("Wrote %d rows to %s", rows, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+Build ML training datasets from Postgres: indicator features, lagged windows,
+forward-return targets and the human labels from market.trade_labels.
+
+Candles are streamed in chunks (server-side cursor) and written straight to .npy
+memmaps or Parquet row groups, so datasets larger than RAM can be built. Each chunk
+is computed together with a warm-up tail of the previous chunk, so the recursive
+indicators (EMA/RSI/ATR) continue across chunk boundaries; the small difference to a
+single full-history pass decays as (1 - 2/(span+1))**warmup.
+
+Layout of an .npy dataset directory:
+    manifest.json    feature / target names and per-series row ranges
+    X.npy            float32 (rows, n_features)
+    y.npy            float32 (rows, n_horizons)   forward log returns
+    label.npy        float32 (rows,)              1 / -1 / 0, NaN when unlabeled
+    open_time.npy    int64   (rows,)              epoch ms
+    series.npy       int16   (rows,)              index into manifest["series"]
+
+Series are written one after another, each sorted by open_time.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import psycopg
+
+from pipelines.common.logging import get_logger
+from pipelines.common.settings import INTERVALS, POSTGRES_DSN, SYMBOLS, require
+from pipelines.features.indicators import add_indicators
+from pipelines.features.load_from_pg import count_candles, iter_candles, load_labels
+from pipelines.ingestion import coverage
+from pipelines.ingestion.intervals import interval_to_ms
+
+log = get_logger(__name__)
+
+RAW_COLUMNS = ["open_time", "open", "high", "low", "close", "volume"]
+DEFAULT_LAG_COLUMNS = ("log_return", "rsi_14", "macd_hist", "bb_width", "vol_z50")
+DEFAULT_LAGS = (1, 2, 3, 5, 10)
+DEFAULT_HORIZONS = (1, 5, 15, 60)
+# Bars of history carried into each chunk so recursive indicators continue smoothly
+DEFAULT_WARMUP = 2_000
+
+
+def _incomplete_days(conn, table, market_type, symbol, interval, start_date, end_date) -> int | None:
+    """Days in the requested span (clipped to stored data) the coverage catalog has as absent or partial."""
+    stored = coverage.date_range(conn, table, market_type, symbol, interval)
+    if stored is None:
+        return None
+    lo = max(start_date, stored[0]) if start_date else stored[0]
+    hi = min(end_date, stored[1]) if end_date else stored[1]
+    if lo > hi:
+        return 0
+    return len(coverage.missing_days(conn, table, market_type, symbol, interval, lo, hi))
+
+
+def _feature_frame(raw: pd.DataFrame, lag_columns, lags, horizons) -> pd.DataFrame:
+    # raw is a throwaway concat / chunk: add the columns to it rather than to a copy
+    feat = add_indicators(raw, inplace=True)
+    for col in lag_columns:
+        for k in lags:
+            feat[f"{col}_lag{k}"] = feat[col].shift(k)
+    log_close = np.log(feat["close"])
+    for h in horizons:
+        feat[f"fwd_ret_{h}"] = log_close.shift(-h) - log_close
+    return feat
+
+
+def _attach_labels(feat: pd.DataFrame, labels: pd.DataFrame, interval: str) -> np.ndarray:
+    """Each bar takes the latest label stamped inside that bar, [open_time, open_time + interval)."""
+    if labels.empty:
+        return np.full(len(feat), np.nan, dtype=np.float32)
+    lab = labels[["open_time", "label"]].astype({"label": "float32"}).rename(columns={"open_time": "stamped"})
+    lab = lab.sort_values("stamped", kind="stable")
+    # The bar each label falls in, then the last label per bar
+    lab["open_time"] = pd.merge_asof(
+        lab[["stamped"]],
+        feat[["open_time"]],
+        left_on="stamped",
+        right_on="open_time",
+        direction="backward",
+        tolerance=pd.Timedelta(milliseconds=interval_to_ms(interval) - 1),
+    )["open_time"].to_numpy()
+    lab = lab.dropna(subset=["open_time"]).drop_duplicates("open_time", keep="last")
+    joined = feat[["open_time"]].merge(lab[["open_time", "label"]], on="open_time", how="left")
+    return joined["label"].to_numpy(dtype=np.float32)
+
+
+class _NpyWriter:
+    def __init__(self, out_dir: Path, total_rows: int, n_features: int, n_targets: int):
+        mm = np.lib.format.open_memmap
+        self.X = mm(out_dir / "X.npy", mode="w+", dtype=np.float32, shape=(total_rows, n_features))
+        self.y = mm(out_dir / "y.npy", mode="w+", dtype=np.float32, shape=(total_rows, n_targets))
+        self.label = mm(out_dir / "label.npy", mode="w+", dtype=np.float32, shape=(total_rows,))
+        self.open_time = mm(out_dir / "open_time.npy", mode="w+", dtype=np.int64, shape=(total_rows,))
+        self.series = mm(out_dir / "series.npy", mode="w+", dtype=np.int16, shape=(total_rows,))
+        self.pos = 0
+
+    def write(self, series_id: int, open_ms, X, y, label) -> None:
+        n = len(open_ms)
+        sl = slice(self.pos, self.pos + n)
+        self.X[sl] = X
+        self.y[sl] = y
+        self.label[sl] = label
+        self.open_time[sl] = open_ms
+        self.series[sl] = series_id
+        self.pos += n
+
+    def close(self) -> None:
+        for arr in (self.X, self.y, self.label, self.open_time, self.series):
+            arr.flush()
+
+
+class _ParquetWriter:
+    def __init__(self, out_dir: Path, feature_names: list[str], target_names: list[str]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.schema = pa.schema(
+            [("open_time", pa.int64()), ("series", pa.int16())]
+            + [(c, pa.float32()) for c in feature_names + target_names + ["label"]]
+        )
+        self.writer = pq.ParquetWriter(out_dir / "dataset.parquet", self.schema)
+        self.pos = 0
+
+    def write(self, series_id: int, open_ms, X, y, label) -> None:
+        pa = self._pa
+        arrays = [pa.array(open_ms), pa.array(np.full(len(open_ms), series_id, dtype=np.int16))]
+        arrays += [pa.array(X[:, i]) for i in range(X.shape[1])]
+        arrays += [pa.array(y[:, i]) for i in range(y.shape[1])]
+        arrays.append(pa.array(label))
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        self.pos += len(open_ms)
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+def build_dataset(
+    dsn: str,
+    market_type: str,
+    symbols: list[str],
+    intervals: list[str],
+    out_dir: str | Path,
+    *,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    lag_columns=DEFAULT_LAG_COLUMNS,
+    lags=DEFAULT_LAGS,
+    horizons=DEFAULT_HORIZONS,
+    warmup: int = DEFAULT_WARMUP,
+    chunk_rows: int = 200_000,
+    fmt: str = "npy",
+    table: str = "futures_candles",
+) -> dict:
+    """
+    Stream every (symbol, interval) series into out_dir and return the manifest.
+
+    Rows whose features are still warming up (NaN) are kept; filter them at training time
+    with np.isfinite so row offsets stay aligned with the candle table.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    max_h = max(horizons)
+
+    # Column layout is derived from a tiny dummy frame so it matches add_indicators exactly
+    probe = pd.DataFrame({c: np.ones(3) for c in RAW_COLUMNS[1:]})
+    probe.insert(0, "open_time", pd.date_range("2020-01-01", periods=3, freq="min", tz="UTC"))
+    probe_cols = list(_feature_frame(probe, lag_columns, lags, horizons).columns)
+    target_names = [f"fwd_ret_{h}" for h in horizons]
+    feature_names = [c for c in probe_cols if c != "open_time" and c not in target_names]
+
+    series = [(s, i) for s in symbols for i in intervals]
+    manifest = {
+        "market_type": market_type,
+        "table": table,
+        "features": feature_names,
+        "targets": target_names,
+        "format": fmt,
+        "series": [],
+    }
+
+    with psycopg.connect(dsn) as conn:
+        # One snapshot for the row counts and the streamed rows
+        conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        counts = [
+            count_candles(conn, market_type, s, i, table=table, start_date=start_date, end_date=end_date)
+            for s, i in series
+        ]
+        total = sum(counts)
+        if fmt == "npy":
+            writer = _NpyWriter(out_dir, total, len(feature_names), len(target_names))
+        elif fmt == "parquet":
+            writer = _ParquetWriter(out_dir, feature_names, target_names)
+        else:
+            raise ValueError(f"Unsupported format: {fmt}")
+
+        try:
+            for series_id, ((symbol, interval), n_rows) in enumerate(zip(series, counts)):
+                first_row = writer.pos
+                labels = load_labels(dsn, market_type, symbol, interval, start_date=start_date, end_date=end_date)
+                carry = None
+                emitted_until = None  # open_time of the last row written for this series
+                chunks = iter_candles(
+                    conn, market_type, symbol, interval,
+                    table=table, start_date=start_date, end_date=end_date, chunk_rows=chunk_rows,
+                )
+                chunk = next(chunks, None)
+                while chunk is not None:
+                    nxt = next(chunks, None)
+                    frame = chunk if carry is None else pd.concat([carry, chunk], ignore_index=True)
+                    feat = _feature_frame(frame, lag_columns, lags, horizons)
+
+                    # Hold back the last max_h rows until their forward returns are known
+                    stop = len(feat) if nxt is None else max(0, len(feat) - max_h)
+                    emit = feat.iloc[:stop]
+                    if emitted_until is not None:
+                        emit = emit[emit["open_time"] > emitted_until]
+                    if len(emit):
+                        writer.write(
+                            series_id,
+                            emit["open_time"].dt.as_unit("ms").astype("int64").to_numpy(),
+                            emit[feature_names].to_numpy(dtype=np.float32),
+                            emit[target_names].to_numpy(dtype=np.float32),
+                            _attach_labels(emit, labels, interval),
+                        )
+                        emitted_until = emit["open_time"].iloc[-1]
+
+                    carry = frame[RAW_COLUMNS].iloc[-(warmup + max_h):].reset_index(drop=True)
+                    chunk = nxt
+
+                incomplete = _incomplete_days(conn, table, market_type, symbol, interval, start_date, end_date)
+                if incomplete:
+                    log.warning("Dataset %s %s: %d incomplete days in range", symbol, interval, incomplete)
+                manifest["series"].append(
+                    {
+                        "symbol": symbol,
+                        "interval": interval,
+                        "start_row": first_row,
+                        "end_row": writer.pos,
+                        "incomplete_days": incomplete,
+                    }
+                )
+                log.info("Dataset %s %s: %d rows (%d labeled)", symbol, interval, writer.pos - first_row, len(labels))
+                if writer.pos - first_row != n_rows:
+                    raise RuntimeError(f"{symbol} {interval}: wrote {writer.pos - first_row} rows, expected {n_rows}")
+        finally:
+            writer.close()
+
+    manifest["rows"] = writer.pos
+    with open(out_dir / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+@dataclass
+class Split:
+    """Per-series row ranges of one split; views() yields zero-copy memmap slices."""
+
+    name: str
+    ranges: list[slice]
+    dataset: "Dataset"
+
+    @property
+    def rows(self) -> int:
+        return sum(r.stop - r.start for r in self.ranges)
+
+    def views(self):
+        for r in self.ranges:
+            yield self.dataset.X[r], self.dataset.y[r], self.dataset.label[r]
+
+
+class Dataset:
+    """Read-only view over an .npy dataset directory written by build_dataset."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        with open(self.path / "manifest.json") as f:
+            self.manifest = json.load(f)
+        if self.manifest["format"] != "npy":
+            raise ValueError("Dataset only reads npy-format datasets")
+        self.X = self._load("X")
+        self.y = self._load("y")
+        self.label = self._load("label")
+        self.open_time = self._load("open_time")
+        self.series = self._load("series")
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(self.path / f"{name}.npy", mmap_mode="r")
+
+    def time_split(self, boundaries: dict[str, tuple]) -> dict[str, Split]:
+        """
+        Split each series by time without copying.
+
+        boundaries: {name: (start, end)} with start inclusive / end exclusive, as anything
+        pd.Timestamp accepts (None = open ended), e.g.
+            {"train": (None, "2024-01-01"), "valid": ("2024-01-01", None)}
+        """
+        def to_ms(ts, default):
+            if ts is None:
+                return default
+            ts = pd.Timestamp(ts)
+            ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+            return ts.value // 1_000_000
+
+        splits = {}
+        for name, (start, end) in boundaries.items():
+            lo_ms = to_ms(start, np.iinfo(np.int64).min)
+            hi_ms = to_ms(end, np.iinfo(np.int64).max)
+            ranges = []
+            for s in self.manifest["series"]:
+                times = self.open_time[s["start_row"]:s["end_row"]]
+                lo = s["start_row"] + int(np.searchsorted(times, lo_ms, side="left"))
+                hi = s["start_row"] + int(np.searchsorted(times, hi_ms, side="left"))
+                if hi > lo:
+                    ranges.append(slice(lo, hi))
+            splits[name] = Split(name, ranges, self)
+        return splits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a training dataset from Postgres candles + labels")
+    parser.add_argument("--market-type", default=os.getenv("MARKET_TYPE", "um"))
+    parser.add_argument("--symbols", default=",".join(SYMBOLS))
+    parser.add_argument("--intervals", default=",".join(INTERVALS))
+    parser.add_argument("--start", type=date.fromisoformat, default=None)
+    parser.add_argument("--end", type=date.fromisoformat, default=None)
+    parser.add_argument("--format", choices=["npy", "parquet"], default="npy")
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    manifest = build_dataset(
+        POSTGRES_DSN or require("POSTGRES_DSN"),
+        args.market_type,
+        [s.strip() for s in args.symbols.split(",") if s.strip()],
+        [i.strip() for i in args.intervals.split(",") if i.strip()],
+        args.out,
+        start_date=args.start,
+        end_date=args.end,
+        fmt=args.format,
+    )
+    log.info("Wrote %d rows to %s", manifest["rows"], args.out)
+
+
+if __name__ == "__main__":
+    main()
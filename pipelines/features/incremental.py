@@ -0,0 +1,184 @@
+"""
+O(1)-per-bar versions of the indicators in pipelines.features.indicators, for live use.
+
+Each indicator keeps only its recursive state. update(x) consumes a closed bar and
+returns the new value; preview(x) returns the value the indicator would have if x
+closed now (for forming bars) without changing the state. Values match the pandas
+implementations bar for bar (NaN while they would be NaN).
+"""
+from __future__ import annotations
+
+import math
+from collections import deque
+
+NAN = float("nan")
+
+
+class EMA:
+    """ema(): ewm(span, adjust=False), seeded with the first value."""
+
+    __slots__ = ("alpha", "value")
+
+    def __init__(self, span: int):
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = NAN
+
+    def preview(self, x: float) -> float:
+        if self.value != self.value:
+            return x
+        return self.value + self.alpha * (x - self.value)
+
+    def update(self, x: float) -> float:
+        self.value = self.preview(x)
+        return self.value
+
+
+class RSI:
+    """rsi(): Wilder smoothing (alpha = 1/period) of gains and losses."""
+
+    __slots__ = ("alpha", "prev", "up", "down", "value")
+
+    def __init__(self, period: int = 14):
+        self.alpha = 1.0 / period
+        self.prev = NAN
+        self.up = NAN
+        self.down = NAN
+        self.value = NAN
+
+    def _step(self, x: float) -> tuple[float, float, float]:
+        if self.prev != self.prev:
+            return NAN, NAN, NAN
+        delta = x - self.prev
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        if self.up != self.up:
+            up, down = gain, loss
+        else:
+            up = self.up + self.alpha * (gain - self.up)
+            down = self.down + self.alpha * (loss - self.down)
+        value = NAN if down == 0 else 100.0 - 100.0 / (1.0 + up / down)
+        return up, down, value
+
+    def preview(self, x: float) -> float:
+        return self._step(x)[2]
+
+    def update(self, x: float) -> float:
+        self.up, self.down, self.value = self._step(x)
+        self.prev = x
+        return self.value
+
+
+class ATR:
+    """atr(): Wilder smoothing of the true range (first bar's TR is high - low)."""
+
+    __slots__ = ("alpha", "prev_close", "value")
+
+    def __init__(self, period: int = 14):
+        self.alpha = 1.0 / period
+        self.prev_close = NAN
+        self.value = NAN
+
+    def preview(self, high: float, low: float, close: float) -> float:
+        tr = high - low
+        if self.prev_close == self.prev_close:
+            tr = max(tr, abs(high - self.prev_close), abs(low - self.prev_close))
+        if self.value != self.value:
+            return tr
+        return self.value + self.alpha * (tr - self.value)
+
+    def update(self, high: float, low: float, close: float) -> float:
+        self.value = self.preview(high, low, close)
+        self.prev_close = close
+        return self.value
+
+
+class RollingMeanStd:
+    """rolling(window).mean() / .std(ddof=0) via running sums over a fixed window."""
+
+    __slots__ = ("window", "values", "total", "total_sq")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values: deque[float] = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def _stats(self, total: float, total_sq: float, n: int) -> tuple[float, float]:
+        if n < self.window:
+            return NAN, NAN
+        mean = total / n
+        return mean, math.sqrt(max(total_sq / n - mean * mean, 0.0))
+
+    def preview(self, x: float) -> tuple[float, float]:
+        total, total_sq, n = self.total + x, self.total_sq + x * x, len(self.values) + 1
+        if n > self.window:
+            old = self.values[0]
+            total, total_sq, n = total - old, total_sq - old * old, n - 1
+        return self._stats(total, total_sq, n)
+
+    def update(self, x: float) -> tuple[float, float]:
+        self.values.append(x)
+        self.total += x
+        self.total_sq += x * x
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+        return self._stats(self.total, self.total_sq, len(self.values))
+
+
+class IndicatorState:
+    """
+    The live subset of add_indicators() for one series: ema_<span>, rsi_<p>, atr_<p>,
+    bb_ma<w> / bb_upper / bb_lower, close, plus the bar count seen.
+    """
+
+    __slots__ = ("emas", "rsi", "atr", "bb", "bb_std", "rsi_key", "atr_key", "bb_key", "bars")
+
+    def __init__(
+        self,
+        *,
+        rsi_period: int = 14,
+        atr_period: int = 14,
+        ema_spans: tuple[int, ...] = (20, 50, 200),
+        bb_window: int = 20,
+        bb_std: float = 2.0,
+    ):
+        self.emas = {f"ema_{s}": EMA(s) for s in ema_spans}
+        self.rsi = RSI(rsi_period)
+        self.atr = ATR(atr_period)
+        self.bb = RollingMeanStd(bb_window)
+        self.bb_std = bb_std
+        self.rsi_key = f"rsi_{rsi_period}"
+        self.atr_key = f"atr_{atr_period}"
+        self.bb_key = f"bb_ma{bb_window}"
+        self.bars = 0
+
+    def _values(self, emas, rsi, atr, bb, close) -> dict[str, float]:
+        out = dict(zip(self.emas, emas))
+        mean, sd = bb
+        out[self.rsi_key] = rsi
+        out[self.atr_key] = atr
+        out[self.bb_key] = mean
+        out["bb_upper"] = mean + self.bb_std * sd
+        out["bb_lower"] = mean - self.bb_std * sd
+        out["close"] = close
+        return out
+
+    def update(self, high: float, low: float, close: float) -> dict[str, float]:
+        self.bars += 1
+        return self._values(
+            [e.update(close) for e in self.emas.values()],
+            self.rsi.update(close),
+            self.atr.update(high, low, close),
+            self.bb.update(close),
+            close,
+        )
+
+    def preview(self, high: float, low: float, close: float) -> dict[str, float]:
+        return self._values(
+            [e.preview(close) for e in self.emas.values()],
+            self.rsi.preview(close),
+            self.atr.preview(high, low, close),
+            self.bb.preview(close),
+            close,
+        )
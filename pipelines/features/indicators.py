@@ -1,6 +1,8 @@
 import numpy as np
 import pandas as pd
 
+from pipelines.common.tracing import traced
+
 def rsi(close: pd.Series, period: int = 14) -> pd.Series:
     delta = close.diff()
     up = delta.clip(lower=0)
@@ -32,37 +34,60 @@ def bollinger(close: pd.Series, window: int=20, n_std: float=2.0):
     width = (upper - lower) / ma.replace(0, np.nan)
     return ma, upper, lower, width
 
-def add_indicators(df: pd.DataFrame) -> pd.DataFrame:
+@traced("pandas.add_indicators")
+def add_indicators(
+    df: pd.DataFrame,
+    *,
+    rsi_period: int = 14,
+    atr_period: int = 14,
+    ema_spans: tuple[int, ...] = (20, 50, 200),
+    bb_window: int = 20,
+    bb_std: float = 2.0,
+    vol_window: int = 50,
+    inplace: bool = False,
+    dtype: str | None = None,
+) -> pd.DataFrame:
     """
     Expects columns: open_time (datetime), open, high, low, close, volume.
+    Column names follow the periods, e.g. rsi_14, atr_14, ema_20, bb_ma20, vol_z50.
+
+    inplace=True adds the columns to df instead of a copy; dtype="float32" stores them
+    as float32 (they are still computed in float64). See pipelines.features.compact.
     """
-    out = df.copy()
+    out = df if inplace else df.copy()
+    # float32 prices are upcast once so every indicator is computed in float64
+    close = out["close"].astype("float64", copy=False)
+    high = out["high"].astype("float64", copy=False)
+    low = out["low"].astype("float64", copy=False)
+    volume = out["volume"].astype("float64", copy=False)
+
+    def put(name: str, values: pd.Series) -> None:
+        out[name] = values if dtype is None else values.astype(dtype)
 
-    out["log_return"] = np.log(out["close"]).diff()
-    out["ret_1"] = out["close"].pct_change(1)
-    out["ret_5"] = out["close"].pct_change(5)
+    put("log_return", np.log(close).diff())
+    put("ret_1", close.pct_change(1))
+    put("ret_5", close.pct_change(5))
 
-    out["ema_20"] = ema(out["close"], 20)
-    out["ema_50"] = ema(out["close"], 50)
-    out["ema_200"] = ema(out["close"], 200)
+    for span in ema_spans:
+        put(f"ema_{span}", ema(close, span))
 
-    out["rsi_14"] = rsi(out["close"], 14)
-    out["atr_14"] = atr(out["high"], out["low"], out["close"], 14)
+    put(f"rsi_{rsi_period}", rsi(close, rsi_period))
+    put(f"atr_{atr_period}", atr(high, low, close, atr_period))
 
-    m, s, h = macd(out["close"])
-    out["macd"] = m
-    out["macd_signal"] = s
-    out["macd_hist"] = h
+    m, s, h = macd(close)
+    put("macd", m)
+    put("macd_signal", s)
+    put("macd_hist", h)
 
-    bb_ma, bb_up, bb_low, bb_w = bollinger(out["close"])
-    out["bb_ma20"] = bb_ma
-    out["bb_upper"] = bb_up
-    out["bb_lower"] = bb_low
-    out["bb_width"] = bb_w
+    bb_ma, bb_up, bb_low, bb_w = bollinger(close, window=bb_window, n_std=bb_std)
+    put(f"bb_ma{bb_window}", bb_ma)
+    put("bb_upper", bb_up)
+    put("bb_lower", bb_low)
+    put("bb_width", bb_w)
 
     # Volume z-score (simple anomaly feature)
-    vol_mean = out["volume"].rolling(50).mean()
-    vol_std = out["volume"].rolling(50).std(ddof=0)
-    out["vol_z50"] = (out["volume"] - vol_mean) / vol_std.replace(0, np.nan)
+    vol_mean = volume.rolling(vol_window).mean()
+    vol_std = volume.rolling(vol_window).std(ddof=0)
+    put(f"vol_z{vol_window}", (volume - vol_mean) / vol_std.replace(0, np.nan))
 
     return out
@@ -5,10 +5,21 @@ Supports market.futures_candles (Binance futures bulk) and market.candles_raw (S
 from __future__ import annotations
 
 from datetime import date, datetime, timezone
+from typing import Iterator
 
 import pandas as pd
 import psycopg
 
+from pipelines.common.tracing import traced
+from pipelines.features.compact import compact_frame
+from pipelines.ingestion import coverage
+
+# table -> (qualified name, column holding the market_type / exchange key)
+_SERIES_TABLES = {
+    "futures_candles": ("market.futures_candles", "market_type"),
+    "candles_raw": ("market.candles_raw", "exchange"),
+}
+
 
 def _normalize_open_time(dt) -> datetime:
     """Ensure we have a timezone-aware datetime in UTC for DB comparison."""
@@ -19,6 +30,12 @@ def _normalize_open_time(dt) -> datetime:
     return dt
 
 
+def _end_of_day(dt) -> datetime:
+    """Last instant of the UTC day of dt (so an end date includes all candles that day)."""
+    dt = _normalize_open_time(dt)
+    return datetime(dt.year, dt.month, dt.day, 23, 59, 59, 999_999, tzinfo=timezone.utc)
+
+
 def get_candle_date_range(
     dsn: str,
     market_type: str,
@@ -29,8 +46,14 @@ def get_candle_date_range(
 ) -> tuple[date | None, date | None]:
     """
     Return the min/max open_time (as dates) available in Postgres
-    for the given market / symbol / interval.
+    for the given market / symbol / interval. Read from the coverage catalog;
+    series that have not been cataloged fall back to a MIN/MAX scan.
     """
+    with psycopg.connect(dsn) as conn:
+        cataloged = coverage.date_range(conn, table, market_type, symbol, interval)
+    if cataloged is not None:
+        return cataloged
+
     if table == "futures_candles":
         sql = """
             SELECT MIN(open_time) AS min_time, MAX(open_time) AS max_time
@@ -61,6 +84,7 @@ def get_candle_date_range(
     return min_ts.date(), max_ts.date()
 
 
+@traced("postgres.load_candles")
 def load_candles(
     dsn: str,
     market_type: str,
@@ -72,12 +96,14 @@ def load_candles(
     start_date: date | datetime | None = None,
     end_date: date | datetime | None = None,
     max_candles: int = 30_000,
+    compact: bool = False,
 ) -> pd.DataFrame:
     """
     Load OHLCV candles from Postgres. Returns DataFrame with columns:
     open_time (datetime, UTC), open, high, low, close, volume (sorted by open_time).
 
     Either use limit (load latest N candles) or start_date/end_date (load range, capped at max_candles).
+    compact=True returns int64 epoch-ms open_time and float32 OHLCV (pipelines.features.compact).
     """
     params = {"market_type": market_type, "symbol": symbol, "interval": interval}
     use_range = start_date is not None and end_date is not None
@@ -142,4 +168,112 @@ def load_candles(
         return df
     df["open_time"] = pd.to_datetime(df["open_time"], utc=True)
     df = df.sort_values("open_time").reset_index(drop=True)
+    return compact_frame(df) if compact else df
+
+
+def load_labels(
+    dsn: str,
+    market_type: str,
+    symbol: str,
+    interval: str,
+    *,
+    start_date: date | datetime | None = None,
+    end_date: date | datetime | None = None,
+) -> pd.DataFrame:
+    """
+    Load manual labels from market.trade_labels. Returns DataFrame with columns:
+    open_time (datetime, UTC), label (1=buy, -1=sell, 0=hold), sorted by open_time.
+    """
+    sql = """
+        SELECT open_time, label
+        FROM market.trade_labels
+        WHERE market_type = %(market_type)s AND symbol = %(symbol)s AND interval = %(interval)s
+    """
+    params = {"market_type": market_type, "symbol": symbol, "interval": interval}
+    if start_date is not None:
+        sql += " AND open_time >= %(start)s"
+        params["start"] = _normalize_open_time(start_date)
+    if end_date is not None:
+        sql += " AND open_time <= %(end)s"
+        params["end"] = _end_of_day(end_date)
+    sql += " ORDER BY open_time"
+
+    with psycopg.connect(dsn) as conn:
+        df = pd.read_sql(sql, conn, params=params)
+
+    if not df.empty:
+        df["open_time"] = pd.to_datetime(df["open_time"], utc=True)
     return df
+
+
+def _series_filter(
+    market_type: str,
+    symbol: str,
+    interval: str,
+    table: str,
+    start_date: date | datetime | None,
+    end_date: date | datetime | None,
+) -> tuple[str, str, dict]:
+    qualified, key_col = _SERIES_TABLES[table]
+    where = f"{key_col} = %(key)s AND symbol = %(symbol)s AND interval = %(interval)s"
+    params = {"key": market_type, "symbol": symbol, "interval": interval}
+    if start_date is not None:
+        where += " AND open_time >= %(start)s"
+        params["start"] = _normalize_open_time(start_date)
+    if end_date is not None:
+        where += " AND open_time <= %(end)s"
+        params["end"] = _end_of_day(end_date)
+    return qualified, where, params
+
+
+def count_candles(
+    conn: psycopg.Connection,
+    market_type: str,
+    symbol: str,
+    interval: str,
+    *,
+    table: str = "futures_candles",
+    start_date: date | datetime | None = None,
+    end_date: date | datetime | None = None,
+) -> int:
+    """Number of stored candles for the series in [start_date, end_date]."""
+    qualified, where, params = _series_filter(market_type, symbol, interval, table, start_date, end_date)
+    row = conn.execute(f"SELECT count(*) FROM {qualified} WHERE {where}", params).fetchone()
+    return int(row[0])
+
+
+def iter_candles(
+    conn: psycopg.Connection,
+    market_type: str,
+    symbol: str,
+    interval: str,
+    *,
+    table: str = "futures_candles",
+    start_date: date | datetime | None = None,
+    end_date: date | datetime | None = None,
+    chunk_rows: int = 100_000,
+    compact: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream candles in open_time order through a server-side cursor, yielding DataFrames
+    of up to chunk_rows rows (same columns as load_candles). Nothing is capped, so this
+    is the loader to use for full-history jobs that do not fit in memory.
+    compact=True yields the compact layout, as in load_candles.
+    """
+    qualified, where, params = _series_filter(market_type, symbol, interval, table, start_date, end_date)
+    sql = f"""
+        SELECT open_time, open, high, low, close, volume
+        FROM {qualified}
+        WHERE {where}
+        ORDER BY open_time
+    """
+    columns = ["open_time", "open", "high", "low", "close", "volume"]
+    with conn.cursor(name=f"candles_{symbol}_{interval}".lower()) as cur:
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            df = pd.DataFrame(rows, columns=columns)
+            df["open_time"] = pd.to_datetime(df["open_time"], utc=True)
+            yield compact_frame(df) if compact else df
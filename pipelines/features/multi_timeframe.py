@@ -0,0 +1,194 @@
+"""
+Multi-timeframe features: add_indicators() runs once per (symbol, interval) and the
+higher-timeframe columns are attached to every base-interval row from the latest
+higher bar that had fully closed when the base bar closed (an as-of join on close
+time), so a 1m row at 10:37 sees the 1h bar of 09:00-10:00, never the forming one.
+
+    df = build_multi_timeframe(dsn, "um", ["BTCUSDT", "ETHUSDT"], "1m",
+                               {"1h": ["ema_200"], "15m": ["rsi_14"]},
+                               start_date=date(2024, 1, 1), end_date=date(2024, 3, 31))
+    # -> base 1m columns + ema_200_1h, rsi_14_15m
+
+The join is one searchsorted over (symbol code, close ms) keys for all symbols at once.
+
+Run:
+    python -m pipelines.features.multi_timeframe --symbols BTCUSDT,ETHUSDT --base 1m \
+        --context 1h:ema_200,rsi_14 --context 15m:rsi_14 --start 2024-01-01 --out mtf.parquet
+"""
+from __future__ import annotations
+
+import argparse
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import psycopg
+
+from pipelines.common.logging import get_logger
+from pipelines.common.settings import POSTGRES_DSN, SYMBOLS, require
+from pipelines.common.tracing import traced
+from pipelines.features.indicators import add_indicators
+from pipelines.features.load_from_pg import iter_candles
+from pipelines.ingestion.intervals import interval_to_ms
+
+log = get_logger(__name__)
+
+_CODE_SHIFT = 43  # epoch ms < 2**43 until the year 2248; leaves 20 bits for symbol codes
+
+
+def _ms(times: pd.Series) -> np.ndarray:
+    if pd.api.types.is_datetime64_any_dtype(times):
+        return times.dt.as_unit("ms").astype("int64").to_numpy()
+    return times.to_numpy(dtype=np.int64)
+
+
+def asof_index(base_codes, base_close_ms, ref_codes, ref_close_ms) -> np.ndarray:
+    """
+    For every base row, the position in ref of the last row with the same code and
+    close <= the base close, or -1. ref must be sorted by (code, close).
+    """
+    base_key = (np.asarray(base_codes, dtype=np.int64) << _CODE_SHIFT) | np.asarray(base_close_ms, dtype=np.int64)
+    ref_key = (np.asarray(ref_codes, dtype=np.int64) << _CODE_SHIFT) | np.asarray(ref_close_ms, dtype=np.int64)
+    idx = np.searchsorted(ref_key, base_key, side="right") - 1
+    hit = idx >= 0
+    hit[hit] = np.asarray(ref_codes)[idx[hit]] == np.asarray(base_codes)[hit]
+    return np.where(hit, idx, -1)
+
+
+def attach_higher_timeframe(
+    base: pd.DataFrame,
+    higher: pd.DataFrame,
+    base_interval: str,
+    higher_interval: str,
+    columns: list[str],
+    *,
+    by: str = "symbol",
+) -> pd.DataFrame:
+    """
+    Add `<col>_<higher_interval>` columns to base (in place, and returned) from the last
+    fully closed higher bar. Both frames have open_time (datetime or epoch ms); when
+    `by` is a column of both, rows are matched within the same value (e.g. symbol).
+    """
+    base_ms, higher_ms = interval_to_ms(base_interval), interval_to_ms(higher_interval)
+    if higher_ms < base_ms:
+        raise ValueError(f"{higher_interval} is shorter than the base interval {base_interval}")
+    if by in base.columns and by in higher.columns:
+        cats = pd.Index(pd.unique(pd.concat([base[by].astype(str), higher[by].astype(str)], ignore_index=True)))
+        base_codes = cats.get_indexer(base[by].astype(str))
+        ref_codes = cats.get_indexer(higher[by].astype(str))
+    else:
+        base_codes = np.zeros(len(base), dtype=np.int64)
+        ref_codes = np.zeros(len(higher), dtype=np.int64)
+    ref_close = _ms(higher["open_time"]) + higher_ms
+    order = np.lexsort((ref_close, ref_codes))
+    idx = asof_index(base_codes, _ms(base["open_time"]) + base_ms, ref_codes[order], ref_close[order])
+    src = order[np.maximum(idx, 0)]
+    missing = idx < 0
+    for col in columns:
+        values = higher[col].to_numpy()[src]
+        if missing.any():
+            values = values.astype(np.result_type(values.dtype, np.float32), copy=True)
+            values[missing] = np.nan
+        base[f"{col}_{higher_interval}"] = values
+    return base
+
+
+def _load_series(
+    conn: psycopg.Connection,
+    market_type: str,
+    symbols: list[str],
+    interval: str,
+    start_date,
+    end_date,
+    table: str,
+) -> pd.DataFrame:
+    frames = []
+    for symbol in symbols:
+        chunks = list(
+            iter_candles(conn, market_type, symbol, interval, table=table, start_date=start_date, end_date=end_date)
+        )
+        if not chunks:
+            continue
+        df = add_indicators(pd.concat(chunks, ignore_index=True), inplace=True)
+        df.insert(0, "symbol", symbol)
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame()
+    out = pd.concat(frames, ignore_index=True)
+    out["symbol"] = out["symbol"].astype("category")
+    return out
+
+
+@traced("features.build_multi_timeframe")
+def build_multi_timeframe(
+    dsn: str,
+    market_type: str,
+    symbols: list[str],
+    base_interval: str,
+    context: dict[str, list[str]],
+    *,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    table: str = "futures_candles",
+    warmup_bars: int = 500,
+) -> pd.DataFrame:
+    """
+    Base-interval candles + indicators for all symbols (long format, `symbol` column),
+    with each context interval's columns attached as `<col>_<interval>`. Context
+    intervals load warmup_bars extra bars before start_date so their recursive
+    indicators are settled at the first base row.
+    """
+    with psycopg.connect(dsn) as conn:
+        base = _load_series(conn, market_type, symbols, base_interval, start_date, end_date, table)
+        if base.empty:
+            return base
+        for interval, columns in context.items():
+            ctx_start = None
+            if start_date is not None:
+                start = datetime(start_date.year, start_date.month, start_date.day, tzinfo=timezone.utc)
+                ctx_start = start - timedelta(milliseconds=warmup_bars * interval_to_ms(interval))
+            higher = _load_series(conn, market_type, symbols, interval, ctx_start, end_date, table)
+            if higher.empty:
+                for col in columns:
+                    base[f"{col}_{interval}"] = np.nan
+                continue
+            attach_higher_timeframe(base, higher, base_interval, interval, columns)
+            log.info("Attached %s from %s (%d bars)", ", ".join(columns), interval, len(higher))
+    return base
+
+
+def _parse_context(specs: list[str]) -> dict[str, list[str]]:
+    context: dict[str, list[str]] = {}
+    for spec in specs:
+        interval, _, cols = spec.partition(":")
+        context.setdefault(interval, []).extend(c for c in cols.split(",") if c)
+    return context
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Base-interval features with higher-timeframe context")
+    parser.add_argument("--market-type", default="um")
+    parser.add_argument("--table", choices=["futures_candles", "candles_raw"], default="futures_candles")
+    parser.add_argument("--symbols", type=lambda s: s.split(","), default=SYMBOLS)
+    parser.add_argument("--base", default="1m")
+    parser.add_argument("--context", action="append", required=True, help="interval:col,col (repeatable)")
+    parser.add_argument("--start", type=date.fromisoformat, default=None)
+    parser.add_argument("--end", type=date.fromisoformat, default=None)
+    parser.add_argument("--warmup-bars", type=int, default=500)
+    parser.add_argument("--out", required=True, help=".parquet or .csv")
+    args = parser.parse_args()
+
+    df = build_multi_timeframe(
+        POSTGRES_DSN or require("POSTGRES_DSN"), args.market_type, args.symbols, args.base,
+        _parse_context(args.context), start_date=args.start, end_date=args.end,
+        table=args.table, warmup_bars=args.warmup_bars,
+    )
+    if args.out.endswith(".csv"):
+        df.to_csv(args.out, index=False)
+    else:
+        df.to_parquet(args.out, index=False)
+    log.info("Wrote %d rows x %d columns to %s", len(df), df.shape[1], args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Push-based candle updates: the writers (upsert_candle, upsert_klines) NOTIFY on
+CANDLE_NOTIFY_CHANNEL after each batch, and a CandleSubscriber LISTENs, fetches only
+the rows at or after its last open_time and appends them to an in-memory frame.
+
+    sub = CandleSubscriber(dsn, "um", "BTCUSDT", "1m", history=2000)
+    for new_rows in sub.updates():          # blocks until candles land
+        signal(sub.frame)
+"""
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+from typing import Iterator
+
+import pandas as pd
+import psycopg
+from psycopg import sql
+
+from pipelines.common.logging import get_logger
+from pipelines.common.settings import CANDLE_NOTIFY_CHANNEL
+from pipelines.features.load_from_pg import _SERIES_TABLES, load_candles
+
+log = get_logger(__name__)
+
+_COLUMNS = ["open_time", "open", "high", "low", "close", "volume"]
+
+
+class CandleSubscriber:
+    """
+    Keeps `frame` (open_time, open, high, low, close, volume) current for one series.
+    Starts from the latest `history` candles; `max_rows` bounds the frame (oldest rows dropped).
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        market_type: str,
+        symbol: str,
+        interval: str,
+        *,
+        table: str = "futures_candles",
+        history: int = 2000,
+        max_rows: int | None = None,
+    ):
+        self.dsn = dsn
+        self.market_type = market_type
+        self.symbol = symbol
+        self.interval = interval
+        self.table = table
+        self.max_rows = max_rows or max(history, 1) * 2
+        qualified, key_col = _SERIES_TABLES[table]
+        self._fetch_sql = f"""
+            SELECT open_time, open, high, low, close, volume
+            FROM {qualified}
+            WHERE {key_col} = %(key)s AND symbol = %(symbol)s AND interval = %(interval)s
+              AND open_time >= %(since)s
+            ORDER BY open_time
+        """
+
+        # LISTEN before the initial load so nothing committed in between is missed
+        self._listen = psycopg.connect(dsn, autocommit=True)
+        self._listen.execute(sql.SQL("LISTEN {}").format(sql.Identifier(CANDLE_NOTIFY_CHANNEL)))
+        self._query = psycopg.connect(dsn, autocommit=True)
+        if history:
+            self.frame = load_candles(dsn, market_type, symbol, interval, limit=history, table=table)
+        else:
+            self.frame = pd.DataFrame(columns=_COLUMNS)
+        self.fetches = 0
+        log.info("Subscribed to %s %s %s %s (%d rows loaded)", table, market_type, symbol, interval, len(self.frame))
+
+    def close(self) -> None:
+        self._listen.close()
+        self._query.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def last_open_time(self) -> datetime | None:
+        return None if self.frame.empty else self.frame["open_time"].iloc[-1].to_pydatetime()
+
+    def _wanted(self, payload: str, last_ms: int | None) -> bool:
+        """True for a notification about this series reaching at least our last candle."""
+        try:
+            msg = json.loads(payload)
+        except ValueError:
+            return False
+        return (
+            msg.get("table") == self.table
+            and msg.get("key") == self.market_type
+            and msg.get("symbol") == self.symbol
+            and msg.get("interval") == self.interval
+            and (last_ms is None or int(msg["max_open_ms"]) >= last_ms)
+        )
+
+    def refresh(self) -> pd.DataFrame:
+        """
+        Fetch rows from the last known open_time on (the last bar may have been rewritten),
+        merge them into `frame` and return them.
+        """
+        since = self.last_open_time or datetime(1970, 1, 1, tzinfo=timezone.utc)
+        params = {"key": self.market_type, "symbol": self.symbol, "interval": self.interval, "since": since}
+        rows = self._query.execute(self._fetch_sql, params).fetchall()
+        self.fetches += 1
+        new = pd.DataFrame(rows, columns=_COLUMNS)
+        if new.empty:
+            return new
+        new["open_time"] = pd.to_datetime(new["open_time"], utc=True)
+        if self.frame.empty:
+            frame = new
+        else:
+            frame = pd.concat([self.frame[self.frame["open_time"] < new["open_time"].iloc[0]], new])
+        self.frame = frame.iloc[-self.max_rows:].reset_index(drop=True)
+        return new
+
+    def poll(self, timeout: float | None = 0.0) -> pd.DataFrame | None:
+        """
+        Wait up to `timeout` seconds (None = forever) for a notification about this series;
+        then fetch once and return the new rows. Returns None on timeout.
+        """
+        last_ms = None if self.frame.empty else int(self.frame["open_time"].iloc[-1].timestamp() * 1000)
+        for n in self._listen.notifies(timeout=timeout):
+            if self._wanted(n.payload, last_ms):
+                break
+        else:
+            return None
+        # Anything else already queued was committed before the fetch below, so one fetch covers it
+        for _ in self._listen.notifies(timeout=0):
+            pass
+        return self.refresh()
+
+    def updates(self, timeout: float | None = None) -> Iterator[pd.DataFrame]:
+        """Yield new rows as they are committed (until timeout seconds pass with nothing new)."""
+        while True:
+            new = self.poll(timeout)
+            if new is None:
+                return
+            if not new.empty:
+                yield new
@@ -0,0 +1,430 @@
+"""
+Distributed archive downloads: the SYMBOLS × INTERVALS × days plan becomes rows in
+market.archive_jobs (sql/004_archive_jobs.sql) and any number of worker processes, on
+any number of machines, claim them with FOR UPDATE SKIP LOCKED.
+
+    python -m pipelines.ingestion.archive_queue plan --start 2020-01-01 [--monthly]
+    python -m pipelines.ingestion.archive_queue work --threads 8        # on every node
+    python -m pipelines.ingestion.archive_queue status
+
+Claims are short transactions; downloads happen outside any lock. A worker heartbeats
+the jobs it holds; a claim whose heartbeat is older than --stale-after seconds is
+handed back to the queue (or marked dead once it has used up max_attempts, so a job
+that kills its worker cannot loop forever). Failures retry with exponential backoff.
+
+Each job's candles, its 'done' row and the series' futures_ingestion_metadata update
+commit in one transaction. last_open_time only advances to the newest candle below
+the series' earliest unfinished job, so out-of-order completion never makes the
+metadata (and the downloader's resume logic) skip a hole.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from datetime import date, timedelta
+
+import psycopg
+
+from pipelines.common import metrics
+from pipelines.common.logging import get_logger
+from pipelines.common.settings import INTERVALS, POSTGRES_DSN, SYMBOLS, require
+from pipelines.ingestion.binance_archive import KlinePath, _http_get, _read_zip_csv, upsert_klines
+
+log = get_logger(__name__)
+
+JOBS_DONE = metrics.counter("archive_jobs_total", "Archive jobs finished by this worker", ["status"])
+
+_BACKOFF_BASE_S = 30
+_BACKOFF_MAX_S = 3600
+# Reconnect delay of a download loop whose database connection failed
+_RECONNECT_MIN_S = 1.0
+_RECONNECT_MAX_S = 60.0
+
+
+def _dsn() -> str:
+    return POSTGRES_DSN or require("POSTGRES_DSN")
+
+
+def plan(
+    conn: psycopg.Connection,
+    market_type: str,
+    symbols: list[str],
+    intervals: list[str],
+    start: date,
+    end: date,
+    *,
+    monthly: bool = False,
+    max_attempts: int = 5,
+) -> int:
+    """
+    Insert one job per archive for [start, end] (idempotent). With monthly, every whole
+    calendar month before end's month is one monthly job and the remainder is daily.
+    Returns the number of new jobs.
+    """
+    daily_from = start
+    n = 0
+    if monthly:
+        first_month = date(start.year, start.month, 1)
+        if first_month < start:
+            first_month = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        current_month = date(end.year, end.month, 1)
+        if first_month < current_month:
+            n += conn.execute(
+                """
+                INSERT INTO market.archive_jobs (market_type, symbol, interval, period, period_start, max_attempts)
+                SELECT %(mt)s, s, i, 'monthly', m::date, %(max_attempts)s
+                FROM unnest(%(symbols)s::text[]) s, unnest(%(intervals)s::text[]) i,
+                     generate_series(%(first)s::date, %(last)s::date, interval '1 month') m
+                ON CONFLICT DO NOTHING
+                """,
+                {"mt": market_type, "symbols": symbols, "intervals": intervals, "max_attempts": max_attempts,
+                 "first": first_month, "last": current_month - timedelta(days=1)},
+            ).rowcount
+            # Days before the first whole month stay daily
+            daily_until = first_month - timedelta(days=1)
+            if start <= daily_until:
+                n += _plan_daily(conn, market_type, symbols, intervals, start, daily_until, max_attempts)
+            daily_from = current_month
+    if daily_from <= end:
+        n += _plan_daily(conn, market_type, symbols, intervals, daily_from, end, max_attempts)
+    conn.commit()
+    return n
+
+
+def _plan_daily(conn, market_type, symbols, intervals, start: date, end: date, max_attempts: int) -> int:
+    return conn.execute(
+        """
+        INSERT INTO market.archive_jobs (market_type, symbol, interval, period, period_start, max_attempts)
+        SELECT %(mt)s, s, i, 'daily', d::date, %(max_attempts)s
+        FROM unnest(%(symbols)s::text[]) s, unnest(%(intervals)s::text[]) i,
+             generate_series(%(start)s::date, %(end)s::date, interval '1 day') d
+        ON CONFLICT DO NOTHING
+        """,
+        {"mt": market_type, "symbols": symbols, "intervals": intervals, "max_attempts": max_attempts,
+         "start": start, "end": end},
+    ).rowcount
+
+
+def claim(conn: psycopg.Connection, worker: str, limit: int = 1) -> list[tuple]:
+    """Claim up to `limit` runnable jobs: (id, market_type, symbol, interval, period, period_start)."""
+    rows = conn.execute(
+        """
+        WITH picked AS (
+          SELECT id FROM market.archive_jobs
+          WHERE status = 'pending' AND not_before <= now()
+          ORDER BY not_before, id
+          LIMIT %(limit)s
+          FOR UPDATE SKIP LOCKED
+        )
+        UPDATE market.archive_jobs j
+        SET status = 'running', attempts = j.attempts + 1, worker = %(worker)s,
+            claimed_at = now(), heartbeat_at = now()
+        FROM picked
+        WHERE j.id = picked.id
+        RETURNING j.id, j.market_type, j.symbol, j.interval, j.period, j.period_start
+        """,
+        {"limit": limit, "worker": worker},
+    ).fetchall()
+    conn.commit()
+    return rows
+
+
+def heartbeat(conn: psycopg.Connection, worker: str, job_ids: list[int]) -> None:
+    if job_ids:
+        conn.execute(
+            "UPDATE market.archive_jobs SET heartbeat_at = now() WHERE id = ANY(%s) AND worker = %s AND status = 'running'",
+            (job_ids, worker),
+        )
+    conn.commit()
+
+
+def reap_stale(conn: psycopg.Connection, stale_after_s: float) -> int:
+    """Release claims whose worker stopped heartbeating; jobs out of attempts become dead."""
+    n = conn.execute(
+        """
+        UPDATE market.archive_jobs
+        SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'pending' END,
+            last_error = 'worker ' || coalesce(worker, '?') || ' stopped heartbeating',
+            not_before = now(), worker = NULL
+        WHERE status = 'running' AND heartbeat_at < now() - make_interval(secs => %s)
+        """,
+        (stale_after_s,),
+    ).rowcount
+    conn.commit()
+    if n:
+        log.warning("Released %d stale archive jobs", n)
+    return n
+
+
+def release(conn: psycopg.Connection, worker: str) -> int:
+    """Hand back jobs a worker left running (its connection dropped mid-job); jobs out of attempts become dead."""
+    n = conn.execute(
+        """
+        UPDATE market.archive_jobs
+        SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'pending' END,
+            last_error = 'worker ' || worker || ' lost its database connection',
+            not_before = now(), worker = NULL
+        WHERE status = 'running' AND worker = %s
+        """,
+        (worker,),
+    ).rowcount
+    conn.commit()
+    return n
+
+
+def _advance_watermark(conn: psycopg.Connection, market_type: str, symbol: str, interval: str) -> None:
+    """Move last_open_time to the newest stored candle below the series' earliest unfinished job."""
+    conn.execute(
+        """
+        INSERT INTO market.futures_ingestion_metadata (market_type, symbol, interval, last_open_time)
+        SELECT %(mt)s, %(symbol)s, %(interval)s, max(c.open_time)
+        FROM market.futures_candles c
+        WHERE c.market_type = %(mt)s AND c.symbol = %(symbol)s AND c.interval = %(interval)s
+          AND c.open_time < coalesce(
+                (SELECT min(period_start)::timestamp AT TIME ZONE 'UTC'
+                 FROM market.archive_jobs
+                 WHERE market_type = %(mt)s AND symbol = %(symbol)s AND interval = %(interval)s
+                   AND status NOT IN ('done', 'missing')),
+                'infinity'::timestamptz)
+        HAVING max(c.open_time) IS NOT NULL
+        ON CONFLICT (market_type, symbol, interval)
+        DO UPDATE SET
+          last_open_time = GREATEST(EXCLUDED.last_open_time, market.futures_ingestion_metadata.last_open_time),
+          updated_at = now()
+        """,
+        {"mt": market_type, "symbol": symbol, "interval": interval},
+    )
+
+
+def run_job(conn: psycopg.Connection, job: tuple, worker: str) -> str:
+    """Download one archive and finish its job in the same transaction as the candles."""
+    job_id, market_type, symbol, interval, period, period_start = job
+    kp = KlinePath(market_type, symbol, interval)
+    if period == "monthly":
+        url = kp.monthly_url(period_start.strftime("%Y-%m"))
+    else:
+        url = kp.daily_url(period_start.isoformat())
+    try:
+        blob = _http_get(url)
+        rows = 0
+        if blob:
+            rows = upsert_klines(
+                conn, market_type, symbol, interval, _read_zip_csv(blob), update_metadata=False, commit=False
+            ).changed
+        status = "done" if blob else "missing"
+        conn.execute(
+            """
+            UPDATE market.archive_jobs
+            SET status = %s, rows_written = %s, finished_at = now(), last_error = NULL
+            WHERE id = %s AND worker = %s
+            """,
+            (status, rows, job_id, worker),
+        )
+        _advance_watermark(conn, market_type, symbol, interval)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        conn.execute(
+            """
+            UPDATE market.archive_jobs
+            SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'pending' END,
+                not_before = now() + make_interval(secs => least(%s * power(2, attempts - 1), %s)),
+                last_error = %s, worker = NULL
+            WHERE id = %s AND worker = %s
+            """,
+            (_BACKOFF_BASE_S, _BACKOFF_MAX_S, f"{type(e).__name__}: {e}"[:2000], job_id, worker),
+        )
+        conn.commit()
+        log.warning("Archive job %d (%s %s %s %s) failed: %s", job_id, symbol, interval, period, period_start, e)
+        status = "failed"
+    JOBS_DONE.inc(status=status)
+    return status
+
+
+class Worker:
+    """`threads` download loops sharing one heartbeat thread; stops when the queue is drained if idle_exit."""
+
+    def __init__(
+        self,
+        dsn: str,
+        *,
+        threads: int = 4,
+        name: str | None = None,
+        stale_after_s: float = 300.0,
+        heartbeat_s: float = 30.0,
+        idle_exit: bool = False,
+    ):
+        self.dsn = dsn
+        self.threads = threads
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.stale_after_s = stale_after_s
+        self.heartbeat_s = heartbeat_s
+        self.idle_exit = idle_exit
+        self._held: set[tuple[int, str]] = set()  # (job id, thread worker name)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.counts: dict[str, int] = {}
+
+    def _loop(self, idx: int) -> None:
+        me = f"{self.name}/{idx}"
+        delay = _RECONNECT_MIN_S
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(self.dsn) as conn:
+                    if release(conn, me):
+                        log.warning("Released the jobs %s held before its connection dropped", me)
+                    delay = _RECONNECT_MIN_S
+                    self._work(conn, me)
+                    return
+            except psycopg.OperationalError as e:
+                log.warning("Archive loop %s lost its database connection (%s); reconnecting in %.0fs", me, e, delay)
+                self._stop.wait(delay)
+                delay = min(delay * 2, _RECONNECT_MAX_S)
+
+    def _work(self, conn: psycopg.Connection, me: str) -> None:
+        """Claim and run jobs until stopped (or the queue is drained, with idle_exit)."""
+        while not self._stop.is_set():
+            jobs = claim(conn, me)
+            if not jobs:
+                if self.idle_exit:
+                    return
+                self._stop.wait(5.0)
+                continue
+            job = jobs[0]
+            with self._lock:
+                self._held.add((job[0], me))
+            try:
+                status = run_job(conn, job, me)
+            finally:
+                with self._lock:
+                    self._held.discard((job[0], me))
+            with self._lock:
+                self.counts[status] = self.counts.get(status, 0) + 1
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(self.dsn) as conn:
+                    while not self._stop.wait(self.heartbeat_s):
+                        with self._lock:
+                            held = list(self._held)
+                        for me in {w for _, w in held}:
+                            heartbeat(conn, me, [j for j, w in held if w == me])
+                        reap_stale(conn, self.stale_after_s)
+            except psycopg.OperationalError as e:
+                log.warning("Archive heartbeat lost its database connection (%s); reconnecting", e)
+                self._stop.wait(_RECONNECT_MIN_S)
+
+    def run(self) -> dict[str, int]:
+        with psycopg.connect(self.dsn) as conn:
+            reap_stale(conn, self.stale_after_s)
+        hb = threading.Thread(target=self._heartbeat_loop, name="archive-heartbeat", daemon=True)
+        hb.start()
+        t0 = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.threads) as pool:
+                futures = [pool.submit(self._loop, i) for i in range(self.threads)]
+                done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+                # Stop the other loops before the pool waits for them
+                self._stop.set()
+                for fut in done:
+                    if fut.exception() is not None:
+                        log.error("Archive loop failed: %r", fut.exception())
+                        raise fut.exception()
+        finally:
+            self._stop.set()
+        log.info("Worker %s finished in %.1fs: %s", self.name, time.perf_counter() - t0, self.counts)
+        return self.counts
+
+
+def status(conn: psycopg.Connection) -> dict:
+    """Job counts by status, rows written and the completion rate over the last 5 minutes."""
+    by_status = dict(conn.execute("SELECT status, count(*) FROM market.archive_jobs GROUP BY status").fetchall())
+    rows, recent, workers = conn.execute(
+        """
+        SELECT coalesce(sum(rows_written), 0),
+               count(*) FILTER (WHERE finished_at > now() - interval '5 minutes'),
+               count(DISTINCT split_part(worker, '/', 1)) FILTER (WHERE status = 'running')
+        FROM market.archive_jobs
+        """
+    ).fetchone()
+    remaining = by_status.get("pending", 0) + by_status.get("running", 0)
+    rate = recent / 300.0
+    return {
+        "jobs": by_status,
+        "rows_written": int(rows),
+        "jobs_per_s": rate,
+        "active_workers": workers,
+        "eta_s": remaining / rate if rate else None,
+    }
+
+
+def retry_dead(conn: psycopg.Connection, include_missing: bool = False) -> int:
+    """Put dead (and optionally missing) jobs back in the queue with fresh attempts."""
+    statuses = ["dead", "missing"] if include_missing else ["dead"]
+    n = conn.execute(
+        """
+        UPDATE market.archive_jobs
+        SET status = 'pending', attempts = 0, not_before = now(), worker = NULL
+        WHERE status = ANY(%s)
+        """,
+        (statuses,),
+    ).rowcount
+    conn.commit()
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Postgres-backed archive download queue")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_plan = sub.add_parser("plan", help="enqueue one job per archive")
+    p_plan.add_argument("--market-type", default="um", choices=["um", "cm"])
+    p_plan.add_argument("--symbols", type=lambda s: s.split(","), default=SYMBOLS)
+    p_plan.add_argument("--intervals", type=lambda s: s.split(","), default=INTERVALS)
+    p_plan.add_argument("--start", type=date.fromisoformat, required=True)
+    p_plan.add_argument("--end", type=date.fromisoformat, default=date.today() - timedelta(days=1))
+    p_plan.add_argument("--monthly", action="store_true", help="monthly archives for whole past months")
+    p_plan.add_argument("--max-attempts", type=int, default=5)
+
+    p_work = sub.add_parser("work", help="claim and run jobs")
+    p_work.add_argument("--threads", type=int, default=4)
+    p_work.add_argument("--stale-after", type=float, default=300.0)
+    p_work.add_argument("--heartbeat", type=float, default=30.0)
+    p_work.add_argument("--exit-when-idle", action="store_true")
+
+    sub.add_parser("status", help="progress report")
+    p_retry = sub.add_parser("retry", help="requeue dead jobs")
+    p_retry.add_argument("--missing", action="store_true", help="also requeue archives that were not published")
+
+    args = parser.parse_args()
+    dsn = _dsn()
+    if args.cmd == "work":
+        metrics.start_http_server()
+        Worker(
+            dsn,
+            threads=args.threads,
+            stale_after_s=args.stale_after,
+            heartbeat_s=args.heartbeat,
+            idle_exit=args.exit_when_idle,
+        ).run()
+        return
+    with psycopg.connect(dsn) as conn:
+        if args.cmd == "plan":
+            n = plan(
+                conn, args.market_type, args.symbols, args.intervals, args.start, args.end,
+                monthly=args.monthly, max_attempts=args.max_attempts,
+            )
+            log.info("Planned %d new archive jobs", n)
+        elif args.cmd == "status":
+            log.info("Archive queue: %s", status(conn))
+        elif args.cmd == "retry":
+            log.info("Requeued %d jobs", retry_dead(conn, include_missing=args.missing))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""
+Binance bulk-data archives (data.binance.vision) -> market.futures_candles.
+
+Run:
+    python -m pipelines download [--symbols BTCUSDT] [--intervals 1m,1h] [--start 2019-01-01]
+"""
+import argparse
+import io
+import time
+import zipfile
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import requests
+import psycopg
+
+from pipelines.common import metrics
+from pipelines.common.logging import get_logger
+from pipelines.common.settings import BINANCE_ARCHIVE_URL, POSTGRES_DSN, SYMBOLS
+from pipelines.common.tracing import span, traced
+from pipelines.ingestion import coverage
+from pipelines.ingestion.db import UpsertStats, notify_candles
+
+log = get_logger(__name__)
+
+BASE = BINANCE_ARCHIVE_URL
+
+
+@dataclass(frozen=True)
+class KlinePath:
+    market_type: str
+    symbol: str
+    interval: str
+
+    def monthly_url(self, yyyy_mm: str) -> str:
+        # Example:
+        # https://data.binance.vision/data/futures/um/monthly/klines/BTCUSDT/1m/BTCUSDT-1m-2020-01.zip
+        return f"{BASE}/data/futures/{self.market_type}/monthly/klines/{self.symbol}/{self.interval}/{self.symbol}-{self.interval}-{yyyy_mm}.zip"
+
+    def daily_url(self, yyyy_mm_dd: str) -> str:
+        # Example:
+        # https://data.binance.vision/data/futures/um/daily/klines/BTCUSDT/1m/BTCUSDT-1m-2020-01-01.zip
+        return f"{BASE}/data/futures/{self.market_type}/daily/klines/{self.symbol}/{self.interval}/{self.symbol}-{self.interval}-{yyyy_mm_dd}.zip"
+
+
+@traced("http.archive_get")
+def _http_get(url: str) -> Optional[bytes]:
+    with metrics.HTTP_SECONDS.time(endpoint="archive"):
+        r = requests.get(url, timeout=60)
+    metrics.HTTP_REQUESTS.inc(endpoint="archive", status=r.status_code)
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+    metrics.HTTP_BYTES.inc(len(r.content), endpoint="archive")
+    return r.content
+
+
+@traced("zip.read_csv")
+def _read_zip_csv(zip_bytes: bytes) -> pd.DataFrame:
+    z = zipfile.ZipFile(io.BytesIO(zip_bytes))
+    # usually only one CSV inside
+    name = z.namelist()[0]
+    with z.open(name) as f:
+        df = pd.read_csv(
+            f,
+            header=None,
+            names=[
+                "open_time",
+                "open",
+                "high",
+                "low",
+                "close",
+                "volume",
+                "close_time",
+                "quote_volume",
+                "num_trades",
+                "taker_buy_base",
+                "taker_buy_quote",
+                "ignore",
+            ],
+        )
+    return df
+
+
+@traced("pandas.normalize_timestamps")
+def _normalize_timestamps_to_ms(df: pd.DataFrame) -> pd.DataFrame:
+    # Drop header row if present (some Binance CSVs have "open_time", "open", ... as first line)
+    if "open_time" in df.columns:
+        df["open_time"] = pd.to_numeric(df["open_time"], errors="coerce")
+    if "close_time" in df.columns:
+        df["close_time"] = pd.to_numeric(df["close_time"], errors="coerce")
+    # Keep only rows where both timestamps are numeric
+    mask = df["open_time"].notna() if "open_time" in df.columns else pd.Series(True, index=df.index)
+    if "close_time" in df.columns:
+        mask = mask & df["close_time"].notna()
+    df = df.loc[mask].copy()
+    for col in ["open_time", "close_time"]:
+        if col in df.columns:
+            df[col] = df[col].astype("int64")
+    # Normalize: if values are microseconds (>= 10^15), convert to ms
+    for col in ["open_time", "close_time"]:
+        if col in df.columns and len(df) > 0 and df[col].iloc[0] >= 10**15:
+            df[col] = (df[col] // 1000).astype("int64")
+    return df
+
+
+# Stored columns besides the key, in futures_candles order; open_time / close_time travel as epoch ms
+_KLINE_VALUES = [
+    "open", "high", "low", "close", "volume", "close_time",
+    "quote_volume", "num_trades", "taker_buy_base", "taker_buy_quote",
+]
+
+_KLINE_MERGE = """
+WITH w AS (
+  INSERT INTO market.futures_candles AS c
+  (market_type, symbol, interval, open_time, open, high, low, close, volume,
+   close_time, quote_volume, num_trades, taker_buy_base, taker_buy_quote)
+  SELECT %(market_type)s, %(symbol)s, %(interval)s, 'epoch'::timestamptz + open_ms * interval '1 millisecond',
+         open, high, low, close, volume, 'epoch'::timestamptz + close_ms * interval '1 millisecond',
+         quote_volume, num_trades, taker_buy_base, taker_buy_quote
+  FROM _kline_stage
+  ON CONFLICT (market_type, symbol, interval, open_time)
+  DO UPDATE SET
+    open=EXCLUDED.open, high=EXCLUDED.high, low=EXCLUDED.low, close=EXCLUDED.close,
+    volume=EXCLUDED.volume, close_time=EXCLUDED.close_time,
+    quote_volume=EXCLUDED.quote_volume, num_trades=EXCLUDED.num_trades,
+    taker_buy_base=EXCLUDED.taker_buy_base, taker_buy_quote=EXCLUDED.taker_buy_quote,
+    ingested_at=now()
+  {where}
+  RETURNING (xmax = 0) AS inserted
+)
+SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM w
+"""
+
+_KLINE_CHANGED = """
+  WHERE (c.open, c.high, c.low, c.close, c.volume, c.close_time,
+         c.quote_volume, c.num_trades, c.taker_buy_base, c.taker_buy_quote)
+    IS DISTINCT FROM (EXCLUDED.open, EXCLUDED.high, EXCLUDED.low, EXCLUDED.close, EXCLUDED.volume,
+                      EXCLUDED.close_time, EXCLUDED.quote_volume, EXCLUDED.num_trades,
+                      EXCLUDED.taker_buy_base, EXCLUDED.taker_buy_quote)
+"""
+
+
+def _drop_unchanged(conn: psycopg.Connection, market_type: str, symbol: str, interval: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rows of df (sorted, unique open_time) that are new or differ from what is stored.
+    Rows past the stored max open_time are new by definition; only the overlap is read back.
+    """
+    series = (market_type, symbol, interval)
+    stored_max = conn.execute(
+        "SELECT max(open_time) FROM market.futures_candles WHERE market_type = %s AND symbol = %s AND interval = %s",
+        series,
+    ).fetchone()[0]
+    lo_ms = int(df["open_time"].iloc[0])
+    if stored_max is None or stored_max.timestamp() * 1000 < lo_ms:
+        return df
+    hi_ms = min(int(df["open_time"].iloc[-1]), int(stored_max.timestamp() * 1000))
+    stored = conn.execute(
+        """
+        SELECT (extract(epoch FROM open_time) * 1000)::bigint, open, high, low, close, volume,
+               (extract(epoch FROM close_time) * 1000)::bigint, quote_volume, num_trades,
+               taker_buy_base, taker_buy_quote
+        FROM market.futures_candles
+        WHERE market_type = %s AND symbol = %s AND interval = %s
+          AND open_time BETWEEN 'epoch'::timestamptz + %s * interval '1 millisecond'
+                            AND 'epoch'::timestamptz + %s * interval '1 millisecond'
+        """,
+        (*series, lo_ms, hi_ms),
+    ).fetchall()
+    if not stored:
+        return df
+    old = pd.DataFrame(stored, columns=["open_time"] + _KLINE_VALUES).set_index("open_time")
+    old = old.reindex(df["open_time"].to_numpy())
+    a = df[_KLINE_VALUES].to_numpy(dtype=np.float64, na_value=np.nan)
+    b = old.to_numpy(dtype=np.float64, na_value=np.nan)
+    same = ((a == b) | (np.isnan(a) & np.isnan(b))).all(axis=1)
+    return df[~same]
+
+
+@traced("upsert_klines")
+def upsert_klines(
+    conn: psycopg.Connection,
+    market_type: str,
+    symbol: str,
+    interval: str,
+    df: pd.DataFrame,
+    *,
+    update_metadata: bool = True,
+    commit: bool = True,
+    skip_unchanged: bool = True,
+) -> UpsertStats:
+    """
+    Upsert archive klines into market.futures_candles (COPY into a temp stage, then one
+    INSERT ... ON CONFLICT). With skip_unchanged, rows identical to the stored ones are
+    neither sent nor rewritten, so re-ingesting stored history costs reads instead of
+    WAL and dead tuples, and ingested_at marks the last change. Callers that manage the
+    ingestion watermark and transaction themselves (the archive job queue) pass
+    update_metadata=False / commit=False.
+    """
+    t0 = time.perf_counter()
+    df = _normalize_timestamps_to_ms(df)
+    stats = UpsertStats()
+    if df.empty:
+        return stats
+    with span("pandas.prepare_rows"):
+        df = df.drop_duplicates("open_time", keep="last").sort_values("open_time", ignore_index=True)
+        for col in _KLINE_VALUES:
+            if col not in ("close_time", "num_trades"):
+                df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+        df["num_trades"] = pd.to_numeric(df["num_trades"], errors="coerce").astype("Int64")
+
+    todo = df
+    if skip_unchanged:
+        with span("postgres.drop_unchanged"):
+            todo = _drop_unchanged(conn, market_type, symbol, interval, df)
+    stats.skipped = len(df) - len(todo)
+
+    if len(todo):
+        with conn.cursor() as cur, span("postgres.copy_merge"):
+            cur.execute(
+                """
+                CREATE TEMP TABLE IF NOT EXISTS _kline_stage (
+                  open_ms bigint, open float8, high float8, low float8, close float8, volume float8,
+                  close_ms bigint, quote_volume float8, num_trades bigint,
+                  taker_buy_base float8, taker_buy_quote float8
+                ) ON COMMIT DELETE ROWS
+                """
+            )
+            cur.execute("TRUNCATE _kline_stage")
+            buf = io.StringIO()
+            todo[["open_time"] + _KLINE_VALUES].to_csv(buf, header=False, index=False)
+            with cur.copy("COPY _kline_stage FROM STDIN (FORMAT csv)") as copy:
+                copy.write(buf.getvalue())
+            inserted, updated = cur.execute(
+                _KLINE_MERGE.format(where=_KLINE_CHANGED if skip_unchanged else ""),
+                {"market_type": market_type, "symbol": symbol, "interval": interval},
+            ).fetchone()
+        stats.inserted, stats.updated = inserted, updated
+        # Rows that changed between the pre-filter read and the merge's own comparison
+        stats.skipped += len(todo) - inserted - updated
+
+    first_open_dt = pd.Timestamp(int(df["open_time"].iloc[0]), unit="ms", tz="UTC").to_pydatetime()
+    last_open_dt = pd.Timestamp(int(df["open_time"].iloc[-1]), unit="ms", tz="UTC").to_pydatetime()
+    if update_metadata:
+        # update metadata (last_open_time as timestamptz); a no-op when it would not move
+        conn.execute(
+            """
+            INSERT INTO market.futures_ingestion_metadata AS m (market_type, symbol, interval, last_open_time)
+            VALUES (%s,%s,%s,%s)
+            ON CONFLICT (market_type, symbol, interval)
+            DO UPDATE SET
+              last_open_time=GREATEST(EXCLUDED.last_open_time, m.last_open_time),
+              updated_at=now()
+            WHERE GREATEST(EXCLUDED.last_open_time, m.last_open_time) IS DISTINCT FROM m.last_open_time
+            """,
+            (market_type, symbol, interval, last_open_dt),
+        )
+    if stats.inserted:
+        coverage.refresh(conn, "futures_candles", market_type, symbol, interval, first_open_dt, last_open_dt)
+    if stats.changed:
+        notify_candles(conn, "futures_candles", market_type, symbol, interval, last_open_dt)
+
+    if commit:
+        with span("postgres.commit"):
+            conn.commit()
+    metrics.DB_UPSERT_SECONDS.observe(time.perf_counter() - t0, table="futures_candles")
+    metrics.DB_ROWS.inc(len(df), table="futures_candles")
+    stats.record("futures_candles")
+    return stats
+
+
+def get_last_ingested_date(market_type: str, symbol: str, interval: str) -> Optional[date]:
+    """Return the date of last_open_time from metadata, or None if never ingested."""
+    with psycopg.connect(POSTGRES_DSN) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT last_open_time FROM market.futures_ingestion_metadata
+                WHERE market_type = %s AND symbol = %s AND interval = %s
+                """,
+                (market_type, symbol, interval),
+            )
+            row = cur.fetchone()
+    if not row or row[0] is None:
+        return None
+    # last_open_time is timestamptz (candle open); convert to date in UTC
+    ts = row[0]
+    if hasattr(ts, "date"):
+        return ts.date()
+    return date(ts.year, ts.month, ts.day)
+
+
+def download_range(
+    market_type: str,
+    symbol: str,
+    interval: str,
+    start: date,
+    end: date,
+    prefer_monthly: bool = False,
+):
+    """
+    Downloads klines for [start, end] inclusive.
+    Strategy:
+      - try monthly zips (fast) then fill missing days with daily zips
+    """
+    kp = KlinePath(market_type, symbol, interval)
+
+    with psycopg.connect(POSTGRES_DSN) as conn:
+        if prefer_monthly:
+            # monthly loop
+            cur = date(start.year, start.month, 1)
+            while cur <= end:
+                yyyy_mm = f"{cur.year:04d}-{cur.month:02d}"
+                url = kp.monthly_url(yyyy_mm)
+                blob = _http_get(url)
+                if blob:
+                    df = _read_zip_csv(blob)
+                    stats = upsert_klines(conn, market_type, symbol, interval, df)
+                    log.info("[MONTHLY] %s %s %s: %s", symbol, interval, yyyy_mm, stats)
+                cur = (date(cur.year + (cur.month // 12), (cur.month % 12) + 1, 1))
+
+        # daily loop for exact coverage / missing months
+        d = start
+        while d <= end:
+            stats = download_day(conn, market_type, symbol, interval, d)
+            if stats is not None:
+                log.info("[DAILY] %s %s %s: %s", symbol, interval, d.isoformat(), stats)
+            d += timedelta(days=1)
+
+
+def download_missing(market_type: str, symbol: str, interval: str, start: date, end: date) -> int:
+    """
+    Download only the days in [start, end] the coverage catalog does not have complete,
+    including days before the first stored one and a partial first day. Returns the
+    number of days fetched.
+    """
+    with psycopg.connect(POSTGRES_DSN) as conn:
+        if coverage.date_range(conn, "futures_candles", market_type, symbol, interval) is None:
+            # Not cataloged yet: catalog what is stored so those days are not fetched again
+            coverage.rebuild(conn, "futures_candles", market_type, symbol, interval)
+            conn.commit()
+        days = coverage.missing_days(conn, "futures_candles", market_type, symbol, interval, start, end)
+        fetched = 0
+        for d in days:
+            stats = download_day(conn, market_type, symbol, interval, d)
+            if stats is not None:
+                fetched += 1
+                log.info("[DAILY] %s %s %s: %s", symbol, interval, d.isoformat(), stats)
+    return fetched
+
+
+@traced("archive.download_day")
+def download_day(
+    conn: psycopg.Connection, market_type: str, symbol: str, interval: str, day: date
+) -> Optional[UpsertStats]:
+    """Fetch and upsert one daily archive. Returns the upsert outcome, or None if the archive does not exist."""
+    kp = KlinePath(market_type, symbol, interval)
+    blob = _http_get(kp.daily_url(f"{day.year:04d}-{day.month:02d}-{day.day:02d}"))
+    if not blob:
+        return None
+    return upsert_klines(conn, market_type, symbol, interval, _read_zip_csv(blob))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download missing daily futures kline archives into market.futures_candles")
+    parser.add_argument("--market-type", choices=["um", "cm"], default="um", help="um = USDT-M, cm = COIN-M")
+    parser.add_argument("--symbols", type=lambda s: s.split(","), default=SYMBOLS)
+    parser.add_argument("--intervals", type=lambda s: s.split(","), default=["1m", "5m", "15m", "1h"])
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2019, 1, 1))
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="default: yesterday")
+    args = parser.parse_args()
+
+    end = args.end or date.today() - timedelta(days=1)
+    for symbol in args.symbols:
+        for interval in args.intervals:
+            log.info("Downloading %s %s %s", symbol, args.market_type, interval)
+            # Resume from the coverage catalog: only absent / incomplete days are fetched
+            fetched = download_missing(args.market_type, symbol, interval, args.start, end)
+            log.info("Fetched %d daily archives for %s %s (through %s)", fetched, symbol, interval, end)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,83 @@
+import argparse
 import time
 import requests
 from datetime import datetime, timezone
 
+from pipelines.common import metrics
 from pipelines.common.logging import get_logger
 from pipelines.common.settings import BINANCE_BASE_URL, SYMBOLS, INTERVALS
-from pipelines.ingestion.db import get_conn, upsert_candle, touch_metadata
+from pipelines.common.tracing import span, traced
+from pipelines.ingestion import coverage
+from pipelines.ingestion.db import UpsertStats, get_conn, notify_candles, upsert_candle, touch_metadata
 from pipelines.ingestion.intervals import interval_to_ms
 
 log = get_logger(__name__)
 
-def fetch_klines(symbol: str, interval: str, start_ms: int | None, limit: int = 1000):
+@traced("http.fetch_klines")
+def fetch_klines(symbol: str, interval: str, start_ms: int | None, limit: int = 1000, end_ms: int | None = None):
     url = f"{BINANCE_BASE_URL}/api/v3/klines"
     params = {"symbol": symbol, "interval": interval, "limit": limit}
     if start_ms is not None:
         params["startTime"] = start_ms
-    r = requests.get(url, params=params, timeout=30)
+    if end_ms is not None:
+        params["endTime"] = end_ms
+    with metrics.HTTP_SECONDS.time(endpoint="klines"):
+        r = requests.get(url, params=params, timeout=30)
+    metrics.HTTP_REQUESTS.inc(endpoint="klines", status=r.status_code)
     if r.status_code == 429:
         # rate limit: back off
         time.sleep(2)
-        r = requests.get(url, params=params, timeout=30)
+        with metrics.HTTP_SECONDS.time(endpoint="klines"):
+            r = requests.get(url, params=params, timeout=30)
+        metrics.HTTP_REQUESTS.inc(endpoint="klines", status=r.status_code)
     r.raise_for_status()
-    return r.json()
+    klines = r.json()
+    metrics.KLINES_FETCHED.inc(len(klines), symbol=symbol, interval=interval)
+    return klines
 
-def backfill_symbol_interval(symbol: str, interval: str, start_ms: int, end_ms: int | None = None):
+def backfill_symbol_interval(
+    symbol: str, interval: str, start_ms: int, end_ms: int | None = None, throttle_s: float = 0.2
+):
     step = interval_to_ms(interval)
     cur = start_ms
     exchange = "binance"
 
     with get_conn() as conn:
         while True:
-            klines = fetch_klines(symbol, interval, cur, limit=1000)
+            klines = fetch_klines(symbol, interval, cur, limit=1000, end_ms=end_ms)
             if not klines:
                 break
 
             last_open = None
-            for k in klines:
-                open_ms = int(k[0])
-                close_ms = int(k[6])
-                last_open = open_ms
-                open_time = datetime.fromtimestamp(open_ms / 1000.0, tz=timezone.utc)
-                close_time = datetime.fromtimestamp(close_ms / 1000.0, tz=timezone.utc)
-                row = {
-                    "exchange": exchange,
-                    "symbol": symbol,
-                    "interval": interval,
-                    "open_time": open_time,
-                    "close_time": close_time,
-                    "open": float(k[1]),
-                    "high": float(k[2]),
-                    "low": float(k[3]),
-                    "close": float(k[4]),
-                    "volume": float(k[5]),
-                    "is_final": True,
-                }
-                upsert_candle(conn, row)
+            page = UpsertStats()
+            with span("postgres.upsert_page"):
+                for k in klines:
+                    open_ms = int(k[0])
+                    close_ms = int(k[6])
+                    last_open = open_ms
+                    open_time = datetime.fromtimestamp(open_ms / 1000.0, tz=timezone.utc)
+                    close_time = datetime.fromtimestamp(close_ms / 1000.0, tz=timezone.utc)
+                    row = {
+                        "exchange": exchange,
+                        "symbol": symbol,
+                        "interval": interval,
+                        "open_time": open_time,
+                        "close_time": close_time,
+                        "open": float(k[1]),
+                        "high": float(k[2]),
+                        "low": float(k[3]),
+                        "close": float(k[4]),
+                        "volume": float(k[5]),
+                        "is_final": True,
+                    }
+                    page = page + upsert_candle(conn, row, notify=False, track_coverage=False)
+                # One metadata touch, coverage refresh and notification per page rather than per row
                 touch_metadata(conn, exchange, symbol, interval, open_time=open_time, ws_seen=False)
+                if page.inserted:
+                    first_open = datetime.fromtimestamp(int(klines[0][0]) / 1000.0, tz=timezone.utc)
+                    coverage.refresh(conn, "candles_raw", exchange, symbol, interval, first_open, open_time)
+                if page.changed:
+                    notify_candles(conn, "candles_raw", exchange, symbol, interval, open_time)
 
             conn.commit()
 
@@ -67,19 +90,22 @@ def backfill_symbol_interval(symbol: str, interval: str, start_ms: int, end_ms:
                 break
 
             # small throttle to be nice to rate limits
-            time.sleep(0.2)
+            if throttle_s:
+                time.sleep(throttle_s)
 
 def main():
-    # Example: backfill last N days (simple approach).
-    # Use your own start_ms as needed.
-    now_ms = int(time.time() * 1000)
-    days = 90
-    start_ms = now_ms - days * 86_400_000
+    parser = argparse.ArgumentParser(description="Backfill Spot candles from the Binance REST API into market.candles_raw")
+    parser.add_argument("--days", type=int, default=90, help="history to backfill, counted back from now")
+    parser.add_argument("--symbols", type=lambda s: s.split(","), default=SYMBOLS)
+    parser.add_argument("--intervals", type=lambda s: s.split(","), default=INTERVALS)
+    args = parser.parse_args()
 
-    for symbol in SYMBOLS:
-        for interval in INTERVALS:
+    metrics.start_http_server()
+    start_ms = int(time.time() * 1000) - args.days * 86_400_000
+    for symbol in args.symbols:
+        for interval in args.intervals:
             log.info("Backfilling %s %s from %s", symbol, interval, start_ms)
             backfill_symbol_interval(symbol, interval, start_ms=start_ms)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
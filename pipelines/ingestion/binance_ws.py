@@ -1,11 +1,15 @@
+import argparse
 import asyncio
 import json
+import time
 import websockets
 from datetime import datetime, timezone
 
+from pipelines.common import metrics
 from pipelines.common.logging import get_logger
-from pipelines.common.settings import BINANCE_WS_URL, SYMBOLS, INTERVALS
+from pipelines.common.settings import BINANCE_WS_URL, LIVE_CACHE_BARS, LIVE_CACHE_NAME, SYMBOLS, INTERVALS
 from pipelines.ingestion.db import get_conn, upsert_candle, touch_metadata
+from pipelines.ingestion.live_cache import LiveCandleCache, series_key
 
 log = get_logger(__name__)
 
@@ -13,7 +17,7 @@ def stream_name(symbol: str, interval: str) -> str:
     # Binance expects lowercase in stream names
     return f"{symbol.lower()}@kline_{interval}"
 
-async def listen_one(symbol: str, interval: str):
+async def listen_one(symbol: str, interval: str, cache: LiveCandleCache | None = None):
     url = f"{BINANCE_WS_URL}/{stream_name(symbol, interval)}"
     exchange = "binance"
 
@@ -25,6 +29,9 @@ async def listen_one(symbol: str, interval: str):
                     data = json.loads(msg)
                     k = data.get("k", {})
                     is_final = bool(k.get("x", False))
+                    metrics.WS_MESSAGES.inc(symbol=symbol, interval=interval, final=is_final)
+                    if cache is not None:
+                        cache.update_from_kline(symbol, interval, k, event_ms=data.get("E"))
                     if not is_final:
                         continue  # only store closed candles
 
@@ -51,17 +58,93 @@ async def listen_one(symbol: str, interval: str):
                         upsert_candle(conn, row)
                         touch_metadata(conn, exchange, symbol, interval, open_time=open_time, ws_seen=True)
                         conn.commit()
+                    if "E" in data:
+                        metrics.WS_COMMIT_SECONDS.observe(
+                            time.time() - int(data["E"]) / 1000.0, symbol=symbol, interval=interval
+                        )
 
         except Exception as e:
+            metrics.WS_RECONNECTS.inc(symbol=symbol, interval=interval)
             log.warning("WS error for %s %s: %s. Reconnecting soon...", symbol, interval, e)
             await asyncio.sleep(5)
 
-async def main():
+def combined_stream_url(streams: list[str]) -> str:
+    """Combined-stream endpoint (/stream?streams=a/b/...) next to BINANCE_WS_URL's /ws."""
+    base = BINANCE_WS_URL[:-3] if BINANCE_WS_URL.endswith("/ws") else BINANCE_WS_URL
+    return f"{base}/stream?streams={'/'.join(streams)}"
+
+async def _listen_combined(pairs: list[tuple[str, str]], on_kline):
+    by_stream = {stream_name(s, itv): (s, itv) for s, itv in pairs}
+    url = combined_stream_url(list(by_stream))
+
+    while True:
+        try:
+            log.info("WS connect: %d streams", len(by_stream))
+            async with websockets.connect(url, ping_interval=20, ping_timeout=60, max_size=None) as ws:
+                async for msg in ws:
+                    envelope = json.loads(msg)
+                    key = by_stream.get(envelope.get("stream"))
+                    if key is None:
+                        continue
+                    data = envelope.get("data", {})
+                    k = data.get("k", {})
+                    metrics.WS_MESSAGES.inc(symbol=key[0], interval=key[1], final=bool(k.get("x", False)))
+                    try:
+                        on_kline(key[0], key[1], k, data.get("E"))
+                    except Exception:
+                        # A consumer bug must not tear down the shared connection
+                        log.exception("on_kline failed for %s %s", *key)
+
+        except Exception as e:
+            for s, itv in pairs:
+                metrics.WS_RECONNECTS.inc(symbol=s, interval=itv)
+            log.warning("WS error for %d combined streams: %s. Reconnecting soon...", len(pairs), e)
+            await asyncio.sleep(5)
+
+async def listen_many(pairs: list[tuple[str, str]], on_kline, streams_per_conn: int = 200):
+    """
+    Subscribe to many (symbol, interval) kline streams over combined-stream connections
+    and call on_kline(symbol, interval, k, event_ms) for every message, final or not.
+    on_kline runs in the event loop, so it must not block.
+    """
+    chunks = [pairs[i:i + streams_per_conn] for i in range(0, len(pairs), streams_per_conn)]
+    await asyncio.gather(*(_listen_combined(chunk, on_kline) for chunk in chunks))
+
+def _update_freshness():
+    with get_conn() as conn:
+        metrics.update_stream_freshness(conn)
+
+async def report_freshness(every_s: float = 15.0):
+    """Periodically refresh the per-stream lag gauge from market.api_metadata (off the event loop)."""
+    while True:
+        try:
+            await asyncio.to_thread(_update_freshness)
+        except Exception as e:
+            log.warning("Freshness update failed: %s", e)
+        await asyncio.sleep(every_s)
+
+async def run(symbols: list[str], intervals: list[str]):
     tasks = []
-    for s in SYMBOLS:
-        for itv in INTERVALS:
-            tasks.append(asyncio.create_task(listen_one(s, itv)))
-    await asyncio.gather(*tasks)
+    if metrics.start_http_server():
+        tasks.append(asyncio.create_task(report_freshness()))
+    # Forming + recent closed bars for readers in other processes (LIVE_CACHE_NAME)
+    keys = [series_key(s, itv) for s in symbols for itv in intervals]
+    cache = LiveCandleCache.create(keys, capacity=LIVE_CACHE_BARS, name=LIVE_CACHE_NAME)
+    try:
+        for s in symbols:
+            for itv in intervals:
+                tasks.append(asyncio.create_task(listen_one(s, itv, cache)))
+        await asyncio.gather(*tasks)
+    finally:
+        cache.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live Spot klines over WebSocket into market.candles_raw")
+    parser.add_argument("--symbols", type=lambda s: s.split(","), default=SYMBOLS)
+    parser.add_argument("--intervals", type=lambda s: s.split(","), default=INTERVALS)
+    args = parser.parse_args()
+    asyncio.run(run(args.symbols, args.intervals))
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    main()
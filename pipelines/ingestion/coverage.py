@@ -0,0 +1,336 @@
+"""
+Coverage catalog: per-day row counts and per-series ranges of the candle tables
+(sql/006_candle_coverage.sql), so date-range, completeness and resume lookups read a
+few catalog rows instead of scanning market.futures_candles / market.candles_raw.
+
+The writers (upsert_klines, upsert_candle(s), the REST backfill) call refresh() for
+the open_time span they just wrote, in the same transaction; the first write to a
+series without a summary row catalogs its whole stored history. Existing history can
+also be cataloged up front with:
+
+    python -m pipelines.ingestion.coverage rebuild [--table candles_raw] [--symbols ...]
+"""
+from __future__ import annotations
+
+import argparse
+from datetime import date, datetime, timedelta, timezone
+from typing import TYPE_CHECKING
+
+import psycopg
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+from pipelines.common.logging import get_logger
+from pipelines.common.settings import POSTGRES_DSN, require
+from pipelines.ingestion.intervals import interval_to_ms
+
+log = get_logger(__name__)
+
+# source table -> (qualified name, column holding the market_type / exchange key)
+_TABLES = {
+    "futures_candles": ("market.futures_candles", "market_type"),
+    "candles_raw": ("market.candles_raw", "exchange"),
+}
+
+_SERIES = "source = %(source)s AND key = %(key)s AND symbol = %(symbol)s AND interval = %(interval)s"
+
+
+def expected_per_day(interval: str) -> int:
+    return max(86_400_000 // interval_to_ms(interval), 1)
+
+
+def _day_start(d: date) -> datetime:
+    return datetime(d.year, d.month, d.day, tzinfo=timezone.utc)
+
+
+def _as_day(t) -> date:
+    if isinstance(t, datetime):
+        return t.astimezone(timezone.utc).date() if t.tzinfo else t.date()
+    return t
+
+
+# Recount the stored rows of the days in [lo, hi) for one series
+_UPSERT_DAYS = """
+    INSERT INTO market.candle_coverage_days
+      (source, key, symbol, interval, day, rows, expected, first_open, last_open)
+    SELECT %(source)s, %(key)s, %(symbol)s, %(interval)s, (open_time AT TIME ZONE 'UTC')::date,
+           count(*), %(expected)s, min(open_time), max(open_time)
+    FROM {qualified}
+    WHERE {key_col} = %(key)s AND symbol = %(symbol)s AND interval = %(interval)s
+      AND open_time >= %(lo)s AND open_time < %(hi)s
+    GROUP BY 5
+    ON CONFLICT (source, key, symbol, interval, day)
+    DO UPDATE SET rows = EXCLUDED.rows, expected = EXCLUDED.expected,
+      first_open = EXCLUDED.first_open, last_open = EXCLUDED.last_open, updated_at = now()
+"""
+
+
+def _params(source: str, key: str, symbol: str, interval: str, start, end) -> dict:
+    d0, d1 = _as_day(start), _as_day(end)
+    return {
+        "source": source,
+        "key": key,
+        "symbol": symbol,
+        "interval": interval,
+        "expected": expected_per_day(interval),
+        "lo": _day_start(d0),
+        "hi": _day_start(d1 + timedelta(days=1)),
+    }
+
+
+def _lock_series(conn: psycopg.Connection, params: dict) -> None:
+    """Serialize catalog updates of one series until the transaction ends (even before it has rows)."""
+    conn.execute(
+        "SELECT pg_advisory_xact_lock(hashtextextended(concat_ws('|', %(source)s::text, %(key)s::text,"
+        " %(symbol)s::text, %(interval)s::text), 0))",
+        params,
+    )
+
+
+def refresh(conn: psycopg.Connection, source: str, key: str, symbol: str, interval: str, start, end) -> None:
+    """
+    Recount the UTC days spanned by [start, end] (open_time datetimes or dates) and
+    apply the change in those days to the series summary; a series with no summary yet
+    is rebuilt whole instead, so it is never cataloged as just the days written. Does
+    not commit.
+    """
+    qualified, key_col = _TABLES[source]
+    params = _params(source, key, symbol, interval, start, end)
+    # Serialize refreshes of one series, so the old day counts below are current
+    _lock_series(conn, params)
+    if conn.execute(f"SELECT 1 FROM market.candle_coverage WHERE {_SERIES}", params).fetchone() is None:
+        rebuild(conn, source, key, symbol, interval)
+        return
+    conn.execute(
+        f"""
+        WITH old AS (
+          SELECT day, rows, expected FROM market.candle_coverage_days
+          WHERE {_SERIES} AND day >= %(lo)s::date AND day < %(hi)s::date
+        ), new AS (
+          {_UPSERT_DAYS.format(qualified=qualified, key_col=key_col)}
+          RETURNING day, rows, expected, first_open, last_open
+        )
+        INSERT INTO market.candle_coverage AS c
+          (source, key, symbol, interval, first_open, last_open, rows, days, complete_days)
+        SELECT %(source)s, %(key)s, %(symbol)s, %(interval)s, min(n.first_open), max(n.last_open),
+               sum(n.rows - coalesce(o.rows, 0)),
+               count(*) FILTER (WHERE o.day IS NULL),
+               count(*) FILTER (WHERE n.rows >= n.expected) - count(*) FILTER (WHERE o.rows >= o.expected)
+        FROM new n LEFT JOIN old o USING (day)
+        HAVING count(*) > 0
+        ON CONFLICT (source, key, symbol, interval)
+        DO UPDATE SET first_open = LEAST(c.first_open, EXCLUDED.first_open),
+          last_open = GREATEST(c.last_open, EXCLUDED.last_open),
+          rows = c.rows + EXCLUDED.rows, days = c.days + EXCLUDED.days,
+          complete_days = c.complete_days + EXCLUDED.complete_days, updated_at = now()
+        """,
+        params,
+    )
+
+
+def _refresh_summary(conn: psycopg.Connection, params: dict) -> None:
+    """Recompute the series summary from all of its day rows."""
+    conn.execute(
+        f"""
+        INSERT INTO market.candle_coverage
+          (source, key, symbol, interval, first_open, last_open, rows, days, complete_days)
+        SELECT %(source)s, %(key)s, %(symbol)s, %(interval)s, min(first_open), max(last_open),
+               sum(rows), count(*), count(*) FILTER (WHERE rows >= expected)
+        FROM market.candle_coverage_days
+        WHERE {_SERIES}
+        HAVING count(*) > 0
+        ON CONFLICT (source, key, symbol, interval)
+        DO UPDATE SET first_open = EXCLUDED.first_open, last_open = EXCLUDED.last_open,
+          rows = EXCLUDED.rows, days = EXCLUDED.days, complete_days = EXCLUDED.complete_days,
+          updated_at = now()
+        """,
+        params,
+    )
+
+
+def rebuild(conn: psycopg.Connection, source: str, key: str, symbol: str, interval: str) -> None:
+    """Catalog a series' whole stored history (one scan of its rows). Does not commit."""
+    qualified, key_col = _TABLES[source]
+    series = {"source": source, "key": key, "symbol": symbol, "interval": interval}
+    _lock_series(conn, series)
+    row = conn.execute(
+        f"""
+        SELECT min(open_time), max(open_time) FROM {qualified}
+        WHERE {key_col} = %s AND symbol = %s AND interval = %s
+        """,
+        (key, symbol, interval),
+    ).fetchone()
+    conn.execute(f"DELETE FROM market.candle_coverage_days WHERE {_SERIES}", series)
+    if row[0] is None:
+        conn.execute(f"DELETE FROM market.candle_coverage WHERE {_SERIES}", series)
+        return
+    params = _params(source, key, symbol, interval, row[0], row[1])
+    conn.execute(_UPSERT_DAYS.format(qualified=qualified, key_col=key_col), params)
+    _refresh_summary(conn, params)
+
+
+def list_stored_series(conn: psycopg.Connection, source: str) -> list[tuple[str, str, str]]:
+    """(key, symbol, interval) of every series in a candle table (loose index scan over the PK)."""
+    qualified, key_col = _TABLES[source]
+    return [
+        tuple(r)
+        for r in conn.execute(
+            f"""
+            WITH RECURSIVE s AS (
+              (SELECT {key_col} AS k, symbol, interval FROM {qualified} ORDER BY 1, 2, 3 LIMIT 1)
+              UNION ALL
+              SELECT n.* FROM s, LATERAL (
+                SELECT {key_col}, symbol, interval FROM {qualified}
+                WHERE ({key_col}, symbol, interval) > (s.k, s.symbol, s.interval)
+                ORDER BY 1, 2, 3 LIMIT 1
+              ) n
+            )
+            SELECT * FROM s
+            """
+        ).fetchall()
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Lookups
+# ---------------------------------------------------------------------------
+
+def _series(source: str, key: str, symbol: str, interval: str, **extra) -> dict:
+    return {"source": source, "key": key, "symbol": symbol, "interval": interval, **extra}
+
+
+def date_range(
+    conn: psycopg.Connection, source: str, key: str, symbol: str, interval: str
+) -> tuple[date, date] | None:
+    """First and last open_time dates of the series, or None if it is not cataloged."""
+    row = conn.execute(
+        f"SELECT first_open, last_open FROM market.candle_coverage WHERE {_SERIES}",
+        _series(source, key, symbol, interval),
+    ).fetchone()
+    if row is None:
+        return None
+    return _as_day(row[0]), _as_day(row[1])
+
+
+def day_counts(
+    conn: psycopg.Connection,
+    source: str,
+    key: str,
+    symbol: str,
+    interval: str,
+    start: date | None = None,
+    end: date | None = None,
+) -> pd.DataFrame:
+    """Cataloged days in [start, end]: day, rows, expected, complete (days with no rows are absent)."""
+    import pandas as pd  # the writers import this module and do not need pandas
+
+    sql = f"SELECT day, rows, expected, rows >= expected AS complete FROM market.candle_coverage_days WHERE {_SERIES}"
+    params = _series(source, key, symbol, interval)
+    if start is not None:
+        sql += " AND day >= %(start)s"
+        params["start"] = start
+    if end is not None:
+        sql += " AND day <= %(end)s"
+        params["end"] = end
+    rows = conn.execute(sql + " ORDER BY day", params).fetchall()
+    return pd.DataFrame(rows, columns=["day", "rows", "expected", "complete"])
+
+
+def covered_ranges(
+    conn: psycopg.Connection, source: str, key: str, symbol: str, interval: str, *, complete_only: bool = True
+) -> list[tuple[date, date]]:
+    """Maximal runs of consecutive (complete) days as inclusive (first_day, last_day) pairs."""
+    where = _SERIES + (" AND rows >= expected" if complete_only else "")
+    rows = conn.execute(
+        f"""
+        SELECT min(day), max(day)
+        FROM (
+          SELECT day, day - (row_number() OVER (ORDER BY day))::int AS island
+          FROM market.candle_coverage_days
+          WHERE {where}
+        ) d
+        GROUP BY island
+        ORDER BY 1
+        """,
+        _series(source, key, symbol, interval),
+    ).fetchall()
+    return [(r[0], r[1]) for r in rows]
+
+
+def missing_days(
+    conn: psycopg.Connection, source: str, key: str, symbol: str, interval: str, start: date, end: date
+) -> list[date]:
+    """Days in [start, end] that are absent or incomplete."""
+    complete = set(
+        d for (d,) in conn.execute(
+            f"""
+            SELECT day FROM market.candle_coverage_days
+            WHERE {_SERIES} AND day BETWEEN %(start)s AND %(end)s AND rows >= expected
+            """,
+            _series(source, key, symbol, interval, start=start, end=end),
+        ).fetchall()
+    )
+    out, d = [], start
+    while d <= end:
+        if d not in complete:
+            out.append(d)
+        d += timedelta(days=1)
+    return out
+
+
+def row_count(
+    conn: psycopg.Connection,
+    source: str,
+    key: str,
+    symbol: str,
+    interval: str,
+    start: date | None = None,
+    end: date | None = None,
+) -> int | None:
+    """Stored rows on the days [start, end] from the catalog, or None if the series is not cataloged."""
+    if date_range(conn, source, key, symbol, interval) is None:
+        return None
+    sql = f"SELECT coalesce(sum(rows), 0) FROM market.candle_coverage_days WHERE {_SERIES}"
+    params = _series(source, key, symbol, interval)
+    if start is not None:
+        sql += " AND day >= %(start)s"
+        params["start"] = start
+    if end is not None:
+        sql += " AND day <= %(end)s"
+        params["end"] = end
+    return int(conn.execute(sql, params).fetchone()[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Candle coverage catalog")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_rebuild = sub.add_parser("rebuild", help="catalog stored history from the candle tables")
+    p_rebuild.add_argument("--table", choices=list(_TABLES), default="futures_candles")
+    p_rebuild.add_argument("--symbols", type=lambda s: s.split(","), default=None, help="default: every stored series")
+    p_show = sub.add_parser("show", help="covered day ranges of one series")
+    p_show.add_argument("--table", choices=list(_TABLES), default="futures_candles")
+    p_show.add_argument("--key", default="um", help="market_type (futures_candles) or exchange (candles_raw)")
+    p_show.add_argument("--symbol", required=True)
+    p_show.add_argument("--interval", required=True)
+    args = parser.parse_args()
+
+    with psycopg.connect(POSTGRES_DSN or require("POSTGRES_DSN")) as conn:
+        if args.cmd == "rebuild":
+            series = list_stored_series(conn, args.table)
+            if args.symbols:
+                series = [s for s in series if s[1] in args.symbols]
+            for key, symbol, interval in series:
+                rebuild(conn, args.table, key, symbol, interval)
+                conn.commit()
+                log.info("Cataloged %s %s %s %s: %s", args.table, key, symbol, interval,
+                         date_range(conn, args.table, key, symbol, interval))
+        else:
+            for first, last in covered_ranges(conn, args.table, args.key, args.symbol, args.interval):
+                log.info("%s .. %s (%d days)", first, last, (last - first).days + 1)
+            for first, last in covered_ranges(conn, args.table, args.key, args.symbol, args.interval, complete_only=False):
+                log.info("any rows: %s .. %s", first, last)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 import json
 from contextlib import contextmanager
+from dataclasses import dataclass
 import psycopg
 
-from pipelines.common.settings import require
+from pipelines.common import metrics
+from pipelines.common.settings import CANDLE_NOTIFY_CHANNEL, require
+from pipelines.ingestion import coverage
 
 def pg_dsn() -> str:
     return require("POSTGRES_DSN")
@@ -12,9 +15,49 @@ def get_conn():
     with psycopg.connect(pg_dsn()) as conn:
         yield conn
 
-def upsert_candle(conn, row: dict) -> None:
-    sql = """
-    INSERT INTO market.candles_raw
+def notify_candles(conn, table: str, key: str, symbol: str, interval: str, max_open_time) -> None:
+    """
+    Announce new/updated candles on CANDLE_NOTIFY_CHANNEL. NOTIFY is transactional:
+    subscribers see it only after the writer commits, so call it once per batch, before commit.
+    """
+    payload = {
+        "table": table,
+        "key": key,
+        "symbol": symbol,
+        "interval": interval,
+        "max_open_ms": int(max_open_time.timestamp() * 1000),
+    }
+    conn.execute("SELECT pg_notify(%s, %s)", (CANDLE_NOTIFY_CHANNEL, json.dumps(payload)))
+
+@dataclass
+class UpsertStats:
+    """Outcome of an upsert: new rows, rows whose values changed, and rows left alone as identical."""
+
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.inserted + self.updated + self.skipped
+
+    @property
+    def changed(self) -> int:
+        return self.inserted + self.updated
+
+    def __add__(self, other: "UpsertStats") -> "UpsertStats":
+        return UpsertStats(self.inserted + other.inserted, self.updated + other.updated, self.skipped + other.skipped)
+
+    def __str__(self) -> str:
+        return f"+{self.inserted} ~{self.updated} ={self.skipped}"
+
+    def record(self, table: str) -> None:
+        metrics.DB_UPSERT_OUTCOMES.inc(self.inserted, table=table, outcome="inserted")
+        metrics.DB_UPSERT_OUTCOMES.inc(self.updated, table=table, outcome="updated")
+        metrics.DB_UPSERT_OUTCOMES.inc(self.skipped, table=table, outcome="skipped")
+
+_CANDLES_RAW_UPSERT = """
+    INSERT INTO market.candles_raw AS c
     (exchange, symbol, interval, open_time, close_time, open, high, low, close, volume, is_final)
     VALUES
     (%(exchange)s, %(symbol)s, %(interval)s, %(open_time)s, %(close_time)s,
@@ -28,21 +71,94 @@ def upsert_candle(conn, row: dict) -> None:
       close = EXCLUDED.close,
       volume = EXCLUDED.volume,
       is_final = EXCLUDED.is_final,
-      ingested_at = now();
+      ingested_at = now()
+    {where}
+    RETURNING (xmax = 0) AS inserted
+"""
+# Leave identical rows alone: no new tuple version, no WAL, ingested_at keeps the last change
+_CANDLES_RAW_CHANGED = """
+    WHERE (c.close_time, c.open, c.high, c.low, c.close, c.volume, c.is_final)
+      IS DISTINCT FROM (EXCLUDED.close_time, EXCLUDED.open, EXCLUDED.high, EXCLUDED.low,
+                        EXCLUDED.close, EXCLUDED.volume, EXCLUDED.is_final)
+"""
+
+def _candles_raw_sql(skip_unchanged: bool) -> str:
+    return _CANDLES_RAW_UPSERT.format(where=_CANDLES_RAW_CHANGED if skip_unchanged else "")
+
+def upsert_candle(
+    conn, row: dict, notify: bool = True, track_coverage: bool = True, skip_unchanged: bool = True
+) -> UpsertStats:
+    with metrics.DB_UPSERT_SECONDS.time(table="candles_raw"):
+        returned = conn.execute(_candles_raw_sql(skip_unchanged), row).fetchone()
+        if returned is None:
+            stats = UpsertStats(skipped=1)
+        else:
+            stats = UpsertStats(inserted=1) if returned[0] else UpsertStats(updated=1)
+        if track_coverage and stats.inserted:
+            coverage.refresh(
+                conn, "candles_raw", row["exchange"], row["symbol"], row["interval"], row["open_time"], row["open_time"]
+            )
+        if notify and stats.changed:
+            notify_candles(conn, "candles_raw", row["exchange"], row["symbol"], row["interval"], row["open_time"])
+    metrics.DB_ROWS.inc(table="candles_raw")
+    stats.record("candles_raw")
+    return stats
+
+def upsert_candles(conn, rows: list[dict], notify: bool = True, skip_unchanged: bool = True) -> UpsertStats:
+    """
+    Batched upsert_candle(): one executemany for all rows, then one api_metadata touch,
+    coverage refresh and notification per series. The caller commits.
     """
-    conn.execute(sql, row)
+    if not rows:
+        return UpsertStats()
+    spans: dict[tuple, list] = {}
+    for r in rows:
+        key = (r["exchange"], r["symbol"], r["interval"])
+        span = spans.setdefault(key, [r["open_time"], r["open_time"]])
+        span[0] = min(span[0], r["open_time"])
+        span[1] = max(span[1], r["open_time"])
+    stats = UpsertStats()
+    inserted_series, changed_series = set(), set()
+    with metrics.DB_UPSERT_SECONDS.time(table="candles_raw"):
+        with conn.cursor() as cur:
+            cur.executemany(_candles_raw_sql(skip_unchanged), rows, returning=True)
+            for r in rows:
+                returned = cur.fetchone()
+                key = (r["exchange"], r["symbol"], r["interval"])
+                if returned is None:
+                    stats.skipped += 1
+                elif returned[0]:
+                    stats.inserted += 1
+                    inserted_series.add(key)
+                    changed_series.add(key)
+                else:
+                    stats.updated += 1
+                    changed_series.add(key)
+                cur.nextset()
+        for key, (first, last) in spans.items():
+            exchange, symbol, interval = key
+            touch_metadata(conn, exchange, symbol, interval, open_time=last, ws_seen=True)
+            if key in inserted_series:
+                coverage.refresh(conn, "candles_raw", exchange, symbol, interval, first, last)
+            if notify and key in changed_series:
+                notify_candles(conn, "candles_raw", exchange, symbol, interval, last)
+    metrics.DB_ROWS.inc(len(rows), table="candles_raw")
+    stats.record("candles_raw")
+    return stats
 
 def touch_metadata(conn, exchange: str, symbol: str, interval: str, open_time=None, ws_seen: bool = False):
     sql = """
-    INSERT INTO market.api_metadata (exchange, symbol, interval, last_final_candle_open_time, last_websocket_seen_at, status)
+    INSERT INTO market.api_metadata AS m (exchange, symbol, interval, last_final_candle_open_time, last_websocket_seen_at, status)
     VALUES (%s, %s, %s, %s, CASE WHEN %s THEN now() ELSE NULL END, 'ok')
     ON CONFLICT (exchange, symbol, interval)
     DO UPDATE SET
-      last_final_candle_open_time = COALESCE(EXCLUDED.last_final_candle_open_time, market.api_metadata.last_final_candle_open_time),
-      last_websocket_seen_at = CASE WHEN %s THEN now() ELSE market.api_metadata.last_websocket_seen_at END,
-      updated_at = now();
+      last_final_candle_open_time = GREATEST(EXCLUDED.last_final_candle_open_time, m.last_final_candle_open_time),
+      last_websocket_seen_at = CASE WHEN %s THEN now() ELSE m.last_websocket_seen_at END,
+      updated_at = now()
+    WHERE %s OR GREATEST(EXCLUDED.last_final_candle_open_time, m.last_final_candle_open_time)
+                IS DISTINCT FROM m.last_final_candle_open_time;
     """
-    conn.execute(sql, (exchange, symbol, interval, open_time, ws_seen, ws_seen))
+    conn.execute(sql, (exchange, symbol, interval, open_time, ws_seen, ws_seen, ws_seen))
 
 def log_quality_issue(conn, exchange: str, symbol: str, interval: str, issue_type: str, open_time=None, details: dict | None = None):
     conn.execute(
@@ -0,0 +1,273 @@
+"""
+In-memory live candle store: per symbol/interval, the bar currently forming plus a
+ring buffer of the last N closed bars, updated on every WebSocket kline tick.
+
+The store is one block of numpy arrays, optionally placed in a named shared-memory
+segment so other processes (signal jobs, the UI) can read it without touching Postgres:
+
+    # writer (the WS listener, LIVE_CACHE_NAME=live_candles)
+    cache = LiveCandleCache.create(["BTCUSDT|1m", ...], capacity=500, name="live_candles")
+    cache.update_from_kline("BTCUSDT", "1m", msg["k"], event_ms=msg["E"])
+
+    # reader, any process
+    cache = LiveCandleCache.attach("live_candles")
+    bar = cache.forming("BTCUSDT", "1m")      # Bar or None
+    df = cache.closed_frame("BTCUSDT", "1m", 100)
+
+There is a single writer per segment. Each series has a sequence counter (seqlock):
+the writer makes it odd while updating and even when done; readers retry until they
+copy a consistent snapshot, so they never block the writer.
+"""
+from __future__ import annotations
+
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+from pipelines.common.logging import get_logger
+
+log = get_logger(__name__)
+
+_MAGIC = 0x4C495645_43414348  # "LIVECACH"
+_KEY_LEN = 32
+_HEADER_DTYPE = np.dtype([("magic", "u8"), ("n_series", "u8"), ("capacity", "u8")])
+_STATE_DTYPE = np.dtype([("seq", "u8"), ("head", "u8"), ("count", "u8")])
+BAR_DTYPE = np.dtype(
+    [
+        ("open_ms", "i8"),
+        ("close_ms", "i8"),
+        ("event_ms", "i8"),
+        ("open", "f8"),
+        ("high", "f8"),
+        ("low", "f8"),
+        ("close", "f8"),
+        ("volume", "f8"),
+        ("quote_volume", "f8"),
+        ("num_trades", "i8"),
+        ("is_final", "?"),
+    ],
+    align=True,
+)
+_READ_RETRIES = 1000
+
+
+class Bar:
+    """One kline, as returned by readers (open_ms == 0 never appears: that marks an empty slot)."""
+
+    __slots__ = BAR_DTYPE.names
+
+    def __init__(self, open_ms, close_ms, event_ms, open, high, low, close, volume, quote_volume, num_trades, is_final):
+        self.open_ms = int(open_ms)
+        self.close_ms = int(close_ms)
+        self.event_ms = int(event_ms)
+        self.open = float(open)
+        self.high = float(high)
+        self.low = float(low)
+        self.close = float(close)
+        self.volume = float(volume)
+        self.quote_volume = float(quote_volume)
+        self.num_trades = int(num_trades)
+        self.is_final = bool(is_final)
+
+    @classmethod
+    def from_kline(cls, k: dict, event_ms: int | None = None) -> "Bar":
+        """From the "k" object of a Binance kline event."""
+        return cls(
+            k["t"], k["T"], event_ms if event_ms is not None else k["T"],
+            k["o"], k["h"], k["l"], k["c"], k["v"], k.get("q", 0.0), k.get("n", 0), k.get("x", False),
+        )
+
+    def as_tuple(self) -> tuple:
+        return tuple(getattr(self, f) for f in self.__slots__)
+
+    def __repr__(self):
+        state = "final" if self.is_final else "forming"
+        return f"Bar({self.open_ms}, o={self.open}, h={self.high}, l={self.low}, c={self.close}, v={self.volume}, {state})"
+
+
+def series_key(symbol: str, interval: str) -> str:
+    return f"{symbol.upper()}|{interval}"
+
+
+def _layout(n_series: int, capacity: int) -> list[tuple[str, np.dtype, tuple, int]]:
+    """(name, dtype, shape, offset) of every array in the block, 64-byte aligned."""
+    parts = [
+        ("header", _HEADER_DTYPE, ()),
+        ("keys", np.dtype(f"S{_KEY_LEN}"), (n_series,)),
+        ("state", _STATE_DTYPE, (n_series,)),
+        ("forming", BAR_DTYPE, (n_series,)),
+        ("ring", BAR_DTYPE, (n_series, capacity)),
+    ]
+    out, offset = [], 0
+    for name, dtype, shape in parts:
+        out.append((name, dtype, shape, offset))
+        offset += dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+        offset = (offset + 63) // 64 * 64
+    out.append(("_end", None, (), offset))
+    return out
+
+
+def _views(buf, n_series: int, capacity: int) -> dict[str, np.ndarray]:
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+        for name, dtype, shape, offset in _layout(n_series, capacity)
+        if dtype is not None
+    }
+
+
+class LiveCandleCache:
+    def __init__(self, buf, *, shm: shared_memory.SharedMemory | None = None, owner: bool = False):
+        header = np.ndarray((), dtype=_HEADER_DTYPE, buffer=buf)
+        if int(header["magic"]) != _MAGIC:
+            raise ValueError("Not a live candle cache segment")
+        self.n_series = int(header["n_series"])
+        self.capacity = int(header["capacity"])
+        v = _views(buf, self.n_series, self.capacity)
+        self._seq, self._head, self._count = v["state"]["seq"], v["state"]["head"], v["state"]["count"]
+        self._forming, self._ring = v["forming"], v["ring"]
+        self._index = {k.decode(): i for i, k in enumerate(v["keys"]) if k}
+        self._shm = shm
+        self._owner = owner
+
+    # ---------------------------------------------------------------- setup
+    @classmethod
+    def create(cls, keys: list[str], capacity: int = 500, name: str | None = None) -> "LiveCandleCache":
+        """
+        New store for the given series keys ("SYMBOL|interval"). With a name it lives in
+        shared memory (replacing a stale segment of the same name); otherwise in-process.
+        """
+        n = len(keys)
+        size = _layout(n, capacity)[-1][3]
+        shm = None
+        if name:
+            try:
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink()
+                log.warning("Replaced stale live cache segment %s", name)
+            except FileNotFoundError:
+                pass
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            buf = shm.buf
+        else:
+            buf = bytearray(size)
+        v = _views(buf, n, capacity)
+        v["keys"][:] = [k.encode()[:_KEY_LEN] for k in keys]
+        v["state"][:] = 0
+        v["forming"][:] = np.zeros((), dtype=BAR_DTYPE)
+        v["ring"][:] = np.zeros((), dtype=BAR_DTYPE)
+        header = np.ndarray((), dtype=_HEADER_DTYPE, buffer=buf)
+        header["n_series"], header["capacity"] = n, capacity
+        header["magic"] = _MAGIC  # last: readers only accept a fully initialised block
+        return cls(buf, shm=shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "LiveCandleCache":
+        """Read-only view of a store created by another process."""
+        shm = shared_memory.SharedMemory(name=name)
+        # The creating process owns the segment; don't let this process's tracker unlink it
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm.buf, shm=shm)
+
+    def close(self) -> None:
+        """Release the mapping; the creator also removes the shared-memory segment."""
+        if self._shm is None:
+            return
+        self._seq = self._head = self._count = self._forming = self._ring = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def keys(self) -> list[str]:
+        return list(self._index)
+
+    def _slot(self, symbol: str, interval: str) -> int:
+        try:
+            return self._index[series_key(symbol, interval)]
+        except KeyError:
+            raise KeyError(f"{symbol} {interval} is not in the live cache") from None
+
+    # --------------------------------------------------------------- writer
+    def update(self, symbol: str, interval: str, bar: Bar) -> None:
+        """Apply one tick: a non-final bar replaces the forming one; a final bar is appended to the ring."""
+        i = self._slot(symbol, interval)
+        self._seq[i] += 1
+        if bar.is_final:
+            head, count = int(self._head[i]), int(self._count[i])
+            last = (head - 1) % self.capacity
+            # A repeated final message for the same bar overwrites instead of appending
+            pos = last if count and self._ring["open_ms"][i, last] == bar.open_ms else head
+            self._ring[i, pos] = bar.as_tuple()
+            if pos == head:
+                self._head[i] = (head + 1) % self.capacity
+                self._count[i] = min(count + 1, self.capacity)
+            if self._forming["open_ms"][i] <= bar.open_ms:
+                self._forming["open_ms"][i] = 0
+        else:
+            self._forming[i] = bar.as_tuple()
+        self._seq[i] += 1
+
+    def update_from_kline(self, symbol: str, interval: str, k: dict, event_ms: int | None = None) -> Bar:
+        bar = Bar.from_kline(k, event_ms)
+        self.update(symbol, interval, bar)
+        return bar
+
+    # -------------------------------------------------------------- readers
+    def _read(self, i: int, fn):
+        for _ in range(_READ_RETRIES):
+            seq = int(self._seq[i])
+            if seq & 1:
+                time.sleep(0)
+                continue
+            out = fn()
+            if int(self._seq[i]) == seq:
+                return out
+        raise RuntimeError("Live cache writer did not settle")
+
+    def forming(self, symbol: str, interval: str) -> Bar | None:
+        """The bar currently forming (latest non-final tick), if any."""
+        i = self._slot(symbol, interval)
+        row = self._read(i, lambda: self._forming[i].copy())
+        return Bar(*row.tolist()) if row["open_ms"] else None
+
+    def closed(self, symbol: str, interval: str, n: int | None = None) -> np.ndarray:
+        """The last n closed bars (oldest first) as a BAR_DTYPE array copy."""
+        i = self._slot(symbol, interval)
+
+        def copy():
+            head, count = int(self._head[i]), int(self._count[i])
+            k = count if n is None else min(n, count)
+            idx = (head - k + np.arange(k)) % self.capacity
+            return self._ring[i, idx]
+
+        return self._read(i, copy)
+
+    def last_closed(self, symbol: str, interval: str) -> Bar | None:
+        rows = self.closed(symbol, interval, 1)
+        return Bar(*rows[0].tolist()) if len(rows) else None
+
+    def closed_frame(self, symbol: str, interval: str, n: int | None = None, *, include_forming: bool = False) -> pd.DataFrame:
+        """Closed bars (optionally followed by the forming one) with UTC open_time/close_time columns."""
+        import pandas as pd  # readers only; the WS writer does not need it
+
+        rows = self.closed(symbol, interval, n)
+        if include_forming:
+            bar = self.forming(symbol, interval)
+            if bar is not None:
+                rows = np.concatenate([rows, np.array([bar.as_tuple()], dtype=BAR_DTYPE)])
+        df = pd.DataFrame(rows)
+        df.insert(0, "open_time", pd.to_datetime(df["open_ms"], unit="ms", utc=True))
+        df.insert(1, "close_time", pd.to_datetime(df["close_ms"], unit="ms", utc=True))
+        return df.drop(columns=["open_ms", "close_ms"])
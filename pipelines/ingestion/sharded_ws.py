@@ -0,0 +1,310 @@
+"""
+Sharded live ingestion: N worker processes, on one or many hosts, split the
+SYMBOLS × INTERVALS kline streams between them.
+
+    python -m pipelines.ingestion.sharded_ws                 # one worker; start more anywhere
+    python -m pipelines.ingestion.sharded_ws --local 4       # four worker processes on this host
+
+Membership is a lease table (market.ws_workers, sql/005_ws_workers.sql): every worker
+refreshes its row each --heartbeat seconds and survivors delete rows older than --lease
+(terminating the dead worker's Postgres session). Each worker computes the same
+stream -> worker assignment from the live member list (rendezvous hashing, so a join
+or leave only moves the affected worker's share) and takes ownership of its streams
+with session-level advisory locks on its control connection. A stream is written by
+whoever holds its lock; a newcomer simply retries until the previous owner has let go.
+
+Each worker keeps its streams on one combined WebSocket connection (reconnected when
+its share changes) and writes closed candles in batches: one executemany, one
+api_metadata touch and one NOTIFY per series per flush. Candles that close while a
+stream is being handed over are left to the gap scanner / repair job.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timezone
+
+import psycopg
+
+from pipelines.common import metrics
+from pipelines.common.logging import get_logger
+from pipelines.common.settings import EXCHANGE, INTERVALS, POSTGRES_DSN, SYMBOLS, require
+from pipelines.ingestion.binance_ws import listen_many, stream_name
+from pipelines.ingestion.db import upsert_candles
+
+log = get_logger(__name__)
+
+OWNED_STREAMS = metrics.gauge("ws_owned_streams", "Kline streams owned by this shard worker", ["worker"])
+SHARD_MEMBERS = metrics.gauge("ws_shard_members", "Live shard workers seen at the last rebalance")
+BATCH_ROWS = metrics.histogram(
+    "ws_write_batch_rows", "Closed candles per batched write", buckets=(1, 5, 10, 50, 100, 500, 1000, 5000)
+)
+
+
+def assign(pairs: list[tuple[str, str]], workers: list[str]) -> dict[str, list[tuple[str, str]]]:
+    """Rendezvous (highest random weight) assignment of streams to workers."""
+    out: dict[str, list[tuple[str, str]]] = {w: [] for w in workers}
+    if not workers:
+        return out
+    for pair in pairs:
+        stream = stream_name(*pair)
+        owner = max(workers, key=lambda w: hashlib.blake2b(f"{w}|{stream}".encode(), digest_size=8).digest())
+        out[owner].append(pair)
+    return out
+
+
+class ShardWorker:
+    """One shard member: lease heartbeat + rebalance loop, one WS connection set, batched writer."""
+
+    def __init__(
+        self,
+        dsn: str,
+        pairs: list[tuple[str, str]],
+        *,
+        worker_id: str | None = None,
+        exchange: str = EXCHANGE,
+        lease_s: float = 15.0,
+        heartbeat_s: float = 3.0,
+        flush_s: float = 0.25,
+        max_batch: int = 1000,
+        streams_per_conn: int = 1024,
+    ):
+        self.dsn = dsn
+        self.pairs = sorted(set(pairs))
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.exchange = exchange
+        self.lease_s = lease_s
+        self.heartbeat_s = heartbeat_s
+        self.flush_s = flush_s
+        self.max_batch = max_batch
+        self.streams_per_conn = streams_per_conn
+        self.owned: set[tuple[str, str]] = set()
+        self.members: list[str] = []
+        self.rows_written = 0
+        self._pending: list[dict] = []
+        self._event_ms: list[tuple[str, str, int]] = []
+        self._flush = asyncio.Event()
+        self._stream_task: asyncio.Task | None = None
+        self._ctl: psycopg.Connection | None = None
+        self._db: psycopg.Connection | None = None
+
+    # -- membership and ownership (control connection, autocommit) ---------------------
+
+    def _register(self) -> None:
+        self._ctl = psycopg.connect(self.dsn, autocommit=True)
+        self._ctl.execute(
+            """
+            INSERT INTO market.ws_workers (worker_id, host, pid, backend_pid)
+            VALUES (%s, %s, %s, pg_backend_pid())
+            ON CONFLICT (worker_id) DO UPDATE SET backend_pid = EXCLUDED.backend_pid, heartbeat_at = now()
+            """,
+            (self.worker_id, socket.gethostname(), os.getpid()),
+        )
+
+    def _heartbeat_and_members(self) -> list[str]:
+        ctl = self._ctl
+        ctl.execute(
+            "UPDATE market.ws_workers SET heartbeat_at = now(), streams = %s WHERE worker_id = %s",
+            (len(self.owned), self.worker_id),
+        )
+        stale = ctl.execute(
+            """
+            DELETE FROM market.ws_workers
+            WHERE heartbeat_at < now() - make_interval(secs => %s) AND worker_id <> %s
+            RETURNING worker_id, backend_pid
+            """,
+            (self.lease_s, self.worker_id),
+        ).fetchall()
+        for worker_id, backend_pid in stale:
+            # Its advisory locks die with its session (a hung host may still hold one open)
+            ctl.execute("SELECT pg_terminate_backend(%s)", (backend_pid,))
+            log.warning("Shard worker %s missed its lease; taking over its streams", worker_id)
+        return [w for (w,) in ctl.execute("SELECT worker_id FROM market.ws_workers ORDER BY worker_id").fetchall()]
+
+    def _lock_key(self, pair: tuple[str, str]) -> int:
+        # 64-bit key: hashtext()'s 32 bits would make colliding streams unassignable
+        digest = hashlib.blake2b(f"ws|{self.exchange}|{stream_name(*pair)}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big", signed=True)
+
+    def _rebalance(self) -> bool:
+        """Release streams assigned elsewhere, try to lock newly assigned ones; True if owned changed."""
+        try:
+            self.members = self._heartbeat_and_members()
+        except psycopg.OperationalError:
+            # Lost the control connection (or a peer reaped our lease), and with it every lock
+            log.warning("Shard control connection lost; re-registering")
+            self.owned.clear()
+            self._register()
+            self.members = self._heartbeat_and_members()
+            return True
+        desired = set(assign(self.pairs, self.members).get(self.worker_id, []))
+        before = set(self.owned)
+        for pair in sorted(self.owned - desired):
+            self._ctl.execute("SELECT pg_advisory_unlock(%s)", (self._lock_key(pair),))
+            self.owned.discard(pair)
+        for pair in sorted(desired - self.owned):
+            row = self._ctl.execute("SELECT pg_try_advisory_lock(%s)", (self._lock_key(pair),)).fetchone()
+            if row[0]:
+                self.owned.add(pair)
+        SHARD_MEMBERS.set(len(self.members))
+        OWNED_STREAMS.set(len(self.owned), worker=self.worker_id)
+        if self.owned != before:
+            log.info(
+                "Shard %s: %d members, owns %d/%d streams (%d awaiting handover)",
+                self.worker_id, len(self.members), len(self.owned), len(self.pairs), len(desired - self.owned),
+            )
+        return self.owned != before
+
+    # -- streaming and writing ------------------------------------------------------
+
+    def _on_kline(self, symbol: str, interval: str, k: dict, event_ms) -> None:
+        if not k.get("x") or (symbol, interval) not in self.owned:
+            return
+        self._pending.append(
+            {
+                "exchange": self.exchange,
+                "symbol": symbol,
+                "interval": interval,
+                "open_time": datetime.fromtimestamp(int(k["t"]) / 1000.0, tz=timezone.utc),
+                "close_time": datetime.fromtimestamp(int(k["T"]) / 1000.0, tz=timezone.utc),
+                "open": float(k["o"]),
+                "high": float(k["h"]),
+                "low": float(k["l"]),
+                "close": float(k["c"]),
+                "volume": float(k["v"]),
+                "is_final": True,
+            }
+        )
+        if event_ms is not None:
+            self._event_ms.append((symbol, interval, int(event_ms)))
+        if len(self._pending) >= self.max_batch:
+            self._flush.set()
+
+    def _write(self, rows: list[dict]) -> None:
+        if self._db is None or self._db.closed:
+            self._db = psycopg.connect(self.dsn)
+        try:
+            upsert_candles(self._db, rows)
+            self._db.commit()
+        except Exception:
+            if not self._db.closed:
+                self._db.rollback()
+            raise
+
+    async def _writer(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush.wait(), timeout=self.flush_s)
+            except asyncio.TimeoutError:
+                pass
+            self._flush.clear()
+            if not self._pending:
+                continue
+            # Fence: drop candles of streams handed over since they were received
+            rows = [r for r in self._pending if (r["symbol"], r["interval"]) in self.owned]
+            event_ms, self._pending, self._event_ms = self._event_ms, [], []
+            if not rows:
+                continue
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except Exception as e:
+                log.warning("Batch write of %d candles failed (%s); retrying", len(rows), e)
+                self._pending[:0] = rows
+                await asyncio.sleep(1.0)
+                continue
+            self.rows_written += len(rows)
+            BATCH_ROWS.observe(len(rows))
+            now = time.time()
+            for symbol, interval, ms in event_ms:
+                metrics.WS_COMMIT_SECONDS.observe(now - ms / 1000.0, symbol=symbol, interval=interval)
+
+    async def _restart_streams(self) -> None:
+        if self._stream_task is not None:
+            self._stream_task.cancel()
+            try:
+                await self._stream_task
+            except asyncio.CancelledError:
+                pass
+            self._stream_task = None
+        if self.owned:
+            self._stream_task = asyncio.create_task(
+                listen_many(sorted(self.owned), self._on_kline, streams_per_conn=self.streams_per_conn)
+            )
+
+    async def run(self) -> None:
+        await asyncio.to_thread(self._register)
+        writer = asyncio.create_task(self._writer())
+        try:
+            while True:
+                if await asyncio.to_thread(self._rebalance):
+                    await self._restart_streams()
+                await asyncio.sleep(self.heartbeat_s)
+        finally:
+            writer.cancel()
+            if self._stream_task is not None:
+                self._stream_task.cancel()
+            try:
+                if self._pending:
+                    await asyncio.to_thread(self._write, self._pending)
+            finally:
+                self._leave()
+
+    def _leave(self) -> None:
+        """Remove our lease so the others rebalance immediately; closing the session frees the locks."""
+        try:
+            if self._ctl is not None and not self._ctl.closed:
+                self._ctl.execute("DELETE FROM market.ws_workers WHERE worker_id = %s", (self.worker_id,))
+                self._ctl.close()
+        finally:
+            if self._db is not None:
+                self._db.close()
+            log.info("Shard %s left after writing %d candles", self.worker_id, self.rows_written)
+
+
+def _run_worker(dsn: str, pairs: list[tuple[str, str]], kwargs: dict) -> None:
+    try:
+        asyncio.run(ShardWorker(dsn, pairs, **kwargs).run())
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded live kline ingestion into market.candles_raw")
+    parser.add_argument("--symbols", type=lambda s: s.split(","), default=SYMBOLS)
+    parser.add_argument("--intervals", type=lambda s: s.split(","), default=INTERVALS)
+    parser.add_argument("--local", type=int, default=1, help="worker processes to start on this host")
+    parser.add_argument("--lease", type=float, default=15.0, help="seconds without heartbeat before a worker is dead")
+    parser.add_argument("--heartbeat", type=float, default=3.0, help="seconds between heartbeats / rebalances")
+    parser.add_argument("--flush", type=float, default=0.25, help="max seconds a closed candle waits for its batch")
+    parser.add_argument("--max-batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    dsn = POSTGRES_DSN or require("POSTGRES_DSN")
+    pairs = [(s, itv) for s in args.symbols for itv in args.intervals]
+    kwargs = dict(lease_s=args.lease, heartbeat_s=args.heartbeat, flush_s=args.flush, max_batch=args.max_batch)
+    if args.local <= 1:
+        metrics.start_http_server()
+        _run_worker(dsn, pairs, kwargs)
+        return
+    procs = [
+        multiprocessing.Process(target=_run_worker, args=(dsn, pairs, kwargs), name=f"shard-{i}")
+        for i in range(args.local)
+    ]
+    for p in procs:
+        p.start()
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        for p in procs:
+            p.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Deterministic synthetic OHLCV generator that emits data in Binance formats:
+bulk-archive zips, REST /api/v3/klines pages and WebSocket kline messages.
+
+The same (symbol, interval, start, n, seed) always yields the same candles, so
+benchmarks and load tests are reproducible across machines and commits.
+"""
+from __future__ import annotations
+
+import io
+import json
+import zipfile
+import zlib
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from pipelines.ingestion.intervals import interval_to_ms
+
+# Column order of data.binance.vision kline CSVs (and of /api/v3/klines rows)
+KLINE_COLUMNS = [
+    "open_time",
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "close_time",
+    "quote_volume",
+    "num_trades",
+    "taker_buy_base",
+    "taker_buy_quote",
+    "ignore",
+]
+
+# Named sizes in 1m candles
+SIZES = {
+    "1d": 1_440,
+    "1w": 10_080,
+    "1M": 43_200,
+    "1y": 525_600,
+    "5y": 2_628_000,
+}
+
+
+def synthetic_klines(
+    symbol: str = "BTCUSDT",
+    interval: str = "1m",
+    start_ms: int = 1_704_067_200_000,  # 2024-01-01 00:00 UTC
+    n: int = SIZES["1d"],
+    *,
+    seed: int = 0,
+    start_price: float = 40_000.0,
+    volatility: float = 0.001,
+) -> pd.DataFrame:
+    """
+    Geometric random-walk candles with Binance kline columns (timestamps in epoch ms).
+    """
+    step = interval_to_ms(interval)
+    rng = np.random.default_rng(zlib.crc32(f"{symbol}|{interval}|{seed}".encode()))
+
+    log_ret = rng.normal(0.0, volatility, n)
+    close = start_price * np.exp(np.cumsum(log_ret))
+    open_ = np.empty(n)
+    open_[0] = start_price
+    open_[1:] = close[:-1]
+    wick = np.abs(rng.normal(0.0, volatility / 2, (2, n)))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    volume = rng.lognormal(3.0, 1.0, n)
+    taker_share = rng.uniform(0.3, 0.7, n)
+    mid = (high + low) / 2
+
+    open_time = start_ms + step * np.arange(n, dtype=np.int64)
+    return pd.DataFrame(
+        {
+            "open_time": open_time,
+            "open": open_.round(2),
+            "high": high.round(2),
+            "low": low.round(2),
+            "close": close.round(2),
+            "volume": volume.round(3),
+            "close_time": open_time + step - 1,
+            "quote_volume": (volume * mid).round(4),
+            "num_trades": rng.poisson(500, n).astype(np.int64),
+            "taker_buy_base": (volume * taker_share).round(3),
+            "taker_buy_quote": (volume * taker_share * mid).round(4),
+            "ignore": np.zeros(n, dtype=np.int64),
+        }
+    )
+
+
+def archive_zip(df: pd.DataFrame, csv_name: str, *, header: bool = False) -> bytes:
+    """Zip the candles as a data.binance.vision kline CSV (newer archives carry a header row)."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr(csv_name, df[KLINE_COLUMNS].to_csv(index=False, header=header))
+    return buf.getvalue()
+
+
+def _num(x) -> str:
+    """A price / quantity as Binance sends it: 8 decimals, so stored values are not rounded."""
+    return f"{float(x):.8f}"
+
+
+def rest_rows(df: pd.DataFrame) -> list[list]:
+    """Rows as returned by /api/v3/klines (prices and volumes as strings)."""
+    out = []
+    for r in df[KLINE_COLUMNS].itertuples(index=False):
+        out.append(
+            [
+                int(r.open_time), _num(r.open), _num(r.high), _num(r.low), _num(r.close),
+                _num(r.volume), int(r.close_time), _num(r.quote_volume), int(r.num_trades),
+                _num(r.taker_buy_base), _num(r.taker_buy_quote), "0",
+            ]
+        )
+    return out
+
+
+def rest_pages(df: pd.DataFrame, limit: int = 1000) -> Iterator[list[list]]:
+    """Successive /api/v3/klines pages of up to `limit` rows."""
+    for i in range(0, len(df), limit):
+        yield rest_rows(df.iloc[i:i + limit])
+
+
+def ws_kline_message(row, symbol: str, interval: str, *, is_final: bool, event_ms: int | None = None) -> dict:
+    """One kline event in the <symbol>@kline_<interval> stream format."""
+    return {
+        "e": "kline",
+        "E": int(event_ms if event_ms is not None else row.close_time + 1),
+        "s": symbol,
+        "k": {
+            "t": int(row.open_time),
+            "T": int(row.close_time),
+            "s": symbol,
+            "i": interval,
+            "o": _num(row.open),
+            "c": _num(row.close),
+            "h": _num(row.high),
+            "l": _num(row.low),
+            "v": _num(row.volume),
+            "n": int(row.num_trades),
+            "x": bool(is_final),
+            "q": _num(row.quote_volume),
+            "V": _num(row.taker_buy_base),
+            "Q": _num(row.taker_buy_quote),
+        },
+    }
+
+
+def ws_messages(
+    df: pd.DataFrame,
+    symbol: str,
+    interval: str,
+    *,
+    ticks_per_bar: int = 0,
+) -> Iterator[str]:
+    """
+    JSON kline messages for every candle: `ticks_per_bar` non-final updates (the bar
+    forming towards its final values) followed by the final message.
+    """
+    step = interval_to_ms(interval)
+    for row in df.itertuples(index=False):
+        for t in range(ticks_per_bar):
+            frac = (t + 1) / (ticks_per_bar + 1)
+            partial = row._replace(
+                close=row.open + (row.close - row.open) * frac,
+                volume=row.volume * frac,
+            )
+            yield json.dumps(
+                ws_kline_message(partial, symbol, interval, is_final=False,
+                                 event_ms=int(row.open_time + step * frac))
+            )
+        yield json.dumps(ws_kline_message(row, symbol, interval, is_final=True))
+
+
+def synthetic_agg_trades(
+    symbol: str = "BTCUSDT",
+    start_ms: int = 1_704_067_200_000,
+    n: int = 1_000_000,
+    *,
+    span_ms: int = 86_400_000,
+    seed: int = 0,
+    start_price: float = 40_000.0,
+) -> pd.DataFrame:
+    """Random-walk aggregated trades spread over span_ms, in aggTrades CSV columns."""
+    rng = np.random.default_rng(zlib.crc32(f"{symbol}|aggTrades|{seed}".encode()))
+    times = start_ms + np.sort(rng.integers(0, span_ms, n))
+    price = (start_price * np.exp(np.cumsum(rng.normal(0.0, 2e-5, n)))).round(1)
+    n_trades = rng.poisson(1.5, n) + 1
+    last_id = np.cumsum(n_trades)
+    return pd.DataFrame(
+        {
+            "agg_trade_id": np.arange(n, dtype=np.int64),
+            "price": price,
+            "quantity": rng.lognormal(-4.0, 1.5, n).round(3) + 0.001,
+            "first_trade_id": last_id - n_trades + 1,
+            "last_trade_id": last_id,
+            "transact_time": times,
+            "is_buyer_maker": rng.random(n) < 0.5,
+        }
+    )
+
+
+def agg_trades_zip(df: pd.DataFrame, csv_name: str, *, header: bool = True) -> bytes:
+    """Zip trades as a data.binance.vision aggTrades CSV."""
+    out = df.copy()
+    out["is_buyer_maker"] = np.where(out["is_buyer_maker"], "true", "false")
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr(csv_name, out.to_csv(index=False, header=header))
+    return buf.getvalue()
@@ -0,0 +1 @@
+# Data quality: set-based scans of the candle tables
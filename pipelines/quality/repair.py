@@ -0,0 +1,237 @@
+"""
+Gap repair: find missing open-time ranges per series in Postgres, coalesce them into
+the fewest fetch windows and refetch only those windows.
+
+  - futures_candles: one daily archive per UTC day touched by a gap
+  - candles_raw:     paged REST windows of up to 1000 candles
+
+Windows are fetched concurrently, then the gaps are recomputed to verify closure.
+Gaps that stay open (e.g. exchange outages with no data) are recorded in
+market.data_quality_issues as 'unrepaired_gap'.
+
+Run: python -m pipelines.quality.repair [--table futures_candles] [--start 2024-01-01] [--workers 8]
+"""
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timezone
+
+import psycopg
+
+from pipelines.common.logging import get_logger
+from pipelines.ingestion.binance_archive import download_day
+from pipelines.ingestion.binance_rest import backfill_symbol_interval
+from pipelines.ingestion.db import get_conn, log_quality_issue
+from pipelines.ingestion.intervals import interval_to_ms
+from pipelines.quality.scanner import SOURCES, list_series
+
+log = get_logger(__name__)
+
+REST_PAGE = 1000  # max klines per /api/v3/klines request
+DAY_MS = 86_400_000
+
+
+def _to_dt(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc)
+
+
+def find_missing_ranges(
+    conn: psycopg.Connection,
+    table: str,
+    key: str,
+    symbol: str,
+    interval: str,
+    *,
+    start_ms: int | None = None,
+    end_ms: int | None = None,
+) -> list[tuple[int, int]]:
+    """
+    Missing open-time ranges [first_missing_ms, last_missing_ms] inside the stored history
+    (between the first and last stored candle, clipped to [start_ms, end_ms]).
+    """
+    qualified, key_col, _ = SOURCES[table]
+    step = interval_to_ms(interval)
+    series = f"{key_col} = %(key)s AND symbol = %(symbol)s AND interval = %(interval)s"
+    where = series
+    params = {"key": key, "symbol": symbol, "interval": interval, "step": step}
+    # Plus the nearest stored candle on each side of the window, so a gap running
+    # across start_ms / end_ms still has both of its ends
+    around = []
+    if start_ms is not None:
+        where += " AND open_time >= %(start)s"
+        params["start"] = _to_dt(start_ms)
+        around.append(
+            f"(SELECT open_time FROM {qualified} WHERE {series} AND open_time < %(start)s"
+            " ORDER BY open_time DESC LIMIT 1)"
+        )
+    if end_ms is not None:
+        where += " AND open_time <= %(end)s"
+        params["end"] = _to_dt(end_ms)
+        around.append(
+            f"(SELECT open_time FROM {qualified} WHERE {series} AND open_time > %(end)s"
+            " ORDER BY open_time LIMIT 1)"
+        )
+
+    rows = conn.execute(
+        f"""
+        WITH t AS (
+          SELECT open_time FROM {qualified} WHERE {where}
+          {"".join(f" UNION ALL {q}" for q in around)}
+        ), s AS (
+          SELECT (extract(epoch FROM open_time) * 1000)::bigint AS open_ms,
+                 (extract(epoch FROM lag(open_time) OVER (ORDER BY open_time)) * 1000)::bigint AS prev_ms
+          FROM t
+        )
+        SELECT prev_ms + %(step)s, open_ms - %(step)s
+        FROM s
+        WHERE open_ms - prev_ms > %(step)s
+        ORDER BY 1
+        """,
+        params,
+    ).fetchall()
+
+    ranges = []
+    for lo, hi in rows:
+        if start_ms is not None:
+            lo = max(lo, start_ms)
+        if end_ms is not None:
+            hi = min(hi, end_ms)
+        if lo <= hi:
+            ranges.append((int(lo), int(hi)))
+    return ranges
+
+
+def coalesce_rest_windows(
+    ranges: list[tuple[int, int]], step: int, *, page: int = REST_PAGE
+) -> list[tuple[int, int]]:
+    """
+    Merge nearby gaps and cut them into REST windows of at most `page` candles.
+    Two gaps are merged when refetching the candles between them is cheaper than an
+    extra request, i.e. the merged span still fits in one page.
+    """
+    merged: list[list[int]] = []
+    for lo, hi in sorted(ranges):
+        if merged and (hi - merged[-1][0]) // step + 1 <= page:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+
+    windows = []
+    for lo, hi in merged:
+        cur = lo
+        while cur <= hi:
+            last = min(hi, cur + (page - 1) * step)
+            windows.append((cur, last))
+            cur = last + step
+    return windows
+
+
+def archive_days(ranges: list[tuple[int, int]]) -> list[date]:
+    """UTC days (one daily archive each) touched by any of the ranges."""
+    days = set()
+    for lo, hi in ranges:
+        for d in range(lo // DAY_MS, hi // DAY_MS + 1):
+            days.add(d)
+    return [datetime.fromtimestamp(d * 86_400, tz=timezone.utc).date() for d in sorted(days)]
+
+
+def _fetch_archive_day(market_type: str, symbol: str, interval: str, day: date) -> int:
+    with get_conn() as conn:
+        stats = download_day(conn, market_type, symbol, interval, day)
+        return stats.total if stats else 0
+
+
+def _fetch_rest_window(symbol: str, interval: str, lo: int, hi: int) -> int:
+    backfill_symbol_interval(symbol, interval, start_ms=lo, end_ms=hi + interval_to_ms(interval))
+    return (hi - lo) // interval_to_ms(interval) + 1
+
+
+def repair_series(
+    table: str,
+    key: str,
+    symbol: str,
+    interval: str,
+    *,
+    start_ms: int | None = None,
+    end_ms: int | None = None,
+    workers: int = 4,
+) -> dict:
+    """Refetch the missing ranges of one series and report what is still missing afterwards."""
+    step = interval_to_ms(interval)
+    with get_conn() as conn:
+        before = find_missing_ranges(conn, table, key, symbol, interval, start_ms=start_ms, end_ms=end_ms)
+    if not before:
+        return {"gaps_before": 0, "fetches": 0, "gaps_after": 0}
+
+    missing = sum((hi - lo) // step + 1 for lo, hi in before)
+    if table == "futures_candles":
+        tasks = [(_fetch_archive_day, (key, symbol, interval, d)) for d in archive_days(before)]
+    else:
+        tasks = [(_fetch_rest_window, (symbol, interval, lo, hi)) for lo, hi in coalesce_rest_windows(before, step)]
+    log.info(
+        "%s %s %s %s: %d gaps (%d candles) -> %d fetches",
+        table, key, symbol, interval, len(before), missing, len(tasks),
+    )
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fn, *args): args for fn, args in tasks}
+        for fut in as_completed(futures):
+            try:
+                fut.result()
+            except Exception as e:
+                log.warning("Repair fetch %s failed: %s", futures[fut], e)
+
+    # Verify closure over the span we tried to repair
+    lo_all = min(lo for lo, _ in before)
+    hi_all = max(hi for _, hi in before)
+    with get_conn() as conn:
+        after = find_missing_ranges(conn, table, key, symbol, interval, start_ms=lo_all, end_ms=hi_all)
+        for lo, hi in after:
+            log_quality_issue(
+                conn, key, symbol, interval, "unrepaired_gap",
+                open_time=_to_dt(lo),
+                details={"table": table, "gap_start": _to_dt(lo).isoformat(), "gap_end": _to_dt(hi).isoformat(),
+                         "missing": (hi - lo) // step + 1},
+            )
+        conn.commit()
+
+    if after:
+        log.warning("%s %s %s %s: %d gaps still open after repair", table, key, symbol, interval, len(after))
+    return {"gaps_before": len(before), "fetches": len(tasks), "gaps_after": len(after)}
+
+
+def run_repair(tables: list[str], *, start_ms: int | None = None, end_ms: int | None = None, workers: int = 4) -> dict:
+    results = {}
+    with get_conn() as conn:
+        series = [(t, *s) for t in tables for s in list_series(conn, t)]
+    for table, key, symbol, interval in series:
+        results[(table, key, symbol, interval)] = repair_series(
+            table, key, symbol, interval, start_ms=start_ms, end_ms=end_ms, workers=workers
+        )
+    return results
+
+
+def _date_to_ms(d: date) -> int:
+    return int(datetime(d.year, d.month, d.day, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refetch missing candle ranges")
+    parser.add_argument("--table", choices=[*SOURCES, "all"], default="all")
+    parser.add_argument("--start", type=date.fromisoformat, default=None)
+    parser.add_argument("--end", type=date.fromisoformat, default=None)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    tables = list(SOURCES) if args.table == "all" else [args.table]
+    run_repair(
+        tables,
+        start_ms=_date_to_ms(args.start) if args.start else None,
+        end_ms=_date_to_ms(args.end) + DAY_MS - 1 if args.end else None,
+        workers=args.workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
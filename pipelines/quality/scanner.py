@@ -0,0 +1,300 @@
+"""
+Data-quality scanner: finds gaps, misaligned or non-monotonic timestamps, invalid OHLC
+rows, zero-volume runs and spot/futures divergence, and records them in
+market.data_quality_issues.
+
+Every check runs inside Postgres as one INSERT ... SELECT per series (window lag() /
+gaps-and-islands), so no candle rows are pulled into Python. By default scans are
+incremental from market.data_quality_checkpoints; use --full to rescan all history.
+Each scan stops at the newest candle it read up front (the next checkpoint), and a
+zero-volume run is reported once, by the scan that sees the candle ending it.
+
+Run: python -m pipelines.quality.scanner [--full] [--table futures_candles] [--no-divergence]
+"""
+from __future__ import annotations
+
+import argparse
+from datetime import datetime, timedelta, timezone
+
+import psycopg
+
+from pipelines.common.logging import get_logger
+from pipelines.ingestion.db import get_conn
+from pipelines.ingestion.intervals import interval_to_ms
+
+log = get_logger(__name__)
+
+# table -> (qualified name, key column, metadata table listing its series)
+SOURCES = {
+    "futures_candles": ("market.futures_candles", "market_type", "market.futures_ingestion_metadata"),
+    "candles_raw": ("market.candles_raw", "exchange", "market.api_metadata"),
+}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Consecutive zero-volume candles before a run is reported
+ZERO_VOLUME_MIN_RUN = 5
+# |futures close - spot close| / spot close above which a candle is reported
+DIVERGENCE_THRESHOLD = 0.01
+
+_SCAN_SQL = """
+WITH s AS (
+  SELECT open_time, close_time, open, high, low, close, volume,
+         lag(open_time) OVER w AS prev_open,
+         lag(close_time) OVER w AS prev_close,
+         lead(open_time) OVER w AS next_open,
+         sum(CASE WHEN volume > 0 THEN 1 ELSE 0 END) OVER w AS nonzero_seen
+  FROM {table}
+  WHERE {key_col} = %(key)s AND symbol = %(symbol)s AND interval = %(interval)s
+    AND open_time >= %(scan_from)s AND open_time <= %(max_open)s
+  WINDOW w AS (ORDER BY open_time)
+),
+found AS (
+  SELECT prev_open + %(step)s * interval '1 millisecond' AS open_time, 'missing_candles' AS issue_type,
+         jsonb_build_object(
+           'gap_start', prev_open + %(step)s * interval '1 millisecond',
+           'gap_end', open_time - %(step)s * interval '1 millisecond',
+           'missing', (extract(epoch FROM open_time - prev_open) * 1000)::bigint / %(step)s - 1
+         ) AS details
+  FROM s
+  WHERE prev_open IS NOT NULL AND open_time - prev_open > %(step)s * interval '1 millisecond'
+
+  UNION ALL
+  SELECT open_time, 'misaligned_open_time',
+         jsonb_build_object('offset_ms', (extract(epoch FROM open_time) * 1000)::bigint %% %(step)s)
+  FROM s
+  WHERE (extract(epoch FROM open_time) * 1000)::bigint %% %(step)s <> 0
+
+  UNION ALL
+  SELECT open_time, 'non_monotonic_close_time',
+         jsonb_build_object('close_time', close_time, 'prev_close_time', prev_close)
+  FROM s
+  WHERE close_time IS NOT NULL
+    AND (close_time < open_time OR (prev_close IS NOT NULL AND close_time <= prev_close))
+
+  UNION ALL
+  SELECT open_time, 'invalid_ohlc',
+         jsonb_build_object('open', open, 'high', high, 'low', low, 'close', close, 'volume', volume)
+  FROM s
+  WHERE high < low
+     OR open NOT BETWEEN low AND high
+     OR close NOT BETWEEN low AND high
+     OR volume < 0
+
+  UNION ALL
+  SELECT min(open_time), 'zero_volume_run',
+         jsonb_build_object('run_start', min(open_time), 'run_end', max(open_time), 'candles', count(*))
+  FROM s
+  WHERE volume = 0
+  GROUP BY nonzero_seen
+  -- Only runs that have ended (a candle follows them), once: when that candle is new
+  HAVING count(*) >= %(min_run)s AND bool_and(next_open IS NOT NULL) AND max(next_open) > %(since)s
+),
+ins AS (
+  INSERT INTO market.data_quality_issues (exchange, symbol, interval, open_time, issue_type, details_json)
+  SELECT %(key)s::text, %(symbol)s::text, %(interval)s::text, open_time, issue_type,
+         details || jsonb_build_object('table', %(table_name)s::text)
+  FROM found
+  WHERE open_time > %(since)s OR issue_type = 'zero_volume_run'
+  RETURNING issue_type
+)
+SELECT issue_type, count(*) FROM ins GROUP BY issue_type
+"""
+
+_DIVERGENCE_SQL = """
+WITH ins AS (
+  INSERT INTO market.data_quality_issues (exchange, symbol, interval, open_time, issue_type, details_json)
+  SELECT %(market_type)s::text, f.symbol, f.interval, f.open_time, 'spot_futures_divergence',
+         jsonb_build_object('futures_close', f.close, 'spot_close', s.close,
+                            'rel_diff', abs(f.close - s.close) / s.close)
+  FROM market.futures_candles f
+  JOIN market.candles_raw s
+    ON s.exchange = %(exchange)s AND s.symbol = f.symbol AND s.interval = f.interval
+   AND s.open_time = f.open_time
+  WHERE f.market_type = %(market_type)s AND f.symbol = %(symbol)s AND f.interval = %(interval)s
+    AND f.open_time > %(since)s AND f.open_time <= %(max_open)s
+    AND s.close > 0
+    AND abs(f.close - s.close) / s.close > %(threshold)s
+  RETURNING issue_type
+)
+SELECT issue_type, count(*) FROM ins GROUP BY issue_type
+"""
+
+
+def list_series(conn: psycopg.Connection, table: str) -> list[tuple[str, str, str]]:
+    """(key, symbol, interval) of every series recorded in the table's metadata."""
+    _, key_col, meta_table = SOURCES[table]
+    rows = conn.execute(f"SELECT {key_col}, symbol, interval FROM {meta_table} ORDER BY 1, 2, 3").fetchall()
+    return [tuple(r) for r in rows]
+
+
+def get_checkpoint(conn: psycopg.Connection, source: str, key: str, symbol: str, interval: str) -> datetime | None:
+    row = conn.execute(
+        """
+        SELECT last_scanned_open_time FROM market.data_quality_checkpoints
+        WHERE source_table = %s AND series_key = %s AND symbol = %s AND interval = %s
+        """,
+        (source, key, symbol, interval),
+    ).fetchone()
+    return row[0] if row else None
+
+
+def set_checkpoint(conn: psycopg.Connection, source: str, key: str, symbol: str, interval: str, open_time) -> None:
+    conn.execute(
+        """
+        INSERT INTO market.data_quality_checkpoints (source_table, series_key, symbol, interval, last_scanned_open_time)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (source_table, series_key, symbol, interval)
+        DO UPDATE SET last_scanned_open_time = EXCLUDED.last_scanned_open_time, updated_at = now()
+        """,
+        (source, key, symbol, interval, open_time),
+    )
+
+
+def scan_series(
+    conn: psycopg.Connection,
+    table: str,
+    key: str,
+    symbol: str,
+    interval: str,
+    *,
+    full: bool = False,
+    min_zero_run: int = ZERO_VOLUME_MIN_RUN,
+) -> dict[str, int]:
+    """Scan one series since its checkpoint (or from the start if full). Returns issue counts by type."""
+    qualified, key_col, _ = SOURCES[table]
+    step = interval_to_ms(interval)
+    since = None if full else get_checkpoint(conn, table, key, symbol, interval)
+
+    max_open = conn.execute(
+        f"SELECT max(open_time) FROM {qualified} WHERE {key_col} = %s AND symbol = %s AND interval = %s",
+        (key, symbol, interval),
+    ).fetchone()[0]
+    if max_open is None or (since is not None and max_open <= since):
+        return {}
+
+    if full:
+        # A full rescan replaces the series' earlier findings instead of duplicating them
+        conn.execute(
+            """
+            DELETE FROM market.data_quality_issues
+            WHERE exchange = %s AND symbol = %s AND interval = %s AND details_json->>'table' = %s
+            """,
+            (key, symbol, interval, table),
+        )
+
+    since = since or EPOCH
+    # Re-read a little history so lag() sees the row before the checkpoint, and back to the
+    # last traded candle so a zero-volume run still open at the checkpoint is seen whole
+    scan_from = since - timedelta(milliseconds=step)
+    if since > EPOCH:
+        last_traded = conn.execute(
+            f"""
+            SELECT max(open_time) FROM {qualified}
+            WHERE {key_col} = %s AND symbol = %s AND interval = %s AND open_time <= %s AND volume > 0
+            """,
+            (key, symbol, interval, since),
+        ).fetchone()[0]
+        scan_from = min(scan_from, last_traded or EPOCH)
+    params = {
+        "key": key,
+        "symbol": symbol,
+        "interval": interval,
+        "step": step,
+        "since": since,
+        "scan_from": max(EPOCH, scan_from),
+        "max_open": max_open,
+        "min_run": min_zero_run,
+        "table_name": table,
+    }
+    rows = conn.execute(_SCAN_SQL.format(table=qualified, key_col=key_col), params).fetchall()
+    set_checkpoint(conn, table, key, symbol, interval, max_open)
+    conn.commit()
+    return {issue: n for issue, n in rows}
+
+
+def scan_divergence(
+    conn: psycopg.Connection,
+    market_type: str,
+    symbol: str,
+    interval: str,
+    *,
+    exchange: str = "binance",
+    full: bool = False,
+    threshold: float = DIVERGENCE_THRESHOLD,
+) -> dict[str, int]:
+    """Compare futures closes with spot closes of the same symbol/interval."""
+    since = None if full else get_checkpoint(conn, "divergence", market_type, symbol, interval)
+    max_open = conn.execute(
+        """
+        SELECT max(open_time) FROM market.futures_candles
+        WHERE market_type = %s AND symbol = %s AND interval = %s
+        """,
+        (market_type, symbol, interval),
+    ).fetchone()[0]
+    if max_open is None:
+        return {}
+    if full:
+        conn.execute(
+            """
+            DELETE FROM market.data_quality_issues
+            WHERE exchange = %s AND symbol = %s AND interval = %s AND issue_type = 'spot_futures_divergence'
+            """,
+            (market_type, symbol, interval),
+        )
+    params = {
+        "market_type": market_type,
+        "exchange": exchange,
+        "symbol": symbol,
+        "interval": interval,
+        "since": since or EPOCH,
+        "max_open": max_open,
+        "threshold": threshold,
+    }
+    rows = conn.execute(_DIVERGENCE_SQL, params).fetchall()
+    set_checkpoint(conn, "divergence", market_type, symbol, interval, max_open)
+    conn.commit()
+    return {issue: n for issue, n in rows}
+
+
+def run_scan(tables: list[str], *, full: bool = False, divergence: bool = True) -> dict[str, int]:
+    totals: dict[str, int] = {}
+
+    def add(found: dict[str, int]):
+        for issue, n in found.items():
+            totals[issue] = totals.get(issue, 0) + n
+
+    with get_conn() as conn:
+        for table in tables:
+            for key, symbol, interval in list_series(conn, table):
+                found = scan_series(conn, table, key, symbol, interval, full=full)
+                if found:
+                    log.info("%s %s %s %s: %s", table, key, symbol, interval, found)
+                add(found)
+
+        if divergence:
+            spot = set((s, i) for _, s, i in list_series(conn, "candles_raw"))
+            for market_type, symbol, interval in list_series(conn, "futures_candles"):
+                if (symbol, interval) in spot:
+                    found = scan_divergence(conn, market_type, symbol, interval, full=full)
+                    if found:
+                        log.info("divergence %s %s %s: %s", market_type, symbol, interval, found)
+                    add(found)
+
+    log.info("Scan finished: %s", totals or "no issues")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan candle tables and record data-quality issues")
+    parser.add_argument("--table", choices=[*SOURCES, "all"], default="all")
+    parser.add_argument("--full", action="store_true", help="ignore checkpoints and rescan all history")
+    parser.add_argument("--no-divergence", action="store_true", help="skip the spot/futures comparison")
+    args = parser.parse_args()
+
+    tables = list(SOURCES) if args.table == "all" else [args.table]
+    run_scan(tables, full=args.full, divergence=not args.no_divergence)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Replay: local Binance REST / archive / WebSocket stand-in for load tests
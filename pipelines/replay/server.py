@@ -0,0 +1,256 @@
+"""
+Local Binance replay server for load-testing ingestion offline.
+
+Serves, on one port, from candles stored in Postgres or Parquet:
+  GET /api/v3/klines                       (REST, like api.binance.com)
+  GET /data/futures/<mt>/<daily|monthly>/klines/<SYM>/<itv>/<file>.zip   (bulk archives)
+  WS  /ws/<symbol>@kline_<itv>             (single raw stream)
+  WS  /stream?streams=<a>/<b>/...          (combined stream, {"stream", "data"} envelopes)
+
+A virtual clock starts at --start and runs --speed times faster than real time; REST
+never returns candles that have not closed on that clock, and WS streams emit each bar
+when it closes (plus --ticks non-final updates while it forms). Faults can be injected:
+--error-rate (HTTP 429s), --disconnect-rate (WS drops per message) and --latency-ms.
+
+Point the pipelines at it:
+  BINANCE_BASE_URL=http://127.0.0.1:8765
+  BINANCE_WS_URL=ws://127.0.0.1:8765/ws
+  BINANCE_ARCHIVE_URL=http://127.0.0.1:8765
+
+Run: python -m pipelines.replay.server --start 2024-01-01 --speed 60 [--parquet candles.parquet]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import calendar
+import json
+import random
+import re
+import time
+from datetime import date, datetime, timezone
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlparse
+
+import websockets
+
+from pipelines.common.logging import get_logger
+from pipelines.common.settings import POSTGRES_DSN, require
+from pipelines.ingestion.intervals import interval_to_ms
+from pipelines.ingestion.synthetic import archive_zip, rest_rows, ws_kline_message
+from pipelines.replay.sources import ParquetSource, PostgresSource
+
+log = get_logger(__name__)
+
+_ARCHIVE_RE = re.compile(
+    r"^/data/futures/(?P<mt>um|cm)/(?P<period>daily|monthly)/klines/(?P<symbol>[A-Z0-9]+)/(?P<interval>\w+)/"
+    r"(?P=symbol)-(?P=interval)-(?P<date>\d{4}-\d{2}(?:-\d{2})?)\.zip$"
+)
+_STREAM_RE = re.compile(r"^(?P<symbol>[a-z0-9]+)@kline_(?P<interval>\w+)$")
+_WS_BATCH = 1000  # candles loaded per source query while streaming
+
+
+class ReplayClock:
+    """Virtual time: start_ms + elapsed wall time × speed."""
+
+    def __init__(self, start_ms: int, speed: float):
+        self.start_ms = start_ms
+        self.speed = speed
+        self._t0 = time.monotonic()
+
+    def now_ms(self) -> int:
+        return int(self.start_ms + (time.monotonic() - self._t0) * 1000 * self.speed)
+
+    async def sleep_until(self, virtual_ms: int) -> None:
+        delay = (virtual_ms - self.now_ms()) / 1000 / self.speed
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class ReplayServer:
+    def __init__(
+        self,
+        source,
+        clock: ReplayClock,
+        *,
+        error_rate: float = 0.0,
+        disconnect_rate: float = 0.0,
+        latency_ms: float = 0.0,
+        ticks_per_bar: int = 0,
+        seed: int | None = None,
+    ):
+        self.source = source
+        self.clock = clock
+        self.error_rate = error_rate
+        self.disconnect_rate = disconnect_rate
+        self.latency_ms = latency_ms
+        self.ticks_per_bar = ticks_per_bar
+        self.rng = random.Random(seed)
+        self.stats = {"rest": 0, "rest_429": 0, "archive": 0, "ws_messages": 0, "ws_drops": 0}
+
+    # ------------------------------------------------------------------ HTTP
+    async def process_request(self, path: str, headers):
+        url = urlparse(path)
+        if url.path.startswith("/ws/") or url.path == "/stream":
+            return None  # continue with the WebSocket handshake
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        if url.path == "/api/v3/klines":
+            return await self._klines(parse_qs(url.query))
+        m = _ARCHIVE_RE.match(url.path)
+        if m:
+            return await self._archive(m)
+        return HTTPStatus.NOT_FOUND, [], b"not found\n"
+
+    def _json(self, status: HTTPStatus, payload) -> tuple:
+        return status, [("Content-Type", "application/json")], json.dumps(payload).encode()
+
+    async def _klines(self, query: dict):
+        self.stats["rest"] += 1
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.stats["rest_429"] += 1
+            return HTTPStatus.TOO_MANY_REQUESTS, [("Retry-After", "1")], b'{"code":-1003,"msg":"Too many requests."}'
+        q = {k: v[0] for k, v in query.items()}
+        try:
+            symbol, interval = q["symbol"], q["interval"]
+            step = interval_to_ms(interval)
+            limit = min(int(q.get("limit", 500)), 1000)
+        except (KeyError, ValueError) as e:
+            return self._json(HTTPStatus.BAD_REQUEST, {"code": -1100, "msg": str(e)})
+
+        # Only candles that have closed on the virtual clock
+        last_open = self.clock.now_ms() - step
+        end_ms = min(int(q.get("endTime", last_open)), last_open)
+        latest = "startTime" not in q
+        start_ms = int(q.get("startTime", 0))
+        df = await asyncio.to_thread(self.source.candles, symbol, interval, start_ms, end_ms, limit, latest=latest)
+        return self._json(HTTPStatus.OK, rest_rows(df))
+
+    async def _archive(self, m: re.Match):
+        self.stats["archive"] += 1
+        symbol, interval, day = m["symbol"], m["interval"], m["date"]
+        if m["period"] == "daily":
+            d = date.fromisoformat(day)
+            start = datetime(d.year, d.month, d.day, tzinfo=timezone.utc)
+            n_days = 1
+        else:
+            y, mo = map(int, day.split("-"))
+            start = datetime(y, mo, 1, tzinfo=timezone.utc)
+            n_days = calendar.monthrange(y, mo)[1]
+        start_ms = int(start.timestamp() * 1000)
+        end_ms = start_ms + n_days * 86_400_000 - 1
+        # Archives are published once the whole period is over
+        if end_ms > self.clock.now_ms():
+            return HTTPStatus.NOT_FOUND, [], b"not found\n"
+        limit = n_days * 86_400_000 // interval_to_ms(interval)
+        df = await asyncio.to_thread(self.source.candles, symbol, interval, start_ms, end_ms, limit)
+        if df.empty:
+            return HTTPStatus.NOT_FOUND, [], b"not found\n"
+        body = archive_zip(df, f"{symbol}-{interval}-{day}.csv")
+        return HTTPStatus.OK, [("Content-Type", "application/zip")], body
+
+    # ------------------------------------------------------------ WebSocket
+    async def ws_handler(self, ws):
+        url = urlparse(ws.path)
+        if url.path == "/stream":
+            names = parse_qs(url.query).get("streams", [""])[0].split("/")
+            combined = True
+        else:
+            names = url.path[len("/ws/"):].split("/")
+            combined = False
+        streams = []
+        for name in filter(None, names):
+            m = _STREAM_RE.match(name)
+            if not m:
+                await ws.close(code=1008, reason=f"unsupported stream {name}")
+                return
+            streams.append((name, m["symbol"].upper(), m["interval"]))
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=10_000)
+        producers = [asyncio.create_task(self._produce(queue, *s, combined=combined)) for s in streams]
+        try:
+            while True:
+                msg = await queue.get()
+                if self.latency_ms:
+                    await asyncio.sleep(self.latency_ms / 1000)
+                await ws.send(msg)
+                self.stats["ws_messages"] += 1
+                if self.disconnect_rate and self.rng.random() < self.disconnect_rate:
+                    self.stats["ws_drops"] += 1
+                    ws.transport.abort()
+                    return
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for p in producers:
+                p.cancel()
+
+    async def _produce(self, queue: asyncio.Queue, name: str, symbol: str, interval: str, *, combined: bool):
+        step = interval_to_ms(interval)
+        # Start with the bar that is forming on the virtual clock right now
+        cursor = self.clock.now_ms() // step * step
+        while True:
+            df = await asyncio.to_thread(self.source.candles, symbol, interval, cursor, cursor + _WS_BATCH * step, _WS_BATCH)
+            if df.empty:
+                # No stored data yet for this period: wait a bar on the virtual clock
+                await self.clock.sleep_until(cursor + step)
+                cursor += step
+                continue
+            for row in df.itertuples(index=False):
+                for t in range(self.ticks_per_bar):
+                    frac = (t + 1) / (self.ticks_per_bar + 1)
+                    event_ms = int(row.open_time + step * frac)
+                    await self.clock.sleep_until(event_ms)
+                    partial = row._replace(close=row.open + (row.close - row.open) * frac, volume=row.volume * frac)
+                    await queue.put(self._envelope(name, ws_kline_message(partial, symbol, interval, is_final=False, event_ms=event_ms), combined))
+                await self.clock.sleep_until(int(row.close_time) + 1)
+                await queue.put(self._envelope(name, ws_kline_message(row, symbol, interval, is_final=True), combined))
+            cursor = int(df["open_time"].iloc[-1]) + step
+
+    @staticmethod
+    def _envelope(name: str, payload: dict, combined: bool) -> str:
+        return json.dumps({"stream": name, "data": payload} if combined else payload)
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765):
+        async with websockets.serve(self.ws_handler, host, port, process_request=self.process_request, max_queue=None):
+            log.info("Replay server on http://%s:%d (ws://%s:%d/ws)", host, port, host, port)
+            while True:
+                await asyncio.sleep(30)
+                log.info("Replay stats at %s: %s", datetime.fromtimestamp(self.clock.now_ms() / 1000, tz=timezone.utc), self.stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay Binance REST / archive / WS from stored candles")
+    parser.add_argument("--parquet", help="serve candles from this Parquet file instead of Postgres")
+    parser.add_argument("--table", choices=["futures_candles", "candles_raw"], default="futures_candles")
+    parser.add_argument("--key", default="um", help="market_type (futures_candles) or exchange (candles_raw)")
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="virtual clock start (UTC date)")
+    parser.add_argument("--speed", type=float, default=1.0, help="virtual seconds per wall second")
+    parser.add_argument("--ticks", type=int, default=0, help="non-final kline updates per bar on WS")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of REST calls answered with 429")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="probability of dropping a WS after a message")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.parquet:
+        source = ParquetSource(args.parquet)
+    else:
+        source = PostgresSource(POSTGRES_DSN or require("POSTGRES_DSN"), table=args.table, key=args.key)
+    start_ms = int(datetime(args.start.year, args.start.month, args.start.day, tzinfo=timezone.utc).timestamp() * 1000)
+    server = ReplayServer(
+        source,
+        ReplayClock(start_ms, args.speed),
+        error_rate=args.error_rate,
+        disconnect_rate=args.disconnect_rate,
+        latency_ms=args.latency_ms,
+        ticks_per_bar=args.ticks,
+        seed=args.seed,
+    )
+    asyncio.run(server.serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
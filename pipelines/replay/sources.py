@@ -0,0 +1,109 @@
+"""
+Candle sources for the replay server. Every source returns DataFrames with the
+Binance kline columns (timestamps in epoch ms), see pipelines.ingestion.synthetic.KLINE_COLUMNS.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import psycopg
+
+from pipelines.ingestion.intervals import interval_to_ms
+from pipelines.ingestion.synthetic import KLINE_COLUMNS
+
+
+def _to_dt(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc)
+
+
+def _complete(df: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """Fill the optional archive columns (candles_raw has no quote volume / trade counts)."""
+    if "close_time" not in df or df["close_time"].isna().all():
+        df["close_time"] = df["open_time"] + interval_to_ms(interval) - 1
+    for col in ("quote_volume", "num_trades", "taker_buy_base", "taker_buy_quote", "ignore"):
+        if col not in df:
+            df[col] = 0
+        df[col] = df[col].fillna(0)
+    df["num_trades"] = df["num_trades"].astype("int64")
+    return df[KLINE_COLUMNS]
+
+
+class PostgresSource:
+    """Candles from market.futures_candles (key = market_type) or market.candles_raw (key = exchange)."""
+
+    def __init__(self, dsn: str, table: str = "futures_candles", key: str = "um"):
+        if table == "futures_candles":
+            self._sql = """
+                SELECT (extract(epoch FROM open_time) * 1000)::bigint AS open_time,
+                       open, high, low, close, volume,
+                       (extract(epoch FROM close_time) * 1000)::bigint AS close_time,
+                       quote_volume, num_trades, taker_buy_base, taker_buy_quote
+                FROM market.futures_candles
+                WHERE market_type = %(key)s AND symbol = %(symbol)s AND interval = %(interval)s
+                  AND open_time >= %(start)s AND open_time <= %(end)s
+                ORDER BY open_time {order}
+                LIMIT %(limit)s
+            """
+        else:
+            self._sql = """
+                SELECT (extract(epoch FROM open_time) * 1000)::bigint AS open_time,
+                       open, high, low, close, volume,
+                       (extract(epoch FROM close_time) * 1000)::bigint AS close_time
+                FROM market.candles_raw
+                WHERE exchange = %(key)s AND symbol = %(symbol)s AND interval = %(interval)s
+                  AND open_time >= %(start)s AND open_time <= %(end)s
+                ORDER BY open_time {order}
+                LIMIT %(limit)s
+            """
+        self.dsn = dsn
+        self.key = key
+
+    def candles(self, symbol: str, interval: str, start_ms: int, end_ms: int, limit: int, *, latest: bool = False) -> pd.DataFrame:
+        """Up to `limit` candles with open_time in [start_ms, end_ms]; the newest ones if latest."""
+        params = {
+            "key": self.key,
+            "symbol": symbol,
+            "interval": interval,
+            "start": _to_dt(start_ms),
+            "end": _to_dt(end_ms),
+            "limit": limit,
+        }
+        with psycopg.connect(self.dsn) as conn:
+            cur = conn.execute(self._sql.format(order="DESC" if latest else "ASC"), params)
+            cols = [d.name for d in cur.description]
+            df = pd.DataFrame(cur.fetchall(), columns=cols)
+        if latest:
+            df = df.iloc[::-1].reset_index(drop=True)
+        return _complete(df, interval)
+
+
+class ParquetSource:
+    """
+    Candles from a Parquet file with columns symbol, interval, open_time (epoch ms or
+    datetime), open, high, low, close, volume and optionally the other archive columns.
+    The file is loaded once and kept in memory per (symbol, interval).
+    """
+
+    def __init__(self, path: str):
+        df = pd.read_parquet(path)
+        if pd.api.types.is_datetime64_any_dtype(df["open_time"]):
+            df["open_time"] = df["open_time"].dt.as_unit("ms").astype("int64")
+        if "close_time" in df and pd.api.types.is_datetime64_any_dtype(df["close_time"]):
+            df["close_time"] = df["close_time"].dt.as_unit("ms").astype("int64")
+        self._series = {
+            (sym, itv): _complete(g.sort_values("open_time").reset_index(drop=True), itv)
+            for (sym, itv), g in df.groupby(["symbol", "interval"])
+        }
+
+    def candles(self, symbol: str, interval: str, start_ms: int, end_ms: int, limit: int, *, latest: bool = False) -> pd.DataFrame:
+        df = self._series.get((symbol, interval))
+        if df is None:
+            return pd.DataFrame(columns=KLINE_COLUMNS)
+        open_ms = df["open_time"].to_numpy()
+        lo = int(np.searchsorted(open_ms, start_ms, side="left"))
+        hi = int(np.searchsorted(open_ms, end_ms, side="right"))
+        if latest:
+            lo = max(lo, hi - limit)
+        return df.iloc[lo:min(hi, lo + limit)].reset_index(drop=True)
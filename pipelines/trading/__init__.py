@@ -0,0 +1 @@
+# Paper trading: live signal evaluation and simulated fills
@@ -0,0 +1,359 @@
+"""
+Paper-trading engine driven by the live kline streams.
+
+Every closed candle updates the series' incremental indicators, checks the open
+position's SL/TP against the bar's high/low and asks the strategy for a signal;
+entries and signal exits fill at the close. With --forming, in-progress candles
+are used to fill SL/TP as soon as a level is touched instead of at the close, and
+the strategy also sees a preview of the forming bar's indicators, so its entries and
+exits can fill at the forming close before the bar ends.
+
+All of this runs synchronously inside the WebSocket callback (O(1) per message, no
+I/O); position and trade rows are queued and written to market.paper_positions /
+market.paper_trades by a background task in batches.
+
+Latency from candle close to decision is exported as paper_decision_seconds and
+logged (p50 / p99 / max) every --report seconds together with the message rate and the
+engine's own per-message handling time. Against the replay server the close times are
+virtual, so only the handling time and the pending-write backlog are meaningful there.
+
+Run: python -m pipelines.trading.paper --strategy ema_cross --param fast=20 --param slow=50
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import numpy as np
+import psycopg
+
+from pipelines.backtest.sltp import SL_ATR_MULT, TP_ATR_MULT, sl_tp_levels
+from pipelines.common import metrics
+from pipelines.common.exceptions import ConfigError
+from pipelines.common.logging import get_logger
+from pipelines.common.settings import EXCHANGE, INTERVALS, MODE, POSTGRES_DSN, SYMBOLS
+from pipelines.features.incremental import IndicatorState
+from pipelines.features.load_from_pg import load_candles
+from pipelines.ingestion.binance_ws import listen_many
+from pipelines.trading.strategies import Strategy, load_strategy
+
+log = get_logger(__name__)
+
+DECISION_SECONDS = metrics.histogram(
+    "paper_decision_seconds",
+    "Candle close to paper-trading decision",
+    ["interval"],
+)
+PAPER_TRADES = metrics.counter("paper_trades_total", "Closed paper trades", ["strategy", "reason"])
+
+
+def _dt(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc)
+
+
+@dataclass(slots=True)
+class Position:
+    side: int
+    qty: float
+    entry_price: float
+    stop_loss: float
+    take_profit: float
+    entry_ms: int
+
+
+class _Series:
+    __slots__ = ("indicators", "position", "last_open_ms", "atr_key")
+
+    def __init__(self, indicators: IndicatorState):
+        self.indicators = indicators
+        self.position: Position | None = None
+        self.last_open_ms = -1
+        self.atr_key = indicators.atr_key
+
+
+class PaperEngine:
+    def __init__(
+        self,
+        strategy: Strategy,
+        pairs: list[tuple[str, str]],
+        *,
+        exchange: str = "binance",
+        notional: float = 1_000.0,
+        sl_mult: float = SL_ATR_MULT,
+        tp_mult: float = TP_ATR_MULT,
+        fee_bps: float = 4.0,
+        slippage_bps: float = 1.0,
+        use_forming: bool = False,
+    ):
+        self.strategy = strategy
+        self.exchange = exchange
+        self.notional = notional
+        self.sl_mult = sl_mult
+        self.tp_mult = tp_mult
+        self.fee = fee_bps / 10_000
+        self.slippage = slippage_bps / 10_000
+        self.use_forming = use_forming
+        self.series = {(s, itv): _Series(IndicatorState(**strategy.indicators)) for s, itv in pairs}
+        # close -> decision (wall clock) and message -> decision (engine time only), recent closes
+        self.latencies: deque[float] = deque(maxlen=10_000)
+        self.handle_times: deque[float] = deque(maxlen=10_000)
+        self.messages = 0
+        self.closed_trades = 0
+        self.writes: asyncio.Queue | None = None
+
+    # ------------------------------------------------------------- warm-up
+    def warm_up(self, dsn: str, history: int = 1000) -> None:
+        """Seed indicators from stored candles and restore open positions."""
+        for (symbol, interval), st in self.series.items():
+            df = load_candles(dsn, self.exchange, symbol, interval, limit=history, table="candles_raw")
+            for r in df.itertuples(index=False):
+                st.indicators.update(float(r.high), float(r.low), float(r.close))
+                st.last_open_ms = int(r.open_time.timestamp() * 1000)
+        with psycopg.connect(dsn) as conn:
+            rows = conn.execute(
+                """
+                SELECT symbol, interval, side, qty, entry_price, stop_loss, take_profit,
+                       (extract(epoch FROM entry_time) * 1000)::bigint
+                FROM market.paper_positions
+                WHERE strategy = %s AND exchange = %s
+                """,
+                (self.strategy.name, self.exchange),
+            ).fetchall()
+        for symbol, interval, *pos in rows:
+            st = self.series.get((symbol, interval))
+            if st is not None:
+                st.position = Position(*pos)
+        log.info("Warmed up %d series, %d open positions restored", len(self.series), len(rows))
+
+    # ---------------------------------------------------------- hot path
+    def on_kline(self, symbol: str, interval: str, k: dict, event_ms: int | None = None) -> None:
+        t0 = time.perf_counter()
+        st = self.series.get((symbol, interval))
+        if st is None:
+            return
+        self.messages += 1
+        is_final = bool(k.get("x", False))
+        if not is_final and not self.use_forming:
+            return
+        open_ms = int(k["t"])
+        if open_ms <= st.last_open_ms:
+            return  # bar already closed (replayed or duplicate message)
+        high, low, close = float(k["h"]), float(k["l"]), float(k["c"])
+
+        if st.position is not None and st.position.entry_ms < open_ms:
+            self._check_exits(symbol, interval, st, float(k["o"]), high, low, open_ms)
+        if not is_final:
+            # Indicators as if the bar closed now; the state only moves on the final message
+            self._decide(symbol, interval, st, st.indicators.preview(high, low, close), close, open_ms)
+            return
+
+        st.last_open_ms = open_ms
+        self._decide(symbol, interval, st, st.indicators.update(high, low, close), close, open_ms)
+
+        latency = time.time() - (int(k["T"]) + 1) / 1000.0
+        self.latencies.append(latency)
+        self.handle_times.append(time.perf_counter() - t0)
+        DECISION_SECONDS.observe(max(latency, 0.0), interval=interval)
+
+    def _decide(self, symbol, interval, st: _Series, values: dict[str, float], close: float, open_ms: int) -> None:
+        if st.indicators.bars < self.strategy.warmup:
+            return
+        side = st.position.side if st.position is not None else 0
+        signal = self.strategy.on_bar(values, side)
+        if signal is not None and signal != side:
+            if st.position is not None:
+                self._close(symbol, interval, st, close * (1 - st.position.side * self.slippage), open_ms, "signal")
+            if signal != 0 and values[st.atr_key] == values[st.atr_key]:
+                self._open(symbol, interval, st, signal, close, values[st.atr_key], open_ms)
+
+    def _check_exits(self, symbol, interval, st: _Series, open_: float, high: float, low: float, open_ms: int) -> None:
+        pos = st.position
+        if pos.side == 1:
+            sl_hit, tp_hit = low <= pos.stop_loss, high >= pos.take_profit
+        else:
+            sl_hit, tp_hit = high >= pos.stop_loss, low <= pos.take_profit
+        # Both inside one bar: assume the stop filled first (as simulate_exits does)
+        if sl_hit:
+            gapped = (open_ - pos.stop_loss) * pos.side < 0
+            self._close(symbol, interval, st, open_ if gapped else pos.stop_loss, open_ms, "sl")
+        elif tp_hit:
+            self._close(symbol, interval, st, pos.take_profit, open_ms, "tp")
+
+    def _open(self, symbol, interval, st: _Series, side: int, close: float, atr: float, open_ms: int) -> None:
+        price = close * (1 + side * self.slippage)
+        sl, tp = sl_tp_levels(price, atr, side, self.sl_mult, self.tp_mult)
+        st.position = Position(side, self.notional / price, price, sl, tp, open_ms)
+        self._queue("open", symbol, interval, st.position)
+
+    def _close(self, symbol, interval, st: _Series, price: float, open_ms: int, reason: str) -> None:
+        pos = st.position
+        st.position = None
+        gross = pos.side * (price - pos.entry_price) * pos.qty
+        fees = self.fee * pos.qty * (pos.entry_price + price)
+        risk = abs(pos.entry_price - pos.stop_loss)
+        r_multiple = pos.side * (price - pos.entry_price) / risk if risk else None
+        self.closed_trades += 1
+        PAPER_TRADES.inc(strategy=self.strategy.name, reason=reason)
+        self._queue("close", symbol, interval, pos, price, open_ms, reason, gross - fees, r_multiple)
+
+    def _queue(self, kind: str, *item) -> None:
+        if self.writes is not None:
+            self.writes.put_nowait((kind, *item))
+
+    # ---------------------------------------------------------- persistence
+    async def writer(self, dsn: str, max_batch: int = 500) -> None:
+        """Drain queued position/trade changes into Postgres, one transaction per batch."""
+        self.writes = asyncio.Queue()
+        conn = await asyncio.to_thread(psycopg.connect, dsn)
+        try:
+            while True:
+                batch = [await self.writes.get()]
+                while len(batch) < max_batch and not self.writes.empty():
+                    batch.append(self.writes.get_nowait())
+                try:
+                    await asyncio.to_thread(self._flush, conn, batch)
+                except psycopg.Error as e:
+                    log.warning("Paper trade persistence failed (%d changes dropped): %s", len(batch), e)
+                    conn.close()
+                    conn = await asyncio.to_thread(psycopg.connect, dsn)
+        finally:
+            conn.close()
+
+    def _flush(self, conn: psycopg.Connection, batch: list[tuple]) -> None:
+        name, exchange = self.strategy.name, self.exchange
+        with conn.cursor() as cur:
+            for kind, symbol, interval, pos, *rest in batch:
+                if kind == "open":
+                    cur.execute(
+                        """
+                        INSERT INTO market.paper_positions
+                        (strategy, exchange, symbol, interval, side, qty, entry_price, stop_loss, take_profit, entry_time)
+                        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+                        ON CONFLICT (strategy, exchange, symbol, interval)
+                        DO UPDATE SET side=EXCLUDED.side, qty=EXCLUDED.qty, entry_price=EXCLUDED.entry_price,
+                          stop_loss=EXCLUDED.stop_loss, take_profit=EXCLUDED.take_profit,
+                          entry_time=EXCLUDED.entry_time, updated_at=now()
+                        """,
+                        (name, exchange, symbol, interval, pos.side, pos.qty, pos.entry_price,
+                         pos.stop_loss, pos.take_profit, _dt(pos.entry_ms)),
+                    )
+                else:
+                    exit_price, exit_ms, reason, pnl, r_multiple = rest
+                    cur.execute(
+                        """
+                        DELETE FROM market.paper_positions
+                        WHERE strategy=%s AND exchange=%s AND symbol=%s AND interval=%s AND entry_time=%s
+                        """,
+                        (name, exchange, symbol, interval, _dt(pos.entry_ms)),
+                    )
+                    cur.execute(
+                        """
+                        INSERT INTO market.paper_trades
+                        (strategy, exchange, symbol, interval, side, qty, entry_price, exit_price,
+                         entry_time, exit_time, exit_reason, pnl, r_multiple)
+                        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+                        """,
+                        (name, exchange, symbol, interval, pos.side, pos.qty, pos.entry_price, exit_price,
+                         _dt(pos.entry_ms), _dt(exit_ms), reason, pnl, r_multiple),
+                    )
+        conn.commit()
+
+    # ------------------------------------------------------------- reporting
+    def latency_summary(self) -> dict[str, float]:
+        """p50 / p99 / max of close->decision in ms, and p99 of the engine's own handling in µs."""
+        if not self.latencies:
+            return {}
+        lat = np.fromiter(self.latencies, dtype=np.float64)
+        p50, p99 = np.percentile(lat, [50, 99])
+        handle_p99 = np.percentile(np.fromiter(self.handle_times, dtype=np.float64), 99)
+        return {
+            "p50_ms": float(p50) * 1000,
+            "p99_ms": float(p99) * 1000,
+            "max_ms": float(lat.max()) * 1000,
+            "handle_p99_us": float(handle_p99) * 1e6,
+        }
+
+    async def report(self, every_s: float = 60.0) -> None:
+        last = self.messages
+        while True:
+            await asyncio.sleep(every_s)
+            rate = (self.messages - last) / every_s
+            last = self.messages
+            open_positions = sum(st.position is not None for st in self.series.values())
+            backlog = self.writes.qsize() if self.writes is not None else 0
+            log.info(
+                "Paper %s: %.1f msg/s, close->decision %s, %d open, %d closed, %d pending writes",
+                self.strategy.name, rate,
+                {k: round(v, 2) for k, v in self.latency_summary().items()},
+                open_positions, self.closed_trades, backlog,
+            )
+
+
+async def run(engine: PaperEngine, pairs: list[tuple[str, str]], dsn: str | None, report_s: float) -> None:
+    tasks = [asyncio.create_task(engine.report(report_s))]
+    if dsn:
+        tasks.append(asyncio.create_task(engine.writer(dsn)))
+    tasks.append(asyncio.create_task(listen_many(pairs, engine.on_kline)))
+    await asyncio.gather(*tasks)
+
+
+def _parse_params(items: list[str]) -> dict:
+    params = {}
+    for item in items:
+        key, _, raw = item.partition("=")
+        for cast in (int, float):
+            try:
+                params[key] = cast(raw)
+                break
+            except ValueError:
+                continue
+        else:
+            params[key] = {"true": True, "false": False}.get(raw.lower(), raw)
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paper-trade a strategy on live Binance kline streams")
+    parser.add_argument("--strategy", default="ema_cross", help="registered name or module:Class")
+    parser.add_argument("--param", action="append", default=[], help="strategy parameter key=value (repeatable)")
+    parser.add_argument("--symbols", type=lambda s: s.split(","), default=SYMBOLS)
+    parser.add_argument("--intervals", type=lambda s: s.split(","), default=INTERVALS)
+    parser.add_argument("--notional", type=float, default=1_000.0)
+    parser.add_argument("--sl-mult", type=float, default=SL_ATR_MULT)
+    parser.add_argument("--tp-mult", type=float, default=TP_ATR_MULT)
+    parser.add_argument("--fee-bps", type=float, default=4.0)
+    parser.add_argument("--slippage-bps", type=float, default=1.0)
+    parser.add_argument("--forming", action="store_true", help="fill SL/TP and act on strategy previews on in-progress candles")
+    parser.add_argument("--history", type=int, default=1000, help="stored candles used to warm up indicators")
+    parser.add_argument("--no-persist", action="store_true", help="do not read or write Postgres")
+    parser.add_argument("--report", type=float, default=60.0, help="seconds between status lines")
+    args = parser.parse_args()
+
+    if MODE != "paper":
+        raise ConfigError(f"MODE={MODE}: the paper engine only runs with MODE=paper")
+
+    pairs = [(s, itv) for s in args.symbols for itv in args.intervals]
+    engine = PaperEngine(
+        load_strategy(args.strategy, **_parse_params(args.param)),
+        pairs,
+        exchange=EXCHANGE,
+        notional=args.notional,
+        sl_mult=args.sl_mult,
+        tp_mult=args.tp_mult,
+        fee_bps=args.fee_bps,
+        slippage_bps=args.slippage_bps,
+        use_forming=args.forming,
+    )
+    dsn = None if args.no_persist else POSTGRES_DSN
+    if dsn:
+        engine.warm_up(dsn, args.history)
+    metrics.start_http_server()
+    asyncio.run(run(engine, pairs, dsn, args.report))
+
+
+if __name__ == "__main__":
+    main()
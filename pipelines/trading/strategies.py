@@ -0,0 +1,90 @@
+"""
+Pluggable strategies for the paper-trading engine.
+
+A strategy sees the indicator values of one series after every closed bar (and, if the
+engine runs with forming bars, previews of the bar in progress) and returns +1 (go
+long), -1 (go short), 0 (close / stay flat) or None (no opinion).
+
+Register new ones with @register("name") or pass "package.module:ClassName" to the engine.
+"""
+from __future__ import annotations
+
+import importlib
+
+STRATEGIES: dict[str, type] = {}
+
+
+def register(name: str):
+    def wrap(cls):
+        cls.name = name
+        STRATEGIES[name] = cls
+        return cls
+    return wrap
+
+
+class Strategy:
+    """
+    Base class. `warmup` is the number of closed bars needed before signals are trusted;
+    `indicators` are IndicatorState keyword arguments the strategy's values depend on.
+    """
+
+    name = "base"
+    warmup = 0
+    indicators: dict = {}
+
+    def on_bar(self, values: dict[str, float], position: int) -> int | None:
+        """values: IndicatorState output; position: current side (1, -1 or 0)."""
+        raise NotImplementedError
+
+
+@register("ema_cross")
+class EmaCross(Strategy):
+    """Long when the fast EMA is above the slow one, short when below."""
+
+    def __init__(self, fast: int = 20, slow: int = 50, allow_short: bool = True):
+        self.fast = f"ema_{fast}"
+        self.slow = f"ema_{slow}"
+        self.allow_short = allow_short
+        self.warmup = slow
+        self.indicators = {"ema_spans": (fast, slow)}
+
+    def on_bar(self, values, position):
+        fast, slow = values[self.fast], values[self.slow]
+        if fast > slow:
+            return 1
+        if fast < slow:
+            return -1 if self.allow_short else 0
+        return None
+
+
+@register("rsi_reversion")
+class RsiReversion(Strategy):
+    """Buy oversold, sell overbought; positions are left to SL/TP."""
+
+    def __init__(self, period: int = 14, lower: float = 30.0, upper: float = 70.0):
+        self.key = f"rsi_{period}"
+        self.lower = lower
+        self.upper = upper
+        self.warmup = period * 3
+        self.indicators = {"rsi_period": period}
+
+    def on_bar(self, values, position):
+        rsi = values[self.key]
+        if rsi < self.lower:
+            return 1
+        if rsi > self.upper:
+            return -1
+        return None
+
+
+def load_strategy(spec: str, **params) -> Strategy:
+    """Instantiate a registered strategy by name, or a Strategy subclass given as "module:Class"."""
+    if ":" in spec:
+        module, _, attr = spec.partition(":")
+        cls = getattr(importlib.import_module(module), attr)
+    else:
+        try:
+            cls = STRATEGIES[spec]
+        except KeyError:
+            raise ValueError(f"Unknown strategy {spec!r}; registered: {', '.join(STRATEGIES)}") from None
+    return cls(**params)
@@ -0,0 +1,19 @@
+-- ---------------------------------------------------------------------------
+-- Data-quality scanner (pipelines/quality/scanner.py)
+-- ---------------------------------------------------------------------------
+
+-- How far each series has been scanned, so incremental runs only look at new rows.
+-- source_table is 'futures_candles', 'candles_raw' or 'divergence'; series_key is the
+-- market_type (futures) or exchange (spot).
+CREATE TABLE IF NOT EXISTS market.data_quality_checkpoints (
+  source_table           text NOT NULL,
+  series_key             text NOT NULL,
+  symbol                 text NOT NULL,
+  interval               text NOT NULL,
+  last_scanned_open_time timestamptz NOT NULL,
+  updated_at             timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (source_table, series_key, symbol, interval)
+);
+
+CREATE INDEX IF NOT EXISTS data_quality_issues_series_idx
+  ON market.data_quality_issues (exchange, symbol, interval, issue_type, open_time);
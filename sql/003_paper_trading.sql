@@ -0,0 +1,41 @@
+-- ---------------------------------------------------------------------------
+-- Paper trading (pipelines/trading/paper.py)
+-- ---------------------------------------------------------------------------
+
+-- Open position per strategy and series (at most one); deleted when it closes.
+CREATE TABLE IF NOT EXISTS market.paper_positions (
+  strategy       text        NOT NULL,
+  exchange       text        NOT NULL,
+  symbol         text        NOT NULL,
+  interval       text        NOT NULL,
+  side           smallint    NOT NULL,  -- 1 = long, -1 = short
+  qty            double precision NOT NULL,
+  entry_price    double precision NOT NULL,
+  stop_loss      double precision NOT NULL,
+  take_profit    double precision NOT NULL,
+  entry_time     timestamptz NOT NULL,   -- open_time of the signal candle
+  updated_at     timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (strategy, exchange, symbol, interval)
+);
+
+-- Closed round trips.
+CREATE TABLE IF NOT EXISTS market.paper_trades (
+  id             bigserial   PRIMARY KEY,
+  strategy       text        NOT NULL,
+  exchange       text        NOT NULL,
+  symbol         text        NOT NULL,
+  interval       text        NOT NULL,
+  side           smallint    NOT NULL,
+  qty            double precision NOT NULL,
+  entry_price    double precision NOT NULL,
+  exit_price     double precision NOT NULL,
+  entry_time     timestamptz NOT NULL,
+  exit_time      timestamptz NOT NULL,   -- open_time of the candle the exit filled in
+  exit_reason    text        NOT NULL,   -- 'sl', 'tp' or 'signal'
+  pnl            double precision NOT NULL,
+  r_multiple     double precision,
+  created_at     timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS paper_trades_series_idx
+  ON market.paper_trades (strategy, symbol, interval, exit_time);
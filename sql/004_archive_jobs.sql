@@ -0,0 +1,39 @@
+-- ---------------------------------------------------------------------------
+-- Archive download work queue (pipelines/ingestion/archive_queue.py)
+-- ---------------------------------------------------------------------------
+
+-- One row per data.binance.vision kline archive. Workers claim pending rows with
+-- FOR UPDATE SKIP LOCKED, heartbeat while downloading and finish them as
+-- done (rows written), missing (archive not published) or, after max_attempts
+-- failures, dead.
+CREATE TABLE IF NOT EXISTS market.archive_jobs (
+  id             bigserial   PRIMARY KEY,
+  market_type    text        NOT NULL,
+  symbol         text        NOT NULL,
+  interval       text        NOT NULL,
+  period         text        NOT NULL CHECK (period IN ('daily', 'monthly')),
+  period_start   date        NOT NULL,  -- the day, or the first day of the month
+  status         text        NOT NULL DEFAULT 'pending'
+                 CHECK (status IN ('pending', 'running', 'done', 'missing', 'dead')),
+  attempts       integer     NOT NULL DEFAULT 0,
+  max_attempts   integer     NOT NULL DEFAULT 5,
+  not_before     timestamptz NOT NULL DEFAULT now(),  -- retry backoff
+  worker         text,
+  claimed_at     timestamptz,
+  heartbeat_at   timestamptz,
+  finished_at    timestamptz,
+  rows_written   bigint,
+  last_error     text,
+  created_at     timestamptz NOT NULL DEFAULT now(),
+  UNIQUE (market_type, symbol, interval, period, period_start)
+);
+
+-- Claim scan: only the (small) pending part of the table is indexed.
+CREATE INDEX IF NOT EXISTS archive_jobs_pending_idx
+  ON market.archive_jobs (not_before, id) WHERE status = 'pending';
+
+-- Stale-claim reaping and the per-series watermark lookups.
+CREATE INDEX IF NOT EXISTS archive_jobs_running_idx
+  ON market.archive_jobs (heartbeat_at) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS archive_jobs_series_idx
+  ON market.archive_jobs (market_type, symbol, interval, period_start);
@@ -0,0 +1,18 @@
+-- ---------------------------------------------------------------------------
+-- Sharded live ingestion (pipelines/ingestion/sharded_ws.py)
+-- ---------------------------------------------------------------------------
+
+-- Live WS worker processes. Each worker refreshes its row every few seconds; rows
+-- older than the lease TTL are considered dead and removed by the survivors, whose
+-- next rebalance takes over the dead worker's streams. Per-stream ownership itself
+-- is a session-level advisory lock, released when the worker's connection goes away
+-- (survivors terminate the backend of a worker whose lease expired).
+CREATE TABLE IF NOT EXISTS market.ws_workers (
+  worker_id      text        PRIMARY KEY,
+  host           text        NOT NULL,
+  pid            integer     NOT NULL,
+  backend_pid    integer     NOT NULL,            -- pg_backend_pid() of the connection holding its locks
+  streams        integer     NOT NULL DEFAULT 0,  -- streams currently owned
+  started_at     timestamptz NOT NULL DEFAULT now(),
+  heartbeat_at   timestamptz NOT NULL DEFAULT now()
+);
@@ -0,0 +1,34 @@
+-- ---------------------------------------------------------------------------
+-- Candle coverage catalog (pipelines/ingestion/coverage.py)
+-- ---------------------------------------------------------------------------
+
+-- Rows stored per series and UTC day, refreshed by the writers for the days they
+-- touch. A day is complete when rows >= expected (86 400 000 / interval ms).
+CREATE TABLE IF NOT EXISTS market.candle_coverage_days (
+  source         text        NOT NULL,  -- 'futures_candles' or 'candles_raw'
+  key            text        NOT NULL,  -- market_type or exchange
+  symbol         text        NOT NULL,
+  interval       text        NOT NULL,
+  day            date        NOT NULL,
+  rows           integer     NOT NULL,
+  expected       integer     NOT NULL,
+  first_open     timestamptz NOT NULL,
+  last_open      timestamptz NOT NULL,
+  updated_at     timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (source, key, symbol, interval, day)
+);
+
+-- One row per series: what get_candle_date_range() used to compute with MIN/MAX scans.
+CREATE TABLE IF NOT EXISTS market.candle_coverage (
+  source         text        NOT NULL,
+  key            text        NOT NULL,
+  symbol         text        NOT NULL,
+  interval       text        NOT NULL,
+  first_open     timestamptz NOT NULL,
+  last_open      timestamptz NOT NULL,
+  rows           bigint      NOT NULL,
+  days           integer     NOT NULL,
+  complete_days  integer     NOT NULL,
+  updated_at     timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (source, key, symbol, interval)
+);
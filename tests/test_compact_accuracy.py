@@ -0,0 +1,25 @@
+"""float32 compact indicators stay within ACCURACY_BOUNDS of the float64 pipeline."""
+import pandas as pd
+import pytest
+
+from pipelines.features.compact import ACCURACY_BOUNDS, PRICE_COLUMNS, check_accuracy
+from pipelines.ingestion.synthetic import synthetic_klines
+
+
+def _candles(n: int, **kwargs) -> pd.DataFrame:
+    df = synthetic_klines(n=n, **kwargs)[["open_time", *PRICE_COLUMNS]]
+    df["open_time"] = pd.to_datetime(df["open_time"], unit="ms", utc=True)
+    return df
+
+
+@pytest.mark.parametrize("start_price", [40_000.0, 25.0])
+def test_rsi_macd_bollinger_within_bounds(start_price):
+    errors = check_accuracy(_candles(50_000, start_price=start_price))
+    assert set(errors) == set(ACCURACY_BOUNDS)
+    for col, (_, bound) in ACCURACY_BOUNDS.items():
+        assert errors[col] <= bound, col
+
+
+def test_exceeded_bound_fails():
+    with pytest.raises(AssertionError, match="rsi_14"):
+        check_accuracy(_candles(5_000), {"rsi_14": ("abs", 0.0)})
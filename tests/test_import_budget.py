@@ -0,0 +1,14 @@
+"""`python -m pipelines` stays cheap to start: no heavy imports, under the time budget."""
+from benchmarks.import_budget import BUDGET_MS, CLI_CODE, heavy_imports, import_ms
+
+
+def test_cli_imports_no_heavy_modules():
+    assert heavy_imports(CLI_CODE) == []
+
+
+def test_settings_import_no_heavy_modules():
+    assert heavy_imports("import pipelines.common.settings") == []
+
+
+def test_cli_import_time_within_budget():
+    assert import_ms("pipelines.cli", CLI_CODE, repeat=3) <= BUDGET_MS